@@ -1,5 +1,7 @@
 import unittest
+import copy
 import json
+import pickle
 from tempfile import gettempdir
 from pathlib import Path
 import shutil
@@ -248,6 +250,31 @@ class TestRecipeModels(unittest.TestCase) :
         recipe_2 = Recipe()
         self.assertNotEqual(recipe_1.tags, recipe_2.tags)
 
+    def test_compact_models(self) :
+        recipe = Recipe(name="Fake beer name", number=123)
+        recipe.ingredients.value = self.get_fake_Ingredients()
+        recipe.ingredients.value.add_extra_mash(ExtraMash("sugar", 1.0, 2.2))
+        for item in [recipe, recipe.ingredients.value.malts[0], recipe.ingredients.value.extra_mash[0], MashTemp(), Fermentation(), Twist()] :
+            self.assertFalse(hasattr(item, "__dict__"))
+
+        # Json keys are class level metadata, properties values are read and written as before
+        self.assertEqual(recipe.first_brewed._prop_key, "firstBrewed")
+        self.assertEqual(Recipe.first_brewed._prop_key, "firstBrewed")
+        self.assertEqual(recipe.to_json()["firstBrewed"], "")
+        recipe.add_parsing_error("error")
+        recipe.parsing_errors.value.append("other error")
+        self.assertEqual(recipe.parsing_errors.value, ["error", "other error"])
+        self.assertEqual(recipe.number.try_read({"number" : 5}, 0), 5)
+
+        # Whole properties are taken over, raw values are refused
+        recipe.name = Recipe(name="Other name").name
+        self.assertEqual(recipe.name.value, "Other name")
+        with self.assertRaises(TypeError) :
+            recipe.name = "Raw name" #type: ignore
+
+        self.assertEqual(copy.deepcopy(recipe), recipe)
+        self.assertEqual(pickle.loads(pickle.dumps(recipe)), recipe)
+
     def test_multiple_instantiations_and_isolation(self) :
         class TestClass :
             tags : list[str]
@@ -0,0 +1,117 @@
+import copy
+import json
+import random
+import unittest
+from dataclasses import dataclass, fields
+from pathlib import Path
+
+from ..serializer import *
+from ..serializer import _SCHEMAS, _compile
+from ..recipe import Recipe, Malt, Yeast
+
+PATCHES_DIR = Path(__file__).parents[3].joinpath("Patches")
+
+class TestSerializer(unittest.TestCase) :
+
+    def read_patches(self) -> list[dict] :
+        contents = []
+        for filepath in sorted(PATCHES_DIR.glob("recipe_*.json")) :
+            with open(filepath, "r") as file :
+                contents.append(json.load(file))
+        return contents
+
+    def legacy_decode(self, content : dict) -> Recipe :
+        recipe = Recipe()
+        recipe.from_json(content)
+        return recipe
+
+    def call(self, function, content : dict) :
+        """Returns what function returns, or None if it raised (malformed nodes don't raise the same exceptions on both paths)"""
+        try :
+            return function(content)
+        except Exception :
+            return None
+
+    def mutate(self, node : Any, rng : random.Random) :
+        # Drops keys and replaces values with empty (of the same type) or null ones, all the way down
+        if isinstance(node, dict) :
+            for key in list(node.keys()) :
+                choice = rng.random()
+                if choice < 0.1 :
+                    del node[key]
+                elif choice < 0.2 :
+                    node[key] = rng.choice([None, type(node[key])() if node[key] is not None else None])
+                else :
+                    self.mutate(node[key], rng)
+        elif isinstance(node, list) :
+            for item in node :
+                self.mutate(item, rng)
+
+    def assertSameRecipes(self, content : dict) :
+        # Nodes are taken over by some models (Volume), so each path works on its own copy
+        legacy = self.call(self.legacy_decode, copy.deepcopy(content))
+        decoded = self.call(plan_for(Recipe).decode, copy.deepcopy(content))
+        if legacy is None :
+            self.assertIsNone(decoded)
+            return
+
+        self.assertEqual(decoded, legacy)
+        self.assertFalse(hasattr(decoded, "__dict__"))
+        self.assertEqual(json.dumps(plan_for(Recipe).encode(decoded)), json.dumps(legacy.to_json()))
+
+    def test_same_as_recipe_methods(self) :
+        contents = self.read_patches()
+        self.assertNotEqual(len(contents), 0)
+        for content in contents :
+            self.assertSameRecipes(content)
+
+        recipes = recipes_from_json(contents)
+        self.assertEqual(json.dumps(recipes_to_json(recipes)), json.dumps([x.to_json() for x in recipes]))
+        self.assertEqual(json.dumps(recipes_to_json([Recipe()])), json.dumps([Recipe().to_json()]))
+
+    def test_same_as_recipe_methods_with_missing_values(self) :
+        rng = random.Random(0)
+        contents = self.read_patches()
+        for _ in range(50) :
+            for content in contents :
+                mutated = copy.deepcopy(content)
+                self.mutate(mutated, rng)
+                self.assertSameRecipes(mutated)
+
+    def test_schemas_match_models(self) :
+        # Every attribute of every model is (de)serialized, whatever the recipes fixtures hold
+        for (model, schema) in _SCHEMAS.items() :
+            if hasattr(model, "__dataclass_fields__") :
+                attributes = [x.name for x in fields(model)]
+            else :
+                attributes = [x[1:] for x in model.__slots__]
+            self.assertEqual(sorted([x.attribute for x in schema.fields]), sorted(attributes), model.__name__)
+            plan = plan_for(model)
+            self.assertEqual(json.dumps(plan.encode(model())), json.dumps(model().to_json()), model.__name__)
+
+    def test_schemas_out_of_sync_with_models(self) :
+        # A model gained a field its schema lacks
+        @dataclass(slots=True)
+        class OriginMalt(Malt) :
+            origin : str = ""
+
+            def to_json(self) -> dict:
+                return {"name" : self.name, "kgs" : self.kgs, "lbs" : self.lbs, "origin" : self.origin}
+
+        # A model renamed one of its json keys
+        @dataclass(slots=True)
+        class RenamedYeast(Yeast) :
+            def to_json(self) -> dict:
+                return {"yeastName" : self.name}
+
+        for (model, schema) in [(OriginMalt, _SCHEMAS[Malt]), (RenamedYeast, _SCHEMAS[Yeast])] :
+            _SCHEMAS[model] = schema
+            try :
+                with self.assertRaises(ValueError) :
+                    _compile(model)
+            finally :
+                del _SCHEMAS[model]
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -1,7 +1,10 @@
 from dataclasses import dataclass, field
-from typing import Any, Optional, Generic, TypeVar, Union
+from typing import Any, Optional, Generic, TypeVar, Union, overload
 
 class Jsonable :
+    # Lets subclasses use __slots__ (no per instance __dict__)
+    __slots__ = ()
+
     def _read_prop(self, key : str, content : dict, default) :
         if key in content :
             return content[key]
@@ -52,3 +55,68 @@ class JsonOptionalProperty(JsonProperty[T]):
     def __init__(self, key : str = "", val : Optional[T] = None) -> None:
         self._prop_key = key
         self.value = val
+
+
+class JsonField(Generic[T]) :
+    """Class level counterpart of JsonProperty, for models using __slots__ : the json key is stored once in the class,
+       and instances only hold the value (in the "_<attribute>" slot). Reading the attribute from an instance returns
+       a JsonFieldValue, so that instance.attribute.value and instance.attribute._prop_key keep working as with JsonProperty."""
+    __slots__ = ("_prop_key", "attribute", "slot")
+    _prop_key : str
+    attribute : str
+    slot : Any          # Member descriptor of the "_<attribute>" slot
+
+    def __init__(self, key : str) -> None:
+        self._prop_key = key
+
+    def __set_name__(self, owner : type, name : str) -> None :
+        self.attribute = name
+        if not "_" + name in owner.__dict__ :
+            raise TypeError("{} has no '_{}' slot to store its {} field".format(owner.__name__, name, name))
+        self.slot = owner.__dict__["_" + name]
+
+    @overload
+    def __get__(self, instance : None, owner : Any) -> "JsonField[T]" : ...
+    @overload
+    def __get__(self, instance : object, owner : Any) -> "JsonFieldValue[T]" : ...
+    def __get__(self, instance, owner = None) :
+        if instance is None :
+            return self
+        return JsonFieldValue(instance, self)
+
+    def __set__(self, instance : object, value : Union[JsonProperty[T], "JsonFieldValue[T]"]) -> None :
+        # Whole properties can still be assigned, their value is taken over
+        if not isinstance(value, (JsonProperty, JsonFieldValue)) :
+            raise TypeError("{} field only accepts properties, use .value to assign values".format(self.attribute))
+        self.slot.__set__(instance, value.value)
+
+class JsonFieldValue(Generic[T]) :
+    """Short lived view over the value of a JsonField, for a given instance"""
+    __slots__ = ("_instance", "_field")
+
+    def __init__(self, instance : object, field : JsonField[T]) -> None:
+        self._instance = instance
+        self._field = field
+
+    @property
+    def value(self) -> T :
+        return self._field.slot.__get__(self._instance)
+
+    @value.setter
+    def value(self, val : T) -> None :
+        self._field.slot.__set__(self._instance, val)
+
+    @property
+    def _prop_key(self) -> str :
+        return self._field._prop_key
+
+    # Same readers as JsonProperty
+    get_node = JsonProperty.get_node
+    read = JsonProperty.read
+    try_read = JsonProperty.try_read
+
+    def __eq__(self, other: object) -> bool:
+        return self.value == other.value #type: ignore
+
+    def __repr__(self) -> str :
+        return "{}({!r}, {!r})".format(type(self).__name__, self._prop_key, self.value)
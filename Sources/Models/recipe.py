@@ -3,7 +3,7 @@ from typing import Optional
 from dataclasses import dataclass, field
 
 # Local utils imports
-from .jsonable import Jsonable, JsonProperty, JsonOptionalProperty
+from .jsonable import Jsonable, JsonField
 from .record import Record, RecordBuilder, RecordKind, FileRecord, CloudRecord
 
 @dataclass
@@ -58,14 +58,15 @@ class Basics(Jsonable) :
         self.ph = self._read_prop("ph", content, 7.0)
         self.attenuation_level = self._read_prop("attenuationLevel", content, 80.0)
 
-@dataclass
+# Recipes hold lots of ingredients and steps : those models use __slots__ instead of a per instance __dict__
+@dataclass(slots=True)
 class Malt(Jsonable) :
     name : str = ""
     kgs : float = 0.0
     lbs : float = 0.0
 
     def to_json(self) -> dict:
-        return self.__dict__
+        return {"name" : self.name, "kgs" : self.kgs, "lbs" : self.lbs}
 
     def from_json(self, content: dict) -> None:
         self.name = self._read_prop("name", content, "")
@@ -75,12 +76,14 @@ class Malt(Jsonable) :
 # Sometimes extra ingredients are added in the "malt" section to depict ingredients that
 # are added during the mash process
 class ExtraMash(Malt):
+    __slots__ = ()
+
     def from_malt(self, malt : Malt) :
         self.kgs = malt.kgs
         self.lbs = malt.lbs
         self.name = malt.name
 
-@dataclass
+@dataclass(slots=True)
 class Hop(Jsonable) :
     name : str  = ""
     amount : float = 0.0
@@ -104,6 +107,8 @@ class Hop(Jsonable) :
 # Sometimes extra ingredients are added in the "malt" section to depict ingredients that
 # are added during the mash process
 class ExtraBoil(Hop):
+    __slots__ = ()
+
     def from_hop(self, hop : Hop) :
         self.amount = hop.amount
         self.attribute = hop.attribute
@@ -111,7 +116,7 @@ class ExtraBoil(Hop):
         self.when = hop.when
 
 
-@dataclass
+@dataclass(slots=True)
 class Yeast(Jsonable) :
     name : str = ""
 
@@ -119,7 +124,7 @@ class Yeast(Jsonable) :
         self.name = self._read_prop("name", content, "")
 
     def to_json(self) -> dict:
-        return self.__dict__
+        return {"name" : self.name}
 
 @dataclass
 class Ingredients(Jsonable) :
@@ -214,7 +219,8 @@ class Ingredients(Jsonable) :
     def remove_hop(self, hop : Hop) :
         self.hops.remove(hop)
 
-@dataclass
+# NOTE : slots dataclasses are rebuilt by the dataclass decorator, so argument-less super() calls can't be used in their methods
+@dataclass(slots=True)
 class Temperature(Jsonable) :
     celsius : float = 0.0       # celsius degrees
     fahrenheit : float = 0.0     # fahrenheit degrees
@@ -224,35 +230,35 @@ class Temperature(Jsonable) :
         self.fahrenheit = self._read_prop("fahrenheit", content, 0.0)
 
     def to_json(self) -> dict:
-        return self.__dict__
+        return {"celsius" : self.celsius, "fahrenheit" : self.fahrenheit}
 
-@dataclass
+@dataclass(slots=True)
 class MashTemp(Temperature) :
     time : float = 0.0          # in minutes
 
     def from_json(self, content: dict) -> None:
         self.__init__()
-        super().from_json(content)
+        Temperature.from_json(self, content)
         self.time = self._read_prop("time", content, 0.0)
 
     def to_json(self) -> dict:
-        return self.__dict__
+        return {"celsius" : self.celsius, "fahrenheit" : self.fahrenheit, "time" : self.time}
 
-@dataclass
+@dataclass(slots=True)
 class Fermentation(Temperature) :
     tips : list[str] = field(default_factory=list)
 
     def from_json(self, content: dict) -> None:
         self.__init__()
-        super().from_json(content)
+        Temperature.from_json(self, content)
         if "tips" in content:
             for tip in content["tips"] :
                 self.tips.append(tip)
 
     def to_json(self) -> dict:
-        return self.__dict__
+        return {"celsius" : self.celsius, "fahrenheit" : self.fahrenheit, "tips" : self.tips}
 
-@dataclass
+@dataclass(slots=True)
 class Twist(Jsonable) :
     name : str = ""
     amount : Optional[float] = None # This is optional as some twists are simply text hints/techniques
@@ -260,7 +266,7 @@ class Twist(Jsonable) :
     when : Optional[str] = None # used when the amount is provided
 
     def to_json(self) -> dict:
-        return self.__dict__
+        return {"name" : self.name, "amount" : self.amount, "when" : self.when}
 
     def from_json(self, content: dict) -> None:
         # Reset class
@@ -335,29 +341,33 @@ class PackagingType(Enum) :
                          PackagingType.Can.value
                          ]
 
-@dataclass
 class Recipe(Jsonable) :
-    name : JsonProperty[str]                            # Beer title
-    subtitle : JsonProperty[str]                        # Beer subtitle, contains tags and other information
-    style : JsonOptionalProperty[str]                   # Beer style
-    description : JsonProperty[str]
-    number : JsonProperty[int]                          # Refers to the "#1" tag
-    tags : JsonOptionalProperty[list[str]]              # tag line
-    first_brewed : JsonProperty[str]                    # Date of first brew
-    brewers_tip : JsonOptionalProperty[str]
-
-    basics : JsonProperty[Basics]                       # Basic properties of the beer recipe (like volume, ph, ebc, ibus, etc...)
-    ingredients : JsonProperty[Ingredients]             # Ingredients list
-    method_timings : JsonProperty[MethodTimings]        # Brewing procedures, mashing, temps, fermentation, etc..
-    packaging : JsonProperty[PackagingType]             # Most probable main packaging for this recipe
-
-    image : JsonProperty[Record]                        # Ref to file with image
-    pdf_page : JsonProperty[Record]                     # Ref to original pdf page extracted from DiyDog book
+    # Json keys are kept once in the class (JsonField), instances only hold the values, in the matching "_<attribute>" slots.
+    # recipe.name.value (and recipe.name._prop_key) work the same as with the JsonProperty attributes this class used to hold.
+    __slots__ = ("_name", "_subtitle", "_style", "_description", "_number", "_tags", "_first_brewed", "_brewers_tip",
+                 "_basics", "_ingredients", "_method_timings", "_packaging", "_image", "_pdf_page", "_food_pairing", "_parsing_errors")
+
+    name = JsonField[str]("name")                                   # Beer title
+    subtitle = JsonField[str]("subtitle")                           # Beer subtitle, contains tags and other information
+    style = JsonField[Optional[str]]("style")                       # Beer style
+    description = JsonField[str]("description")
+    number = JsonField[int]("number")                               # Refers to the "#1" tag
+    tags = JsonField[Optional[list[str]]]("tags")                   # tag line
+    first_brewed = JsonField[str]("firstBrewed")                    # Date of first brew
+    brewers_tip = JsonField[Optional[str]]("brewersTip")
+
+    basics = JsonField[Basics]("basics")                            # Basic properties of the beer recipe (like volume, ph, ebc, ibus, etc...)
+    ingredients = JsonField[Ingredients]("ingredients")             # Ingredients list
+    method_timings = JsonField[MethodTimings]("methodTimings")      # Brewing procedures, mashing, temps, fermentation, etc..
+    packaging = JsonField[PackagingType]("packaging")               # Most probable main packaging for this recipe
+
+    image = JsonField[Record]("image")                              # Ref to file with image
+    pdf_page = JsonField[Record]("pdfPage")                         # Ref to original pdf page extracted from DiyDog book
 
     # Some beers don't have food pairing associated (happens for beer #79 and #156)
-    food_pairing : JsonOptionalProperty[list[str]]
+    food_pairing = JsonField[Optional[list[str]]]("foodPairings")
     # Some beers have parsing errors along the way, so list some potential issues here and let the end user check the pdf instead
-    parsing_errors : JsonOptionalProperty[list[str]]
+    parsing_errors = JsonField[Optional[list[str]]]("parsingErrors")
 
 
     # NOTE : I had to manually override everything, because Python won't let me assign default values in the constructor.
@@ -397,54 +407,26 @@ class Recipe(Jsonable) :
                         packaging : Optional[PackagingType] = None,
                         parsing_errors : Optional[list[str]]= None,
                         food_pairing : Optional[list[str]] = None) :
-        self.image = JsonProperty('image', FileRecord())
-        self.pdf_page = JsonProperty('pdfPage', FileRecord())
-        self.description = JsonProperty("description", "")
-        self.brewers_tip = JsonOptionalProperty("brewersTip", None)
-        self.name = JsonProperty('name', "")
-        self.subtitle =  JsonProperty('subtitle', "")
-        self.style =  JsonOptionalProperty('style', None)
-        self.number =  JsonProperty('number', 0)
-        self.tags =  JsonOptionalProperty('tags', None)
-        self.first_brewed = JsonProperty("firstBrewed", "")
-        self.basics =  JsonProperty("basics", Basics())
-        self.ingredients = JsonProperty("ingredients", Ingredients())
-        self.method_timings = JsonProperty("methodTimings", MethodTimings())
-        self.packaging =  JsonProperty("packaging", PackagingType.Bottle)
-        self.parsing_errors = JsonOptionalProperty("parsingErrors", None)
-        self.food_pairing =  JsonOptionalProperty("foodPairings", None)
-
-        if name :
-            self.name.value = name
-        if description :
-            self.description.value = description
-        if subtitle :
-            self.subtitle.value = subtitle
-        if style :
-            self.style.value = style
-        if number :
-            self.number.value = number
-        if tags :
-            self.tags.value = tags
-        if first_brewed :
-            self.first_brewed.value = first_brewed
-        if basics :
-            self.basics.value = basics
-        if ingredients :
-            self.ingredients.value = ingredients
-        if brewers_tip :
-            self.brewers_tip.value = brewers_tip
-        if method_timings:
-            self.method_timings.value = method_timings
-        if packaging:
-            self.packaging.value = packaging
-        if parsing_errors :
-            self.parsing_errors.value = parsing_errors
-        if food_pairing :
-            self.food_pairing.value = food_pairing
-
-
-
+        # Falsy arguments fall back to default values
+        self._image = FileRecord()
+        self._pdf_page = FileRecord()
+        self._description = description or ""
+        self._brewers_tip = brewers_tip or None
+        self._name = name or ""
+        self._subtitle = subtitle or ""
+        self._style = style or None
+        self._number = number or 0
+        self._tags = tags or None
+        self._first_brewed = first_brewed or ""
+        self._basics = basics or Basics()
+        self._ingredients = ingredients or Ingredients()
+        self._method_timings = method_timings or MethodTimings()
+        self._packaging = packaging or PackagingType.Bottle
+        self._parsing_errors = parsing_errors or None
+        self._food_pairing = food_pairing or None
+
+    def __repr__(self) -> str :
+        return "Recipe({})".format(", ".join(["{}={!r}".format(x[1:], getattr(self, x)) for x in self.__slots__]))
 
     def to_json(self) -> dict:
         return {
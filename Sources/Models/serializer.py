@@ -0,0 +1,325 @@
+import gc
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from enum import Enum
+from typing import Any, Callable, Iterator, Optional
+
+from .jsonable import JsonProperty, JsonOptionalProperty
+from .record import Record, RecordKind, RecordBuilder, FileRecord
+from .recipe import Recipe, Basics, Volume, Malt, ExtraMash, Hop, ExtraBoil, Yeast, Ingredients, MashTemp, Fermentation, Twist, MethodTimings, PackagingType
+
+# Fast (de)serialization of recipes.
+# Every model class is described once by a schema (attributes, how their values are converted), which is compiled into a pair of flat python
+# functions : no JsonProperty lookups, no intermediate objects and no per field method calls remain when whole recipe lists are converted.
+# Json keys and default values are taken from the models themselves (JsonField keys, or camelCased dataclass fields checked against what
+# the model's to_json() writes, and the values of a default constructed instance). Schemas only state what the hand written from_json()
+# methods do on top of that (values only read when truthy, fallbacks that differ from the defaults, ...) so that both paths produce
+# the very same json and the very same objects. Compiling a schema that does not match its model (missing field, renamed key) raises a ValueError.
+
+# How values are converted
+VALUE = "value"                 # Taken as is
+COPY_LIST = "copy_list"         # List copied element by element
+MODEL = "model"                 # Nested model
+MODEL_LIST = "model_list"       # List of nested models
+ENUM = "enum"                   # Enum, stored by value
+RECORD = "record"               # File or cloud record
+
+# When decoded values are read from the json node (the fallback expression is used otherwise)
+IF_PRESENT = "present"          # Key is in the node, as Jsonable._read_prop() does
+IF_NOT_NONE = "not_none"        # Key is in the node and is not null
+IF_TRUTHY = "truthy"            # Value is truthy, as JsonProperty.try_read() does
+
+@dataclass
+class Field :
+    attribute : str
+    conversion : str = VALUE
+    when : str = IF_PRESENT
+    fallback : Optional[str] = None         # Python expression evaluated when the value is not read from the node (default value of the attribute if None)
+    model : Optional[type] = None           # Nested model or enum class
+    optional : bool = False                 # Encoded as null when the value is falsy
+
+
+@dataclass
+class Schema :
+    fields : list[Field]                    # In json keys order
+    dict_encoded : bool = False             # to_json() returns the instance __dict__
+    dict_decoded : bool = False             # from_json() takes over the json node as the instance __dict__
+    properties : bool = False               # Attributes are JsonField, values are stored in "_<attribute>" slots (Recipe)
+
+
+_SCHEMAS : dict[type, Schema] = {
+    Volume : Schema([Field("litres"), Field("galons")], dict_encoded=True, dict_decoded=True),
+    Basics : Schema([
+        Field("volume", MODEL, model=Volume),
+        Field("boil_volume", MODEL, model=Volume),
+        Field("abv"),
+        # Missing values fall back to integers in Basics.from_json()
+        Field("target_og", fallback="1000"),
+        Field("target_fg", fallback="1000"),
+        Field("ebc", fallback="0"),
+        Field("ibu", fallback="0"),
+        Field("srm"),
+        Field("ph"),
+        Field("attenuation_level")
+    ]),
+    Malt : Schema([Field("name"), Field("kgs"), Field("lbs")]),
+    Hop : Schema([Field("name"), Field("amount"), Field("when"), Field("attribute")]),
+    Yeast : Schema([Field("name")]),
+    Ingredients : Schema([
+        Field("malts", MODEL_LIST, model=Malt),
+        Field("hops", MODEL_LIST, model=Hop),
+        Field("yeasts", MODEL_LIST, model=Yeast),
+        Field("extra_mash", MODEL_LIST, IF_NOT_NONE, model=ExtraMash, optional=True),
+        Field("extra_boil", MODEL_LIST, IF_NOT_NONE, model=ExtraBoil, optional=True),
+        Field("alternative_description")
+    ]),
+    MashTemp : Schema([Field("celsius"), Field("fahrenheit"), Field("time")]),
+    Fermentation : Schema([Field("celsius"), Field("fahrenheit"), Field("tips", COPY_LIST)]),
+    Twist : Schema([Field("name"), Field("amount", when=IF_TRUTHY), Field("when", when=IF_TRUTHY)]),
+    MethodTimings : Schema([
+        Field("mash_temps", MODEL_LIST, model=MashTemp),
+        Field("mash_tips", COPY_LIST),
+        Field("fermentation", MODEL, model=Fermentation),
+        Field("twists", MODEL_LIST, IF_TRUTHY, model=Twist, optional=True)
+    ]),
+    Recipe : Schema([
+        Field("name", when=IF_TRUTHY),
+        Field("subtitle", when=IF_TRUTHY),
+        Field("style"),
+        Field("number", when=IF_TRUTHY),
+        Field("tags"),
+        Field("first_brewed", when=IF_TRUTHY),
+        Field("image", RECORD, IF_TRUTHY),
+        Field("pdf_page", RECORD, IF_TRUTHY),
+        Field("description", when=IF_TRUTHY),
+        Field("brewers_tip"),
+        Field("basics", MODEL, IF_TRUTHY, model=Basics),
+        Field("food_pairing", optional=True),
+        Field("ingredients", MODEL, IF_TRUTHY, model=Ingredients),
+        Field("method_timings", MODEL, IF_TRUTHY, model=MethodTimings),
+        Field("packaging", ENUM, IF_TRUTHY, model=PackagingType),
+        Field("parsing_errors")
+    ], properties=True)
+}
+
+# Same thing for subclasses that only add behaviour
+_SCHEMAS[ExtraMash] = _SCHEMAS[Malt]
+_SCHEMAS[ExtraBoil] = _SCHEMAS[Hop]
+
+
+def _encode_record(record : Record) -> dict :
+    if type(record) is FileRecord :
+        return {Record._static_kind_key : record.kind.value.value, record.path._prop_key : record.path.value}
+    return record.to_json()
+
+def _decode_record(content : dict) -> Optional[Record] :
+    if content[Record._static_kind_key] == RecordKind.FileSource.value :
+        # Same as FileRecord(path), without going through the (slow) subscripted generic constructors of its properties
+        record = FileRecord.__new__(FileRecord)
+        record.kind = JsonProperty(Record._static_kind_key, RecordKind.FileSource)
+        record.path = JsonOptionalProperty("path", content.get("path"))
+        return record
+    return RecordBuilder.from_json(content)
+
+def _dict_model(model : type, content : dict) -> Any :
+    instance = model.__new__(model)
+    instance.__dict__ = content
+    return instance
+
+
+@dataclass
+class Plan :
+    """Compiled encode/decode functions of a model class, along with their source code (for debugging purposes)"""
+    encode : Callable[[Any], dict]
+    decode : Callable[[dict], Any]
+    source : str = ""
+
+_PLANS : dict[type, Plan] = {}
+_NAMESPACE : dict[str, Any] = {
+    "_encode_record" : _encode_record,
+    "_decode_record" : _decode_record,
+    "_dict_model" : _dict_model,
+    "JsonProperty" : JsonProperty,
+    "JsonOptionalProperty" : JsonOptionalProperty,
+    "FileRecord" : FileRecord
+}
+
+def _encoded(model : type, value : str) -> str :
+    if _SCHEMAS[model].dict_encoded :
+        return "{}.__dict__".format(value)
+    return "_encode_{}({})".format(model.__name__, value)
+
+def _decoded(model : type, node : str) -> str :
+    if _SCHEMAS[model].dict_decoded :
+        return "_dict_model({}, {})".format(model.__name__, node)
+    return "_decode_{}({})".format(model.__name__, node)
+
+def _encode_expression(item : Field, value : str) -> str :
+    match item.conversion :
+        case "value" :
+            expression = value
+        case "copy_list" :
+            expression = "[x for x in {}]".format(value)
+        case "model" :
+            expression = _encoded(item.model, value)
+        case "model_list" :
+            expression = "[{} for x in {}]".format(_encoded(item.model, "x"), value)
+        case "enum" :
+            expression = "{}.value".format(value)
+        case "record" :
+            expression = "_encode_record({})".format(value)
+        case _ :
+            raise ValueError("Unknown conversion {}".format(item.conversion))
+    if item.optional :
+        expression = "({}) if {} else None".format(expression, value)
+    return expression
+
+def _camel_case(attribute : str) -> str :
+    parts = attribute.split("_")
+    return parts[0] + "".join([x.capitalize() for x in parts[1:]])
+
+def _default_expression(value : Any) -> str :
+    """Python expression building the given default value of an attribute"""
+    if value is None or isinstance(value, (bool, int, float, str)) :
+        return repr(value)
+    if isinstance(value, list) and len(value) == 0 :
+        return "[]"
+    _NAMESPACE[type(value).__name__] = type(value)
+    if isinstance(value, Enum) :
+        return "{}.{}".format(type(value).__name__, value.name)
+    # Nested models and records are default constructed
+    if type(value)() != value :
+        raise ValueError("Default value {!r} can't be rebuilt".format(value))
+    return "{}()".format(type(value).__name__)
+
+def _decode_expression(item : Field, key : str, fallback : str) -> str :
+    if item.conversion == VALUE :
+        # Most common case, no need to look the key up twice
+        if item.when == IF_PRESENT :
+            return "c.get({!r}, {})".format(key, fallback)
+        if item.when == IF_TRUTHY :
+            return "c.get({!r}) or {}".format(key, fallback)
+
+    if item.when == IF_PRESENT :
+        (condition, node) = ("{!r} in c".format(key), "c[{!r}]".format(key))
+    elif item.when == IF_NOT_NONE :
+        (condition, node) = ("(n := c.get({!r})) is not None".format(key), "n")
+    else :
+        (condition, node) = ("(n := c.get({!r}))".format(key), "n")
+
+    match item.conversion :
+        case "value" :
+            expression = node
+        case "copy_list" :
+            expression = "list({})".format(node)
+        case "model" :
+            expression = _decoded(item.model, node)
+        case "model_list" :
+            expression = "[{} for x in {}]".format(_decoded(item.model, "x"), node)
+        case "enum" :
+            # Enums are read by name, values that can't be converted fall back to the default one
+            members = "_members_{}".format(item.model.__name__)
+            _NAMESPACE[members] = {x.name : x for x in item.model if item.model.can_convert(x.name)}
+            expression = "{}.get({}, {})".format(members, node, fallback)
+        case "record" :
+            expression = "(_decode_record({}) or {})".format(node, fallback)
+        case _ :
+            raise ValueError("Unknown conversion {}".format(item.conversion))
+    return "{} if {} else {}".format(expression, condition, fallback)
+
+def _compile(model : type) -> Plan :
+    schema = _SCHEMAS[model]
+    name = model.__name__
+
+    # Nested models are compiled first, their functions are called by this model's ones
+    for item in schema.fields :
+        if item.model is None :
+            continue
+        _NAMESPACE[item.model.__name__] = item.model
+        if item.model in _SCHEMAS and not item.model in _PLANS :
+            _PLANS[item.model] = _compile(item.model)
+    _NAMESPACE[name] = model
+
+    # Schemas need to describe every attribute of their model, no more no less
+    by_attribute = {x.attribute : x for x in schema.fields}
+    if schema.properties :
+        attributes = [x[1:] for x in model.__slots__]
+    else :
+        attributes = [x.name for x in fields(model)]
+    if sorted(attributes) != sorted(by_attribute) :
+        raise ValueError("Schema of {} does not match its fields : {}".format(name, sorted(set(attributes) ^ set(by_attribute))))
+
+    default = model()
+    if schema.properties :
+        # Json keys are read from the class level fields, values straight from their slots
+        keys = {x.attribute : getattr(model, x.attribute)._prop_key for x in schema.fields}
+        values = {x.attribute : "o._{}".format(x.attribute) for x in schema.fields}
+        defaults = {x.attribute : getattr(default, "_" + x.attribute) for x in schema.fields}
+    else :
+        keys = {x.attribute : _camel_case(x.attribute) for x in schema.fields}
+        values = {x.attribute : "o.{}".format(x.attribute) for x in schema.fields}
+        defaults = {x.attribute : getattr(default, x.attribute) for x in schema.fields}
+    fallbacks = {x.attribute : x.fallback if x.fallback is not None else _default_expression(defaults[x.attribute]) for x in schema.fields}
+
+    # Json keys (and their order) are the ones written by the model's to_json()
+    if [keys[x.attribute] for x in schema.fields] != list(default.to_json()) :
+        raise ValueError("Schema of {} does not match its json keys : {} (expected {})".format(name, [keys[x.attribute] for x in schema.fields], list(default.to_json())))
+
+    lines = ["def _encode_{}(o) :".format(name)]
+    if schema.dict_encoded :
+        lines.append("    return o.__dict__")
+    else :
+        lines.append("    return {")
+        lines += ["        {!r} : {},".format(keys[x.attribute], _encode_expression(x, values[x.attribute])) for x in schema.fields]
+        lines.append("    }")
+    lines.append("")
+
+    lines.append("def _decode_{}(c) :".format(name))
+    if schema.properties :
+        lines.append("    o = {0}.__new__({0})".format(name))
+        for item in schema.fields :
+            lines.append("    o._{} = {}".format(item.attribute, _decode_expression(item, keys[item.attribute], fallbacks[item.attribute])))
+        lines.append("    return o")
+    elif schema.dict_decoded :
+        lines.append("    return _dict_model({}, c)".format(name))
+    else :
+        # Constructor arguments are given in declaration order
+        for (i, attribute) in enumerate(attributes) :
+            lines.append("    a{} = {}".format(i, _decode_expression(by_attribute[attribute], keys[attribute], fallbacks[attribute])))
+        lines.append("    return {}({})".format(name, ", ".join(["a{}".format(i) for i in range(len(attributes))])))
+
+    source = "\n".join(lines) + "\n"
+    exec(compile(source, "<serializer plan of {}>".format(name), "exec"), _NAMESPACE)
+    return Plan(_NAMESPACE["_encode_" + name], _NAMESPACE["_decode_" + name], source)
+
+def plan_for(model : type) -> Plan :
+    """Returns the compiled plan of a model class, compiling it upon first use"""
+    plan = _PLANS.get(model)
+    if plan is None :
+        plan = _compile(model)
+        _PLANS[model] = plan
+    return plan
+
+@contextmanager
+def collector_paused() -> Iterator[None] :
+    """Pauses the cyclic garbage collector. Converting whole databases allocates lots of containers that trigger collections over
+       and over (more than half of the conversion time), while they don't hold any reference cycle."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try :
+        yield
+    finally :
+        if enabled :
+            gc.enable()
+
+def recipes_to_json(recipes : list[Recipe]) -> list[dict] :
+    """Same as calling Recipe.to_json() on every recipe"""
+    encode = plan_for(Recipe).encode
+    with collector_paused() :
+        return [encode(x) for x in recipes]
+
+def recipes_from_json(contents : list[dict]) -> list[Recipe] :
+    """Same as calling Recipe.from_json() on a new recipe for every json node"""
+    decode = plan_for(Recipe).decode
+    with collector_paused() :
+        return [decode(x) for x in contents]
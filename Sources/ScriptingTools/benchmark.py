@@ -0,0 +1,399 @@
+from pathlib import Path
+import sys
+import time
+import argparse
+from typing import Any, Optional
+
+import numpy as np
+
+# Small benchmarking tool, used to measure some costly parts of the extraction process against real DiyDog data (read from the .cache folder).
+# Heavy modules are imported by each benchmark, so that one benchmark does not pay for the others dependencies.
+
+def print_latency_table(title : str, timings : list[tuple[str, float]]) :
+    print(title)
+    for (name, elapsed) in timings :
+        print("   {:<40} {:>8.3f}s".format(name, elapsed))
+    if len(timings) != 0 :
+        total = sum([x[1] for x in timings])
+        print("   -> total {:.3f}s, mean {:.3f}s per image\n".format(total, total / len(timings)))
+
+def load_packaging_images(cache_folder : Path, max_images : int) -> list[tuple[str, np.ndarray]] :
+    """Renders the packaging zone of the first beer pages of the cached pdf book, as the image extraction step does"""
+    from ..Utils.pdf_book import PdfBook
+    from ..Utils.image import pixmap_to_bgr
+    from ..dbextractor import PACKAGING_ZONE, FIRST_BEER_PAGE, LAST_BEER_PAGE
+
+    pdf_file = cache_folder.joinpath("diydog-2022.pdf")
+    if not pdf_file.exists() :
+        return []
+
+    images = []
+    with PdfBook(pdf_file) as book :
+        for page_number in range(FIRST_BEER_PAGE, min(LAST_BEER_PAGE, FIRST_BEER_PAGE + max_images)) :
+            images.append(("page_{}".format(page_number - FIRST_BEER_PAGE + 1), pixmap_to_bgr(book.render_zone(page_number, PACKAGING_ZONE))))
+    return images
+
+def benchmark_rembg_session(cache_folder : Path, max_images : int) :
+    """Compares the per-image background removal latency when rembg creates a new session for every call (former behavior)
+       against a single ImageExtractionContext reused for all images."""
+    import rembg
+    from ..Utils.image import ImageExtractionContext
+
+    loaded = load_packaging_images(cache_folder, max_images)
+    if len(loaded) == 0 :
+        print(f"No pdf book found in {cache_folder}, run the extraction tool first.")
+        return 1
+
+    before : list[tuple[str, float]] = []
+    for (name, img) in loaded :
+        start = time.perf_counter()
+        rembg.remove(img)
+        before.append((name, time.perf_counter() - start))
+    print_latency_table("Before : new rembg session for each image", before)
+
+    start = time.perf_counter()
+    context = ImageExtractionContext()
+    print("Image extraction context setup (model loading) : {:.3f}s".format(time.perf_counter() - start))
+
+    after : list[tuple[str, float]] = []
+    for (name, img) in loaded :
+        start = time.perf_counter()
+        rembg.remove(img, session=context.session)
+        after.append((name, time.perf_counter() - start))
+    print_latency_table("After : single reused image extraction context", after)
+    return 0
+
+
+def benchmark_contours(cache_folder : Path, max_images : int) :
+    """Compares the contour stage (perimeter and bounding box of every contour found in packaging images) of the former
+       point by point implementation against the vectorised one."""
+    import cv2
+    from skimage import measure
+    from ..Utils.image import _compute_perimeter, _compute_bounding_box
+    from ..Tests.reference_implementations import legacy_compute_perimeter, legacy_compute_bounding_box
+
+    loaded = load_packaging_images(cache_folder, max_images)
+    if len(loaded) == 0 :
+        print(f"No pdf book found in {cache_folder}, run the extraction tool first.")
+        return 1
+
+    # Same contours as the ones computed by the contouring extraction method
+    contours = [(name, measure.find_contours(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), 190)) for (name, img) in loaded]
+
+    def run(perimeter_fn, bounding_box_fn) -> tuple[list[tuple[str, float]], list] :
+        timings = []
+        results = []
+        for (name, image_contours) in contours :
+            start = time.perf_counter()
+            perimeters = [perimeter_fn(x) for x in image_contours]
+            bounding_boxes = [bounding_box_fn(x) for x in image_contours]
+            timings.append((name, time.perf_counter() - start))
+            results.append((perimeters, bounding_boxes))
+        return (timings, results)
+
+    (before, legacy_results) = run(legacy_compute_perimeter, legacy_compute_bounding_box)
+    print_latency_table("Before : point by point contour stage", before)
+    (after, results) = run(_compute_perimeter, _compute_bounding_box)
+    print_latency_table("After : vectorised contour stage", after)
+
+    print("Results are identical : {}".format(results == legacy_results))
+    print("Speed-up : x{:.1f}".format(sum([x[1] for x in before]) / max(sum([x[1] for x in after]), 1e-9)))
+    return 0
+
+
+def benchmark_extract_image(cache_folder : Path, max_images : int) :
+    """Compares the masking step of the contouring extraction method (full image mask, then cropped) against the bounding box local one."""
+    import cv2
+    from ..Utils.image import _scikit_find_biggest_contour, _extract_image
+    from ..Tests.reference_implementations import legacy_extract_image
+
+    loaded = load_packaging_images(cache_folder, max_images)
+    if len(loaded) == 0 :
+        print(f"No pdf book found in {cache_folder}, run the extraction tool first.")
+        return 1
+
+    inputs = [(name, img, _scikit_find_biggest_contour(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY))[2]) for (name, img) in loaded]
+
+    def run(extract_fn) -> tuple[list[tuple[str, float]], list[np.ndarray]] :
+        timings = []
+        results = []
+        for (name, img, contour) in inputs :
+            start = time.perf_counter()
+            results.append(extract_fn(img, contour))
+            timings.append((name, time.perf_counter() - start))
+        return (timings, results)
+
+    (before, legacy_results) = run(legacy_extract_image)
+    print_latency_table("Before : full image mask, cropped afterwards", before)
+    (after, results) = run(_extract_image)
+    print_latency_table("After : mask built within the contour bounding box", after)
+
+    print("Results are identical : {}".format(all([np.array_equal(x, y) for (x, y) in zip(results, legacy_results)])))
+    print("Speed-up : x{:.1f}".format(sum([x[1] for x in before]) / max(sum([x[1] for x in after]), 1e-9)))
+    return 0
+
+
+def benchmark_content_stream(cache_folder : Path, max_items : Optional[int]) :
+    """Compares the former line based content stream parser (whole stream decoded to str, split in lines, each line parsed again)
+       against the single pass tokenizer, over the cached raw page contents (all of them unless max_items is given)."""
+    from ..Utils.content_stream import parse_text_elements
+    from ..Tests.reference_implementations import legacy_parse_text_elements
+
+    files = sorted(cache_folder.joinpath("pdf_raw_contents").glob("*.txt"))
+    if max_items is not None :
+        files = files[:max_items]
+    if len(files) == 0 :
+        print(f"No cached raw page contents found in {cache_folder}, run the extraction tool first.")
+        return 1
+
+    inputs : list[tuple[str, bytes]] = []
+    for file in files :
+        inputs.append((file.stem, file.read_bytes()))
+
+    def run(parse_fn) -> tuple[list[tuple[str, float]], list] :
+        timings = []
+        results = []
+        for (name, data) in inputs :
+            start = time.perf_counter()
+            results.append(parse_fn(data))
+            timings.append((name, time.perf_counter() - start))
+        return (timings, results)
+
+    (before, legacy_results) = run(legacy_parse_text_elements)
+    (after, results) = run(parse_text_elements)
+    # Per file tables would be way too long here, only print the totals
+    print_latency_table("Before : line based parsing, {} pages".format(len(inputs)), [("all pages", sum([x[1] for x in before]))])
+    print_latency_table("After : single pass tokenizer, {} pages".format(len(inputs)), [("all pages", sum([x[1] for x in after]))])
+
+    mismatches = [name for (name, x, y) in zip([x[0] for x in inputs], results, legacy_results) if x != y]
+    print("Results are identical : {}".format(len(mismatches) == 0))
+    if len(mismatches) != 0 :
+        print("   Mismatching pages : {}".format(", ".join(mismatches)))
+    print("Speed-up : x{:.1f}".format(sum([x[1] for x in before]) / max(sum([x[1] for x in after]), 1e-9)))
+    return 0
+
+
+def benchmark_pdf_strings(cache_folder : Path, max_items : Optional[int]) :
+    """Compares the former character by character decoding of escape sequences against the compiled regex one,
+       over the literal strings of the Tj/TJ lines of the cached raw page contents (all pages unless max_items is given)."""
+    from ..Utils.parsing import escape_content
+    from ..Tests.reference_implementations import legacy_escape_content, legacy_extract_groups
+
+    files = sorted(cache_folder.joinpath("pdf_raw_contents").glob("*.txt"))
+    if max_items is not None :
+        files = files[:max_items]
+    lines = [x for file in files for x in file.read_bytes().decode("iso-8859-1").split("\n") if x.find("Tj") != -1 or x.find("TJ") != -1]
+    strings = [x for line in lines for x in legacy_extract_groups(line)]
+    if len(strings) == 0 :
+        print(f"No cached raw page contents found in {cache_folder}, run the extraction tool first.")
+        return 1
+
+    timings = []
+    outputs = []
+    for function in [legacy_escape_content, escape_content] :
+        start = time.perf_counter()
+        outputs.append([function(x) for x in strings])
+        timings.append(time.perf_counter() - start)
+
+    print_latency_table("Before : character by character decoding, {} strings".format(len(strings)), [("all strings", timings[0])])
+    print_latency_table("After : compiled regex, {} strings".format(len(strings)), [("all strings", timings[1])])
+    print("Throughput : {:.0f} strings/s (former implementation : {:.0f} strings/s)".format(len(strings) / max(timings[1], 1e-9), len(strings) / max(timings[0], 1e-9)))
+    print("Results are identical : {}".format(outputs[0] == outputs[1]))
+    print("Speed-up : x{:.1f}".format(timings[0] / max(timings[1], 1e-9)))
+    return 0
+
+def benchmark_page_store(cache_folder : Path, max_items : Optional[int]) :
+    """Compares reading the cached pages text contents back from their json files against reading them from a page store
+       (built in a temporary folder from the very same json files)."""
+    import json
+    import tempfile
+    from ..Models.blocks import PageBlocks
+    from ..Utils.page_store import PageStore, write_page_store
+
+    files = sorted(cache_folder.joinpath("contents").glob("page_*.json"), key=lambda x : int(x.stem.lstrip("page_")))
+    if max_items is not None :
+        files = files[:max_items]
+    if len(files) == 0 :
+        print(f"No cached page contents found in {cache_folder}, run the extraction tool first.")
+        return 1
+
+    def read_json_files() -> list[PageBlocks] :
+        pages = []
+        for file in files :
+            page = PageBlocks()
+            with open(file, "r") as stream :
+                page.from_json(json.load(stream))
+            pages.append(page)
+        return pages
+
+    start = time.perf_counter()
+    json_pages = read_json_files()
+    json_time = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp_dir :
+        store_filepath = Path(tmp_dir).joinpath("contents.bin")
+        write_page_store(store_filepath, [(x, "") for x in json_pages])
+
+        start = time.perf_counter()
+        with PageStore(store_filepath) as store :
+            open_time = time.perf_counter() - start
+            store_pages = [store.page(x.index) for x in json_pages]
+        store_time = time.perf_counter() - start
+
+    print_latency_table("Before : one json file per page, {} pages".format(len(files)), [("all pages", json_time)])
+    print_latency_table("After : page store, {} pages".format(len(files)), [("opening", open_time), ("all pages", store_time)])
+    print("Results are identical : {}".format(store_pages == json_pages))
+    print("Speed-up : x{:.1f}".format(json_time / max(store_time, 1e-9)))
+    return 0
+
+def benchmark_serializer(cache_folder : Path, rounds : int) :
+    """Round trips the extracted recipes database (json nodes -> recipes -> json nodes) with the recipes to_json()/from_json() methods
+       and with the compiled serializer plans."""
+    import json
+    from ..Models.recipe import Recipe
+    from ..Models.serializer import recipes_to_json, recipes_from_json
+
+    filepath = cache_folder.joinpath("extracted_recipes/all_recipes.json")
+    if not filepath.exists() :
+        print(f"No extracted recipes found at {filepath}, run the extraction tool first (with results aggregation).")
+        return 1
+    with open(filepath, "r") as file :
+        # Kept as text, nodes are taken over by some models and can't be shared between rounds
+        text = json.dumps(json.load(file)["recipes"])
+
+    def legacy_round_trip(contents : list[dict]) -> list[dict] :
+        recipes = []
+        for content in contents :
+            recipe = Recipe()
+            recipe.from_json(content)
+            recipes.append(recipe)
+        return [x.to_json() for x in recipes]
+
+    def plan_round_trip(contents : list[dict]) -> list[dict] :
+        return recipes_to_json(recipes_from_json(contents))
+
+    timings = []
+    outputs = []
+    for round_trip in [legacy_round_trip, plan_round_trip] :
+        elapsed = 0.0
+        for _ in range(rounds) :
+            contents = json.loads(text)
+            start = time.perf_counter()
+            output = round_trip(contents)
+            elapsed += time.perf_counter() - start
+        timings.append(elapsed)
+        outputs.append(json.dumps(output))
+
+    recipes_count = len(json.loads(text))
+    print_latency_table("Before : Recipe.to_json() / from_json(), {} rounds of {} recipes".format(rounds, recipes_count), [("all rounds", timings[0])])
+    print_latency_table("After : compiled serializer plans, {} rounds of {} recipes".format(rounds, recipes_count), [("all rounds", timings[1])])
+    print("Results are identical : {}".format(outputs[0] == outputs[1]))
+    print("Speed-up : x{:.1f}".format(timings[0] / max(timings[1], 1e-9)))
+    return 0
+
+def legacy_model_layout(value : Any, legacy_classes : dict[type, type]) -> Any :
+    """Rebuilds a loaded recipe object graph as the models used to lay it out : every ingredient/step instance holds its own __dict__
+       and recipes hold one JsonProperty object per field. Objects that don't change are reused as is."""
+    import copy
+    from dataclasses import fields, is_dataclass
+    from ..Models.jsonable import JsonField, JsonProperty
+
+    if isinstance(value, list) :
+        converted = [legacy_model_layout(x, legacy_classes) for x in value]
+        return converted if any(x is not y for (x, y) in zip(converted, value)) else value
+
+    model = type(value)
+    if hasattr(value, "__dict__") :
+        # Unchanged model, only rebuilt when its children are
+        if not is_dataclass(value) :
+            return value
+        attributes = {x.name : legacy_model_layout(getattr(value, x.name), legacy_classes) for x in fields(value)}
+        if all(attributes[x] is getattr(value, x) for x in attributes) :
+            return value
+        legacy = copy.copy(value)
+    elif is_dataclass(value) :
+        legacy = legacy_classes.setdefault(model, type("Legacy" + model.__name__, (), {}))()
+        attributes = {x.name : legacy_model_layout(getattr(value, x.name), legacy_classes) for x in fields(value)}
+    elif any(isinstance(x, JsonField) for x in vars(model).values()) :
+        # Json fields (Recipe)
+        legacy = legacy_classes.setdefault(model, type("Legacy" + model.__name__, (), {}))()
+        attributes = {}
+        for field in [x for x in vars(model).values() if isinstance(x, JsonField)] :
+            attributes[field.attribute] = JsonProperty(field._prop_key, legacy_model_layout(field.slot.__get__(value), legacy_classes))
+    else :
+        return value
+    for (name, attribute) in attributes.items() :
+        setattr(legacy, name, attribute)
+    return legacy
+
+def benchmark_models(cache_folder : Path) :
+    """Measures memory held by loaded recipes (in bytes per recipe), with the compact (__slots__) models and with the former models layout."""
+    import gc
+    import json
+    import tracemalloc
+    from ..Models.serializer import recipes_from_json
+
+    filepath = cache_folder.joinpath("extracted_recipes/all_recipes.json")
+    if not filepath.exists() :
+        print(f"No extracted recipes found at {filepath}, run the extraction tool first (with results aggregation).")
+        return 1
+    with open(filepath, "r") as file :
+        text = json.dumps(json.load(file)["recipes"])
+
+    def retained_bytes(build) -> tuple[int, Any] :
+        # Json nodes are loaded beforehand, only what's built on top of them is accounted for
+        contents = json.loads(text)
+        gc.collect()
+        tracemalloc.start()
+        start = tracemalloc.get_traced_memory()[0]
+        result = build(contents)
+        gc.collect()
+        used = tracemalloc.get_traced_memory()[0] - start
+        tracemalloc.stop()
+        return (used, result)
+
+    def legacy_load(contents : list[dict]) -> list :
+        legacy_classes : dict[type, type] = {}
+        return [legacy_model_layout(x, legacy_classes) for x in recipes_from_json(contents)]
+
+    (legacy_bytes, legacy_recipes) = retained_bytes(legacy_load)
+    (compact_bytes, recipes) = retained_bytes(recipes_from_json)
+    recipes_count = max(len(recipes), 1)
+    print("Before : former models layout, {} recipes : {:.0f} bytes per recipe".format(len(legacy_recipes), legacy_bytes / recipes_count))
+    print("After : compact models, {} recipes : {:.0f} bytes per recipe".format(len(recipes), compact_bytes / recipes_count))
+    print("Memory saved : {:.0f}%".format(100.0 * (1.0 - compact_bytes / max(legacy_bytes, 1))))
+    return 0
+
+
+def main(args) :
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["rembg_session", "contours", "extract_image", "content_stream", "pdf_strings", "page_store", "serializer", "models"], help="Choose a benchmark to run")
+    parser.add_argument("cache_folder", help="Extraction cache folder (usually Sources/.cache) where input data is read")
+    parser.add_argument("--max-items", type=int, help="Maximum number of items fed to the benchmark (defaults to 20 images, content_stream, pdf_strings and page_store use all pages)")
+    parser.add_argument("--rounds", type=int, default=100, help="Number of round trips of the recipes database (serializer benchmark)")
+    content = parser.parse_args(args)
+
+    command = content.command
+    cache_folder = Path(content.cache_folder)
+    max_images = content.max_items if content.max_items is not None else 20
+
+    if command == "rembg_session" :
+        return benchmark_rembg_session(cache_folder, max_images)
+    if command == "contours" :
+        return benchmark_contours(cache_folder, max_images)
+    if command == "extract_image" :
+        return benchmark_extract_image(cache_folder, max_images)
+    if command == "content_stream" :
+        return benchmark_content_stream(cache_folder, content.max_items)
+    if command == "pdf_strings" :
+        return benchmark_pdf_strings(cache_folder, content.max_items)
+    if command == "page_store" :
+        return benchmark_page_store(cache_folder, content.max_items)
+    if command == "serializer" :
+        return benchmark_serializer(cache_folder, content.rounds)
+    if command == "models" :
+        return benchmark_models(cache_folder)
+
+
+if __name__ == "__main__" :
+    exit(main(sys.argv[1:]))
@@ -6,30 +6,44 @@ import json
 
 from ..Models import recipe as rcp
 from ..Utils.filesystem import list_files_pattern, ensure_folder_exist
-from ..Utils.recipe_service import dump_all_recipes_to_disk
+from typing import Iterable, Iterator
+from ..Utils.recipe_service import dump_all_recipes_to_disk, iter_recipes
 
 
-def patch_all_recipes(dep_recipes_folder : Path, patch_folder : Path) -> bool:
-    ALL_RECIPES_FILENAME = "all_recipes.json"
-
-    # list available patches
+def read_patches(patch_folder : Path) -> list[rcp.Recipe] :
+    """Reads all recipe patches (recipe_<number>.json files) from the patch folder"""
     patches = list_files_pattern(patch_folder, "recipe", ".json")
-
-    # Overwrite single recipe.json files and parse them
-    if len(patches) == 0 :
-        print(f"No patches found in folder {patch_folder}.")
-        return False
-
-    print(f"Reading patches from folder : {patch_folder} ...")
     patched_recipes : list[rcp.Recipe] = []
-    patched_recipes_indexes : list[int] = []
     for patch in patches :
         patched_recipe = rcp.Recipe()
         with open(patch, 'r') as file :
             patched_recipe.from_json(json.load(file))
             print(f"Deserialized patch #{patched_recipe.number.value} : {patched_recipe.name.value}")
         patched_recipes.append(patched_recipe)
-        patched_recipes_indexes.append(patched_recipe.number.value)
+    return patched_recipes
+
+def iter_patched_recipes(recipes : Iterable[rcp.Recipe], patched_recipes : list[rcp.Recipe]) -> Iterator[rcp.Recipe] :
+    """Yields recipes, replaced by their patched version if any. Recipes order is kept."""
+    patches_by_number = {}
+    for patched_recipe in patched_recipes :
+        # First patch wins, in case the same recipe is patched twice
+        patches_by_number.setdefault(patched_recipe.number.value, patched_recipe)
+    for recipe in recipes :
+        yield patches_by_number.get(recipe.number.value, recipe)
+
+def apply_patches(recipes : Iterable[rcp.Recipe], patched_recipes : list[rcp.Recipe]) -> list[rcp.Recipe] :
+    """Replaces recipes by their patched version, if any. Recipes order is kept."""
+    return list(iter_patched_recipes(recipes, patched_recipes))
+
+def patch_all_recipes(dep_recipes_folder : Path, patch_folder : Path) -> bool:
+    ALL_RECIPES_FILENAME = "all_recipes.json"
+
+    # Overwrite single recipe.json files and parse them
+    print(f"Reading patches from folder : {patch_folder} ...")
+    patched_recipes = read_patches(patch_folder)
+    if len(patched_recipes) == 0 :
+        print(f"No patches found in folder {patch_folder}.")
+        return False
     print("Patch deserialization ok")
 
     all_recipes_file = dep_recipes_folder.joinpath(ALL_RECIPES_FILENAME)
@@ -37,27 +51,10 @@ def patch_all_recipes(dep_recipes_folder : Path, patch_folder : Path) -> bool:
         print(f"No {ALL_RECIPES_FILENAME} was found in folder {dep_recipes_folder}")
         return True
 
-    print("Reading back previous all_recipes.json file before patching ...")
-    all_recipes_parsed : list[rcp.Recipe] = []
-    with open(all_recipes_file, 'r') as file :
-        json_content = json.load(file)
-        for elem in json_content["recipes"] :
-            parsed_recipe = rcp.Recipe()
-            parsed_recipe.from_json(elem)
-
-            # While parsing, if we happen to have the patched version at hands then
-            # use it instead of the parsed version
-            if parsed_recipe.number.value in patched_recipes_indexes :
-                matching_recipe = next(filter(lambda x : x.number.value == parsed_recipe.number.value, patched_recipes))
-                all_recipes_parsed.append(matching_recipe)
-            else :
-                all_recipes_parsed.append(parsed_recipe)
-    print("Parsing ok.")
-
-
-    # Overwrite all_recipes.json with the newer version
+    # Only a handful of recipes are patched : previous recipes are streamed from the old file straight into
+    # the new one (written aside then moved in place), swapping in the patched version whenever we have one
     print("Rewriting all_recipes.json with updated dataset ...")
-    dump_all_recipes_to_disk(all_recipes_file, all_recipes_parsed)
+    dump_all_recipes_to_disk(all_recipes_file, iter_patched_recipes(iter_recipes(all_recipes_file), patched_recipes))
     print("Patching done !")
 
     return True
@@ -0,0 +1,188 @@
+import math
+import sys
+from typing import Optional
+
+import cv2
+import numpy as np
+from PIL import Image
+from skimage.draw import polygon
+
+from ..Models.blocks import Coordinates, TextElement
+
+# Former implementations of the extraction steps that were reworked for speed, frozen as they were.
+# Tests check that the new implementations give the same results, benchmarks (see ScriptingTools/benchmark.py) measure the difference.
+
+# Former point by point implementations of the contour stage, kept as a reference
+def legacy_compute_perimeter(data : np.ndarray) -> float :
+    perimeter = 0.0
+    for i in range(0,len(data)):
+        next = (i + 1) % (len(data))
+        distance = math.sqrt(math.pow(data[i][0] - data[next][0], 2) + math.pow(data[i][1] - data[next][1], 2))
+        perimeter += distance
+    return perimeter
+
+def legacy_compute_bounding_box(contour : np.ndarray) -> tuple[list[float], list[float]] :
+    x_boundaries = [sys.float_info.max, 0.0]
+    y_boundaries = [sys.float_info.max, 0.0]
+    for point in contour :
+        y_boundaries = [min(y_boundaries[0], point[0]), max(y_boundaries[1], point[0])]
+        x_boundaries = [min(x_boundaries[0], point[1]), max(x_boundaries[1], point[1])]
+    return (x_boundaries, y_boundaries)
+
+def legacy_extract_image(img : np.ndarray, contour : np.ndarray, background_color=(0,0,0,0), fit_crop_image = True) -> np.ndarray :
+    extracted_image = np.full((len(img), len(img[0]), 4), fill_value=background_color, dtype=np.uint8)
+    rr, cc = polygon(contour[:,0], contour[:,1], img.shape )
+    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    extracted_image[rr, cc, 0:3] = rgb_img[rr, cc, 0:3]
+    extracted_image[rr,cc,3] = 255
+
+    output_image = Image.fromarray(extracted_image, mode="RGBA")
+    if fit_crop_image :
+        (x_boundaries, y_boundaries) = legacy_compute_bounding_box(contour)
+        output_image = output_image.crop((x_boundaries[0], y_boundaries[0], x_boundaries[1], y_boundaries[1]))  # type: ignore
+    return np.array(output_image)
+
+
+# Former character by character pdf string decoding, kept as a reference
+def legacy_extract_groups(line : str) -> list[str] :
+    groups : list[str] = []
+    current = ""
+
+    block_parsing = False
+    for i in range(0, len(line)) :
+        if not block_parsing :
+
+            # Start of a group
+            if line[i] == "(" :
+                if i == 0 :
+                    block_parsing = True
+                elif i != 0 and line[i - 1] != "\\" :
+                    block_parsing = True
+                continue
+
+        # In that mode, we take everything that's enclosed within a group
+        else :
+            # End of a group
+            if line[i] == ")" and line[i - 1] != "\\" :
+                block_parsing = False
+                groups.append(current)
+                current = ""
+                continue
+            else :
+                current += line[i]
+
+    return groups
+
+def legacy_parse_line(line : str) -> str :
+    # We need to take out the unicode escapes if it happens to have some
+    #decoded_line = line.encode().decode("unicode-escape")
+    decoded_line = line
+    tj_index = decoded_line.find("Tj")
+    if tj_index == -1 :
+        tj_index = decoded_line.find("TJ")
+
+    inner_block = decoded_line
+
+    # Looking for a very specific pattern , usually we don't have other kind of constructs
+    # So that's why it's so tied to a specific implementation
+    if decoded_line[0] == "[" and decoded_line[tj_index - 1] == "]":
+        inner_block = decoded_line[1 : tj_index - 1]
+
+    groups = legacy_extract_groups(inner_block)
+    out = ""
+    for group in groups :
+        out += group
+
+    # Removing extra escapements
+    out = legacy_escape_content(out)
+    return out
+
+def legacy_escape_content(line : str) -> str :
+    start = 0
+    end = len(line) - 1
+    index = line.find("\\", 0, end)
+    escaped_version = ""
+    while index != -1 :
+        escaped_version += line[start : index]
+
+        # Decode hexadecmial
+        if line[index + 1] == "x" :
+            pass
+
+        # Decode octal
+        if line[index + 1].isnumeric() :
+            octal_str = line[index + 1 : index + 4]
+            character = chr(int(octal_str, 8))
+            escaped_version += character
+            start = index + 4
+            index = line.find("\\", start, end)
+            continue
+
+        # Regular case
+        escaped_version += line[index + 1]
+        start = index + 2
+        index = line.find("\\", start, end)
+    escaped_version += line[start : end + 1]
+
+    return escaped_version
+
+# Former line based content stream parser, kept as a reference
+def legacy_extract_raw_text_blocks_from_content(contents : str) -> list[list[str]] :
+    text_block_parsing = False
+    out : list[list[str]] = []
+    current : list[str] = []
+    for line in contents.split("\n") :
+        if text_block_parsing :
+            if line == "ET" :
+                text_block_parsing = False
+                out.append(current)
+                current = []
+            else :
+                current.append(line)
+        else :
+            if line == "BT" :
+                text_block_parsing = True
+    return out
+
+def legacy_text_blocks_from_raw_blocks(raw_blocks : list[list[str]]) -> list[TextElement] :
+    out : list[TextElement] = []
+    for blocks in raw_blocks :
+        current_coords = Coordinates()
+        new_element : Optional[TextElement] = None
+        for line in blocks :
+            if line.find("TJ") != -1 or line.find("Tj") != -1 :
+                if not new_element :
+                    new_element = TextElement()
+                    new_element.x = current_coords.x
+                    new_element.y = current_coords.y
+                new_element.text += legacy_parse_line(line)
+                continue
+
+            elif line.find("Tm") != -1:
+                tokens = line.split()
+                tm_index = tokens.index("Tm")
+                current_coords.x = float(tokens[tm_index - 2])
+                current_coords.y = float(tokens[tm_index - 1])
+                if new_element :
+                    out.append(new_element)
+                    new_element = None
+
+            elif line.find("Td") != -1 or line.find("TD") != -1:
+                tokens = line.split()
+                td_index = tokens.index("Td")
+                if td_index == -1 :
+                    td_index = tokens.index("TD")
+                current_coords.x += float(tokens[td_index - 2])
+                current_coords.y += float(tokens[td_index - 1])
+                if new_element :
+                    out.append(new_element)
+                    new_element = None
+
+        if new_element :
+            out.append(new_element)
+            new_element = None
+    return out
+
+def legacy_parse_text_elements(data : bytes) -> list[TextElement] :
+    contents = data.decode("iso-8859-1")
+    return legacy_text_blocks_from_raw_blocks(legacy_extract_raw_text_blocks_from_content(contents))
@@ -0,0 +1,84 @@
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import gettempdir
+
+import fitz
+
+from .. import dbextractor
+from ..dbextractor import extract_all_pages, CacheTier, FIRST_BEER_PAGE
+from ..Utils.logger import Logger
+
+CACHE_DIRS = ["CACHED_PDF_PAGES_DIR", "CACHED_CONTENT_DIR", "CACHED_PDF_RAW_CONTENT_DIR", "CACHED_BLOCKS_DIR"]
+
+class TestExtractPages(unittest.TestCase) :
+
+    tmp_dir : Path
+    previous_logger : Logger
+    previous_dirs : dict[str, Path]
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_extract_pages")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        # Cached artefacts and logs go to the temporary folder rather than to the real cache
+        self.previous_logger = dbextractor.logger
+        self.previous_dirs = {x : getattr(dbextractor, x) for x in CACHE_DIRS}
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        dbextractor.logger = self.previous_logger
+        for (name, value) in self.previous_dirs.items() :
+            setattr(dbextractor, name, value)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_book(self, beers_count : int) -> Path :
+        """Writes a small pdf book, whose beer pages only hold a few text lines"""
+        filepath = self.tmp_dir.joinpath("book.pdf")
+        document = fitz.Document()
+        for page_number in range(FIRST_BEER_PAGE + beers_count) :
+            page = document.new_page()
+            if page_number < FIRST_BEER_PAGE :
+                continue
+            # Registers the font on the page, its content stream is replaced right after
+            page.insert_text((50, 100), "x", fontsize=12)
+            contents = "BT /helv 1 Tf 12 0 0 12 40 760 Tm (#{})Tj 0 -2 Td (BEER \\(NUMBER {}\\))Tj ET".format(page_number, page_number)
+            document.update_stream(page.get_contents()[0], contents.encode("iso-8859-1"))
+        document.save(filepath.as_posix())
+        document.close()
+        return filepath
+
+    def run_extraction(self, name : str, pdf_file : Path, jobs : int, page_numbers : list[int]) :
+        cache_dir = self.tmp_dir.joinpath(name)
+        for dir_name in CACHE_DIRS :
+            setattr(dbextractor, dir_name, cache_dir.joinpath(dir_name.lower()))
+        dbextractor.logger = Logger(cache_dir.joinpath("logs.txt"))
+        pages = extract_all_pages(pdf_file, jobs, page_numbers, CacheTier.Debug)
+        with open(cache_dir.joinpath("logs.txt"), "r") as file :
+            logs = file.read()
+        return (pages, logs, cache_dir)
+
+    def test_parallel_matches_serial(self) :
+        pdf_file = self.make_book(6)
+        page_numbers = list(range(FIRST_BEER_PAGE, FIRST_BEER_PAGE + 6))
+        (serial, serial_logs, serial_dir) = self.run_extraction("serial", pdf_file, 1, page_numbers)
+        (parallel, parallel_logs, parallel_dir) = self.run_extraction("parallel", pdf_file, 2, page_numbers)
+
+        self.assertEqual([x.index for x in serial], [x - FIRST_BEER_PAGE + 1 for x in page_numbers])
+        self.assertEqual(serial[0].elements[1].text, "BEER (NUMBER {})".format(FIRST_BEER_PAGE))
+        self.assertEqual(parallel, serial)
+
+        # Workers hand their log lines back to the parent process, which writes them in page order
+        self.assertEqual(parallel_logs, serial_logs)
+        self.assertEqual(serial_logs.count("Extracting page : "), len(page_numbers))
+
+        # Workers write their artefacts in the cache folders of their parent
+        for dir_name in CACHE_DIRS :
+            serial_files = sorted(x.name for x in serial_dir.joinpath(dir_name.lower()).iterdir())
+            parallel_files = sorted(x.name for x in parallel_dir.joinpath(dir_name.lower()).iterdir())
+            self.assertEqual(len(serial_files), len(page_numbers))
+            self.assertEqual(parallel_files, serial_files)
+
+if __name__ == "__main__" :
+    unittest.main()
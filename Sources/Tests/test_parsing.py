@@ -1,5 +1,9 @@
+import re
+import random
 import unittest
-from ..Utils.parsing import parse_line, escape_content
+from ..Utils.parsing import escape_content, scan_numeric_fields, NumericFields, NUMERICS_PATTERN, DEGREES_PATTERN
+from ..Utils.content_stream import parse_text_elements
+from .reference_implementations import legacy_escape_content
 
 class TestParsing(unittest.TestCase) :
     def test_parse_line(self) :
@@ -23,9 +27,10 @@ class TestParsing(unittest.TestCase) :
         ]
 
         for line in content_list :
-            # We need to take out the unicode escapes if it happens to have some
-            parsed = parse_line(line[0])
-            self.assertEqual(parsed, line[1], "(parsed vs expected)")
+            # Text showing operations are read within a text object, operator is added when the line lacks it
+            operation = line[0] if line[0].endswith(("Tj", "TJ")) else line[0] + "Tj"
+            parsed = parse_text_elements("BT\n{}\nET".format(operation).encode("iso-8859-1"))
+            self.assertEqual(parsed[0].text, line[1], "(parsed vs expected)")
 
     def test_escape_string(self) :
         test_string = R"This is a string with \\ an \\\\ escape sequence"
@@ -46,6 +51,69 @@ class TestParsing(unittest.TestCase) :
         print(escaped)
         self.assertEqual(escaped, expected)
 
+    def call(self, function, line : str) :
+        """Returns what function returns, or the type of the exception it raised"""
+        try :
+            return function(line)
+        except Exception as e :
+            return type(e)
+
+    def random_lines(self, count : int, seed : int) -> list[str] :
+        # Small alphabet, so that escape sequences and their corner cases show up a lot. Pdf strings are iso-8859-1 decoded and
+        # line continuations are checked separately
+        alphabet = ["\\", "\\", "(", ")", " ", "0", "1", "7", "8", "9", "x", "a", "B", "%", "\u00e9", "\u00bd", "_"]
+        rng = random.Random(seed)
+        return ["".join(rng.choices(alphabet, k=rng.randint(0, 24))) for _ in range(count)]
+
+    def test_equivalence_with_former_implementation(self) :
+        # Property based : both implementations give the same output whenever the former one could decode the input,
+        # octal sequences swallowing the next characters aside (see below)
+        for line in self.random_lines(20000, 0) :
+            if re.search(R"\\[0-7]{1,2}[ _]", line) :
+                continue
+            try :
+                expected = legacy_escape_content(line)
+            except ValueError :
+                continue
+            self.assertEqual(escape_content(line), expected, repr(line))
+
+    def test_differences_with_former_implementation(self) :
+        # Malformed octal sequences used to raise
+        for (line, expected) in [(R"\8", "8"), (R"\1a", "\x01a"), (R"\17x", "\x0fx"), (R"\1 a", "\x01 a")] :
+            self.assertRaises(ValueError, legacy_escape_content, line)
+            self.assertEqual(escape_content(line), expected)
+
+        # Or swallowed the characters following them, when int() happened to accept them
+        self.assertEqual(legacy_escape_content(R"\77 x"), "?x")
+        self.assertEqual(escape_content(R"\77 x"), "? x")
+        self.assertEqual(legacy_escape_content(R"\1_7"), "\x0f")
+        self.assertEqual(escape_content(R"\1_7"), "\x01_7")
+
+        # Line continuations used to be kept
+        self.assertEqual(legacy_escape_content("Line\\\ncontinued"), "Line\ncontinued")
+        self.assertEqual(escape_content("Line\\\ncontinued"), "Linecontinued")
+        self.assertEqual(escape_content("Line\\\r\ncontinued\\\r"), "Linecontinued")
+
+    def test_numeric_fields(self) :
+        self.assertEqual(scan_numeric_fields("65°C"), NumericFields(leading=65.0, first=65.0, degrees=65.0))
+        self.assertEqual(scan_numeric_fields("Mash at 66.5 °C / 152°F"), NumericFields(leading=None, first=66.5, degrees=66.5))
+        self.assertEqual(scan_numeric_fields("1.2.3°C"), NumericFields(leading=1.2, first=1.2, degrees=2.3))
+        self.assertEqual(scan_numeric_fields("N/A"), NumericFields())
+
+    def test_numeric_fields_same_as_separate_patterns(self) :
+        alphabet = ["0", "1", "5", "9", ".", " ", "°", "C", "F", "g", "k", "-", "%", "x"]
+        rng = random.Random(2)
+        for _ in range(20000) :
+            text = "".join(rng.choices(alphabet, k=rng.randint(0, 12)))
+            fields = scan_numeric_fields(text)
+
+            match = NUMERICS_PATTERN.match(text)
+            self.assertEqual(fields.leading, float(match.groups()[0]) if match else None, repr(text))
+            matches = NUMERICS_PATTERN.findall(text)
+            self.assertEqual(fields.first, float(matches[0]) if matches else None, repr(text))
+            matches = DEGREES_PATTERN.findall(text)
+            self.assertEqual(fields.degrees, float(matches[0]) if matches else None, repr(text))
+
 
 if __name__ == "__main__" :
     unittest.main()
\ No newline at end of file
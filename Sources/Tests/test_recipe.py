@@ -1,8 +1,62 @@
 import re
+import shutil
 import unittest
-from ..dbextractor import pre_process_malts, TextElement, TextElement, group_in_distinct_columns
+from pathlib import Path
+from tempfile import gettempdir
+
+from .. import dbextractor
+from ..dbextractor import pre_process_malts, TextElement, TextElement, group_in_distinct_columns, parse_all_recipes, PageBlocks
+from ..Utils.logger import Logger
 
 class TestRecipe(unittest.TestCase) :
+
+    tmp_dir : Path
+    previous_logger : Logger
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_recipe")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+        # Parsing logs go to the temporary folder rather than to the real cache
+        self.previous_logger = dbextractor.logger
+        dbextractor.logger = Logger(self.tmp_dir.joinpath("logs.txt"))
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        dbextractor.logger = self.previous_logger
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def recipe_page(self, number : int) -> PageBlocks :
+        """Builds a minimal page, laid out like the book pages (header, then 3 columns of categories)"""
+        rows = [
+            # Header
+            (40, 760, "#{}".format(number)), (40, 740, "PUNK IPA"), (300, 760, "FIRST BREWED 2007"),
+            (40, 700, "ABV"), (100, 700, "IBU"), (160, 700, "OG"), (40, 690, "5.6%"), (100, 690, "40"), (160, 690, "1056"),
+            (300, 720, "TROPICAL."),
+
+            # Left column
+            (40, 620, "THIS BEER IS"), (40, 610, "A light tropical ale."),
+            (40, 560, "BASICS"), (40, 550, "VOLUME"), (100, 550, "20L"), (150, 550, "5.3gal"),
+            (40, 540, "TARGET FG"), (100, 540, "1010"), (40, 530, "PH"), (100, 530, "4.4"),
+            (40, 520, "ATTENUATION LEVEL"), (100, 520, "80%"),
+            (40, 480, "FOOD PAIRING"), (40, 470, "Spicy food"),
+
+            # Middle column (the "MALT" label is misplaced in the pdf as well)
+            (200, 620, "INGREDIENTS"), (900, 300, "MALT"),
+            (205, 600, "Extra Pale"), (260, 600, "5.3kg"), (300, 600, "11.7lb"),
+            (205, 580, "HOPS"), (260, 575, "(g)"), (290, 575, "Add"), (330, 575, "Attribute"),
+            (205, 565, "Ahtanum"), (260, 565, "25"), (290, 565, "Start"), (330, 565, "Bitter"),
+            (205, 540, "YEAST"), (205, 530, "Wyeast 1056"),
+            (200, 500, "METHOD / TIMINGS"), (205, 490, "MASH TEMP"), (205, 480, "65°C"), (250, 480, "149°F"), (300, 480, "75mins"),
+            (205, 460, "FERMENTATION"), (205, 450, "19°C"), (250, 450, "66°F"),
+            (205, 430, "BREWHOUSE TWIST"), (205, 420, "Orange zest"), (250, 420, "10g"), (300, 420, "Boil"),
+
+            # Right column
+            (400, 620, "PACKAGING"), (400, 610, "KEG ONLY"),
+            (400, 560, "BREWER\x92S TIP"), (400, 550, "Use fresh hops."),
+        ]
+        return PageBlocks(elements=[TextElement(x=x, y=y, text=text) for (x, y, text) in rows], index=number)
     def test_pre_process_malts_simple_case(self) :
         elements : list[TextElement] = [
             TextElement(x=216.1984, y=595.9623, text='Extra Pale'),
@@ -108,5 +162,36 @@ class TestRecipe(unittest.TestCase) :
         columns = group_in_distinct_columns(elements)
         self.assertEqual(len(columns), 3)
 
+    def test_parse_recipe_page(self) :
+        (recipe, errors) = dbextractor.parse_page_recipe(12, self.recipe_page(12))
+        self.assertEqual(errors, [])
+        assert(recipe)
+        self.assertEqual(recipe.number.value, 12)
+        self.assertEqual(recipe.name.value, "Punk Ipa")
+        self.assertEqual(recipe.basics.value.abv, 5.6)
+        self.assertEqual(recipe.basics.value.volume.litres, 20.0)
+        self.assertEqual([x.name for x in recipe.ingredients.value.malts], ["Extra Pale"])
+        self.assertEqual([(x.name, x.amount, x.when) for x in recipe.ingredients.value.hops], [("Ahtanum", 25.0, "Start")])
+        self.assertEqual(recipe.method_timings.value.mash_temps[0].time, 75.0)
+        self.assertEqual([x.name for x in recipe.method_timings.value.twists], ["Orange zest"])
+        self.assertEqual(recipe.food_pairing.value, ["Spicy food"])
+        self.assertEqual(recipe.brewers_tip.value, "Use fresh hops.")
+
+    def test_parse_all_recipes_keeps_order(self) :
+        # Odd pages don't have any category and can't be parsed, their error reports come back along with the results
+        numbers = list(range(1, 9))
+        jobs_list = [(x, self.recipe_page(x) if x % 2 == 0 else PageBlocks(elements=[TextElement(x=10, y=400, text="page {}".format(x))], index=x)) for x in numbers]
+        serial = parse_all_recipes(jobs_list, 1)
+        parallel = parse_all_recipes(jobs_list, 2)
+
+        self.assertEqual([x[0].number.value if x[0] else None for x in serial], [x if x % 2 == 0 else None for x in numbers])
+        self.assertEqual([x[0] for x in parallel], [x[0] for x in serial])
+        self.assertEqual([x[1][:2] for x in parallel], [x[1][:2] for x in serial])
+        self.assertEqual([x[1][0] for x in serial if x[1]], ["Could not extract recipe from beer {}".format(x) for x in numbers if x % 2 != 0])
+
+        # Workers hand their log lines back to the parent, which writes them to its own log file
+        with open(self.tmp_dir.joinpath("logs.txt"), "r") as file :
+            self.assertEqual(file.read().count("Parsing recipe from page"), 2 * len(numbers))
+
 if __name__ == "__main__" :
     unittest.main()
\ No newline at end of file
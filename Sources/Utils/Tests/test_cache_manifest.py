@@ -0,0 +1,112 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import gettempdir
+
+from ..cache_manifest import *
+
+class TestCacheManifest(unittest.TestCase) :
+
+    tmp_dir : Path
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_cache_manifest")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_artefact(self, name : str, content : str) -> Path :
+        filepath = self.tmp_dir.joinpath(name)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, "w") as file :
+            file.write(content)
+        return filepath
+
+    def test_missing_stage_is_stale(self) :
+        manifest = CacheManifest()
+        self.assertFalse(manifest.is_stage_fresh(1, STAGE_TEXT, "hash", "1", self.tmp_dir))
+
+    def test_recorded_stage_is_fresh(self) :
+        artefact = self.write_artefact("contents/page_1.json", "Test !")
+        manifest = CacheManifest()
+        manifest.record_stage(1, STAGE_TEXT, "hash", "1", self.tmp_dir, [artefact])
+        self.assertTrue(manifest.is_stage_fresh(1, STAGE_TEXT, "hash", "1", self.tmp_dir))
+        self.assertEqual(manifest.artefact_hash(1, STAGE_TEXT, artefact, self.tmp_dir), hash_file(artefact))
+
+    def test_stage_is_stale_when_inputs_change(self) :
+        artefact = self.write_artefact("contents/page_1.json", "Test !")
+        manifest = CacheManifest()
+        manifest.record_stage(1, STAGE_TEXT, "hash", "1", self.tmp_dir, [artefact])
+        self.assertFalse(manifest.is_stage_fresh(1, STAGE_TEXT, "other hash", "1", self.tmp_dir))
+        self.assertFalse(manifest.is_stage_fresh(1, STAGE_TEXT, "hash", "2", self.tmp_dir))
+        self.assertFalse(manifest.is_stage_fresh(2, STAGE_TEXT, "hash", "1", self.tmp_dir))
+
+    def test_stage_is_stale_when_artefact_changes(self) :
+        artefact = self.write_artefact("contents/page_1.json", "Test !")
+        manifest = CacheManifest()
+        manifest.record_stage(1, STAGE_TEXT, "hash", "1", self.tmp_dir, [artefact])
+
+        self.write_artefact("contents/page_1.json", "Tost !")
+        self.assertFalse(manifest.is_stage_fresh(1, STAGE_TEXT, "hash", "1", self.tmp_dir))
+
+        os.remove(artefact)
+        self.assertFalse(manifest.is_stage_fresh(1, STAGE_TEXT, "hash", "1", self.tmp_dir))
+
+    def test_touched_artefact_with_same_content_is_fresh(self) :
+        artefact = self.write_artefact("contents/page_1.json", "Test !")
+        manifest = CacheManifest()
+        manifest.record_stage(1, STAGE_TEXT, "hash", "1", self.tmp_dir, [artefact])
+
+        stat = artefact.stat()
+        os.utime(artefact, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        self.assertTrue(manifest.is_stage_fresh(1, STAGE_TEXT, "hash", "1", self.tmp_dir))
+
+    def test_missing_artefacts_are_not_recorded(self) :
+        artefact = self.write_artefact("images/page_1/cropped.png", "Test !")
+        missing = self.tmp_dir.joinpath("images/page_1/extracted_silhouette.png")
+        manifest = CacheManifest()
+        manifest.record_stage(1, STAGE_IMAGES, "hash", "1", self.tmp_dir, [artefact, missing], {"packaging" : "Bottle"})
+        self.assertTrue(manifest.is_stage_fresh(1, STAGE_IMAGES, "hash", "1", self.tmp_dir))
+        self.assertEqual(manifest.artefact_hash(1, STAGE_IMAGES, missing, self.tmp_dir), "")
+
+    def test_save_and_load(self) :
+        source = self.write_artefact("source.pdf", "Not really a pdf")
+        artefact = self.write_artefact("contents/page_1.json", "Test !")
+        manifest = CacheManifest()
+        manifest.record_source(source)
+        manifest.get_page(1).source_hash = "hash"
+        manifest.record_stage(1, STAGE_IMAGES, "hash", "1", self.tmp_dir, [artefact], {"packaging" : "Keg"})
+
+        manifest_filepath = self.tmp_dir.joinpath("manifest.json")
+        manifest.save(manifest_filepath)
+        read_back = CacheManifest.load(manifest_filepath)
+
+        self.assertEqual(read_back, manifest)
+        self.assertTrue(read_back.source_unchanged(source))
+        self.assertTrue(read_back.is_stage_fresh(1, STAGE_IMAGES, "hash", "1", self.tmp_dir))
+
+    def test_load_missing_or_corrupted_manifest(self) :
+        manifest_filepath = self.tmp_dir.joinpath("manifest.json")
+        self.assertEqual(CacheManifest.load(manifest_filepath), CacheManifest())
+
+        self.write_artefact("manifest.json", "{ not json")
+        self.assertEqual(CacheManifest.load(manifest_filepath), CacheManifest())
+
+    def test_source_unchanged(self) :
+        source = self.write_artefact("source.pdf", "Not really a pdf")
+        manifest = CacheManifest()
+        self.assertFalse(manifest.source_unchanged(source))
+
+        manifest.record_source(source)
+        self.assertTrue(manifest.source_unchanged(source))
+
+        self.write_artefact("source.pdf", "Still not a pdf")
+        self.assertFalse(manifest.source_unchanged(source))
+
+
+if __name__ == "__main__" :
+    unittest.main()
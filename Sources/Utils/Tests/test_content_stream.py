@@ -0,0 +1,80 @@
+import unittest
+
+from ..content_stream import parse_text_elements, decode_string
+from ...Models.blocks import TextElement
+from ...Tests.reference_implementations import legacy_parse_text_elements
+
+# Looks like what's found in the DiyDog book pages
+DIYDOG_LIKE_STREAM = b"""q
+0 0 595.276 841.89 re
+W n
+BT
+/T1_2 1 Tf
+0 Tc 0 Tw 0 Ts 100 Tz 0 Tr 12 0 0 12 36.85 790.2 Tm
+[(V)48 (OL)]TJ
+/T1_0 1 Tf
+(65\\260C)Tj
+0 -2.5 Td
+(X \\(a\\) Y)Tj
+T*
+[(Hops)-250 (\\050and\\051 malts)]TJ
+ET
+Q
+BT
+/T1_1 1 Tf
+1 0 0 1 300.5 -10 Tm
+(IBU)Tj
+ET
+"""
+
+class TestContentStream(unittest.TestCase) :
+
+    def test_matches_line_based_parser(self) :
+        elements = parse_text_elements(DIYDOG_LIKE_STREAM)
+        self.assertEqual(elements, legacy_parse_text_elements(DIYDOG_LIKE_STREAM))
+        self.assertEqual(elements, [
+            TextElement(x=36.85, y=790.2, text="VOL65°C"),
+            TextElement(x=36.85, y=787.7, text="X (a) YHops(and) malts"),
+            TextElement(x=300.5, y=-10.0, text="IBU")
+        ])
+
+    def test_raw_blocks(self) :
+        blocks : list[bytes] = []
+        parse_text_elements(DIYDOG_LIKE_STREAM, blocks)
+        self.assertEqual(len(blocks), 2)
+        self.assertEqual(blocks[1], b"\n/T1_1 1 Tf\n1 0 0 1 300.5 -10 Tm\n(IBU)Tj\n")
+
+    def test_operators_sharing_lines(self) :
+        data = b"BT /F1 9 Tf 1 0 0 1 10 20 Tm (A)Tj (B) Tj 5 5 Td[(C)]TJ ET BT(D)Tj ET"
+        self.assertEqual(parse_text_elements(data), [
+            TextElement(x=10.0, y=20.0, text="AB"),
+            TextElement(x=15.0, y=25.0, text="C"),
+            TextElement(x=0.0, y=0.0, text="D")
+        ])
+
+    def test_next_line_offsets_and_multiline_strings(self) :
+        # Former parser could not read any of these (TD operator, strings spanning several lines)
+        data = b"BT\n1 0 0 1 10 20 Tm\n-1.5 -2 TD\n(Line\\\ncontinued)Tj\n0.5 1 Td\n(Two\nlines)Tj\nET"
+        self.assertEqual(parse_text_elements(data), [
+            TextElement(x=8.5, y=18.0, text="Linecontinued"),
+            TextElement(x=9.0, y=19.0, text="Two\nlines")
+        ])
+
+    def test_nested_parentheses_and_operators_in_strings(self) :
+        data = b"BT\n10 10 Td\n(a (nested ET) string Tm)Tj\nET"
+        self.assertEqual(parse_text_elements(data), [TextElement(x=10.0, y=10.0, text="a (nested ET) string Tm")])
+
+    def test_text_outside_text_objects_is_ignored(self) :
+        data = b"(not text)Tj\n/Im0 Do\nBI /W 2 /H 1 ID \x00BT(\xff EI\nBT\n(Text)Tj\nET\n(after)Tj"
+        self.assertEqual(parse_text_elements(data), [TextElement(text="Text")])
+
+    def test_unterminated_text_object_is_dropped(self) :
+        self.assertEqual(parse_text_elements(b"BT\n(A)Tj\nET\nBT\n(B)Tj\n"), [TextElement(text="A")])
+
+    def test_decode_string(self) :
+        self.assertEqual(decode_string(b"\\101\\60x\\\\\\n"), "A0x\\n")
+        self.assertEqual(decode_string(b"caf\xe9"), "café")
+
+
+if __name__ == "__main__" :
+    unittest.main()
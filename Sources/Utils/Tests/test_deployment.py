@@ -0,0 +1,120 @@
+import os
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import gettempdir
+
+import fitz
+import numpy as np
+
+from ..deployment import *
+from ..pdf_book import PdfBook
+from ..image import save_bgr_image
+from ...dbextractor import media_deploy_items
+
+class TestDeployment(unittest.TestCase) :
+
+    tmp_dir : Path
+    deploy_dir : Path
+    manifest_filepath : Path
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_deployment")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.deploy_dir = self.tmp_dir.joinpath("deployed")
+        self.manifest_filepath = self.tmp_dir.joinpath("deploy_manifest.json")
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def write_source(self, name : str, content : str) -> Path :
+        filepath = self.tmp_dir.joinpath("cache", name)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, "w") as file :
+            file.write(content)
+        return filepath
+
+    def make_items(self) -> list[DeployItem] :
+        return [
+            DeployItem(self.write_source("recipe_1.json", "{}"), "recipes/recipe_1.json", linkable=False),
+            DeployItem(self.write_source("page_1.pdf", "%PDF"), "pdf_pages/page_1.pdf")
+        ]
+
+    def test_deployed_tree(self) :
+        items = self.make_items()
+        counts = deploy_files(items, self.deploy_dir, self.manifest_filepath)
+        self.assertEqual(counts[PLACED_HARDLINK], 1)
+        self.assertEqual(counts[PLACED_REFLINK] + counts[PLACED_COPY], 1)
+
+        self.assertEqual(self.deploy_dir.joinpath("recipes/recipe_1.json").read_text(), "{}")
+        self.assertEqual(self.deploy_dir.joinpath("pdf_pages/page_1.pdf").read_text(), "%PDF")
+        self.assertTrue(os.path.samefile(items[1].source, self.deploy_dir.joinpath("pdf_pages/page_1.pdf")))
+
+        # Recipes are modified in place by other tools, that should never reach the cached files
+        with open(self.deploy_dir.joinpath("recipes/recipe_1.json"), "w") as file :
+            file.write("patched")
+        self.assertEqual(items[0].source.read_text(), "{}")
+
+    def test_unchanged_copies_are_taken_over(self) :
+        items = self.make_items()
+        deploy_files(items, self.deploy_dir, self.manifest_filepath)
+        former_tree = self.deploy_dir.resolve()
+
+        counts = deploy_files(items, self.deploy_dir, self.manifest_filepath)
+        self.assertEqual(counts[PLACED_UNCHANGED], 1)
+        self.assertNotEqual(self.deploy_dir.resolve(), former_tree)
+        self.assertFalse(former_tree.exists())
+
+        # Deployed copy was modified, it is deployed again
+        with open(self.deploy_dir.joinpath("recipes/recipe_1.json"), "w") as file :
+            file.write("patched")
+        counts = deploy_files(items, self.deploy_dir, self.manifest_filepath)
+        self.assertEqual(counts[PLACED_UNCHANGED], 0)
+        self.assertEqual(self.deploy_dir.joinpath("recipes/recipe_1.json").read_text(), "{}")
+
+    def test_former_plain_directory_is_replaced(self) :
+        self.deploy_dir.joinpath("recipes").mkdir(parents=True)
+        self.deploy_dir.joinpath("recipes/stale.json").write_text("stale")
+
+        deploy_files(self.make_items(), self.deploy_dir, self.manifest_filepath)
+        self.assertFalse(self.deploy_dir.joinpath("recipes/stale.json").exists())
+        self.assertTrue(self.deploy_dir.joinpath("recipes/recipe_1.json").exists())
+
+
+    def test_rewritten_cache_files_dont_reach_deployed_ones(self) :
+        # Two pages book, whose pages are cached in turn at the same location
+        book_filepath = self.tmp_dir.joinpath("book.pdf")
+        document = fitz.Document()
+        for text in ["First page", "Second page"] :
+            document.new_page().insert_text((50, 100), text)
+        document.save(book_filepath.as_posix())
+        document.close()
+
+        cached_pages_dir = self.tmp_dir.joinpath("cache/pages")
+        cached_images_dir = self.tmp_dir.joinpath("cache/images")
+        cached_page = cached_pages_dir.joinpath("page_1.pdf")
+        cached_image = cached_images_dir.joinpath("page_1/extracted_silhouette.png")
+        with PdfBook(book_filepath) as book :
+            book.save_single_page(0, cached_page)
+            save_bgr_image(cached_image, np.zeros((4, 4, 3), dtype=np.uint8))
+            counts = deploy_files(media_deploy_items(cached_images_dir, cached_pages_dir), self.deploy_dir, self.manifest_filepath)
+            self.assertEqual(counts[PLACED_HARDLINK], 2)
+
+            deployed_page = self.deploy_dir.joinpath("pdf_pages/page_1.pdf")
+            deployed_image = self.deploy_dir.joinpath("images/beer_1.png")
+            (page_bytes, image_bytes) = (deployed_page.read_bytes(), deployed_image.read_bytes())
+
+            # Next extraction writes new contents to the cache
+            book.save_single_page(1, cached_page)
+            save_bgr_image(cached_image, np.full((4, 4, 3), 255, dtype=np.uint8))
+
+        self.assertNotEqual(cached_page.read_bytes(), page_bytes)
+        self.assertNotEqual(cached_image.read_bytes(), image_bytes)
+        self.assertEqual(deployed_page.read_bytes(), page_bytes)
+        self.assertEqual(deployed_image.read_bytes(), image_bytes)
+        self.assertEqual(sorted(x.name for x in cached_pages_dir.iterdir()), ["page_1.pdf"])
+
+if __name__ == "__main__" :
+    unittest.main()
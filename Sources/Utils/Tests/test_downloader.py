@@ -0,0 +1,136 @@
+import re
+import shutil
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tempfile import gettempdir
+
+from ..downloader import *
+from ..cache_manifest import hash_bytes
+from ..logger import Logger
+
+class FakePdfHandler(BaseHTTPRequestHandler) :
+    """Serves a fixed payload, honoring Range requests unless told otherwise.
+       Stands in for the remote server hosting the DiyDog pdf book."""
+    payload : bytes = b""
+    support_range : bool = True
+    truncate_at : int = 0           # When non zero, connection is dropped after sending that many bytes (whole file only)
+
+    def log_message(self, format, *args) :
+        pass
+
+    def do_GET(self) :
+        range_header = self.headers.get("Range")
+        start = 0
+        if range_header and self.support_range :
+            start = int(re.match(r"bytes=(\d+)-", range_header).group(1))
+            if start >= len(self.payload) :
+                self.send_response(416)
+                self.send_header("Content-Range", "bytes */{}".format(len(self.payload)))
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes {}-{}/{}".format(start, len(self.payload) - 1, len(self.payload)))
+        else :
+            self.send_response(200)
+
+        body = self.payload[start:]
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.truncate_at != 0 and start == 0 :
+            body = body[:self.truncate_at]
+        self.wfile.write(body)
+
+
+class TestDownloader(unittest.TestCase) :
+
+    tmp_dir : Path
+    server : ThreadingHTTPServer
+    url : str
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_downloader")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.logger = Logger(self.tmp_dir.joinpath("log.txt"))
+
+        FakePdfHandler.payload = bytes(range(256)) * 4096 * 3 + b"%%EOF"
+        FakePdfHandler.support_range = True
+        FakePdfHandler.truncate_at = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakePdfHandler)
+        self.url = "http://127.0.0.1:{}/book.pdf".format(self.server.server_address[1])
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def read(self, filepath : Path) -> bytes :
+        with open(filepath, "rb") as file :
+            return file.read()
+
+    def test_full_download(self) :
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        self.assertTrue(download_pdf(self.url, output_file, self.logger, hash_bytes(FakePdfHandler.payload)))
+        self.assertEqual(self.read(output_file), FakePdfHandler.payload)
+        self.assertFalse(partial_filepath(output_file).exists())
+
+    def test_resume_partial_download(self) :
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        with open(partial_filepath(output_file), "wb") as file :
+            file.write(FakePdfHandler.payload[:1000])
+
+        self.assertTrue(download_pdf(self.url, output_file, self.logger))
+        self.assertEqual(self.read(output_file), FakePdfHandler.payload)
+
+    def test_already_complete_partial_download(self) :
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        with open(partial_filepath(output_file), "wb") as file :
+            file.write(FakePdfHandler.payload)
+
+        self.assertTrue(download_pdf(self.url, output_file, self.logger))
+        self.assertEqual(self.read(output_file), FakePdfHandler.payload)
+
+    def test_server_without_range_support_restarts(self) :
+        FakePdfHandler.support_range = False
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        with open(partial_filepath(output_file), "wb") as file :
+            file.write(b"garbage")
+
+        self.assertTrue(download_pdf(self.url, output_file, self.logger))
+        self.assertEqual(self.read(output_file), FakePdfHandler.payload)
+
+    def test_dropped_connection_is_resumed(self) :
+        FakePdfHandler.truncate_at = DOWNLOAD_CHUNK_SIZE + 5000
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        self.assertTrue(download_pdf(self.url, output_file, self.logger))
+        self.assertEqual(self.read(output_file), FakePdfHandler.payload)
+
+    def test_checksum_mismatch(self) :
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        self.assertFalse(download_pdf(self.url, output_file, self.logger, expected_sha256="0" * 64, max_attempts=1))
+        self.assertFalse(output_file.exists())
+        self.assertFalse(partial_filepath(output_file).exists())
+
+    def test_not_found(self) :
+        output_file = self.tmp_dir.joinpath("book.pdf")
+        self.server.RequestHandlerClass = NotFoundHandler
+        self.assertFalse(download_pdf(self.url, output_file, self.logger, max_attempts=1))
+        self.assertFalse(output_file.exists())
+
+
+class NotFoundHandler(BaseHTTPRequestHandler) :
+    def log_message(self, format, *args) :
+        pass
+
+    def do_GET(self) :
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+if __name__ == "__main__" :
+    unittest.main()
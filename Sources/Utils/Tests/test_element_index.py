@@ -0,0 +1,131 @@
+import math
+import random
+import unittest
+from typing import Optional
+
+from ..element_index import TextElementIndex, TextLabelIndex
+from ...Models.blocks import TextElement
+from ...dbextractor import find_element
+
+# Former linear scans looking for the closest text element, used as a reference
+def legacy_find_closest_x_element(elements : list[TextElement], reference : TextElement) -> TextElement :
+    min_distance = 1000
+    closest : TextElement = elements[0]
+    for element in elements :
+        distance = abs(reference.x - element.x)
+        if distance < min_distance :
+            closest = element
+            min_distance = distance
+
+    return closest
+
+def legacy_find_closest_element(elements : list[TextElement], reference : TextElement) -> TextElement :
+    min_distance = 1000
+    closest : TextElement = elements[0]
+    for element in elements :
+        distance = math.sqrt(math.pow(reference.x - element.x, 2) + math.pow(reference.y - element.y, 2))
+
+        # Case where we stumble upon our reference, that's not the one we're aiming for !
+        if distance == 0 and element == reference:
+            continue
+
+        if distance < min_distance :
+            closest = element
+            min_distance = distance
+
+    return closest
+
+# Former linear scan looking for a text element by substring, used as a reference
+def legacy_find_element_substring(elements : list[TextElement], text : str) -> Optional[TextElement] :
+    for element in elements :
+        if text in element.text :
+            return element
+    return None
+
+class TestElementIndex(unittest.TestCase) :
+
+    def random_elements(self, rng : random.Random, count : int) -> list[TextElement] :
+        # Coordinates are picked from a small set so that there are plenty of equally close elements and exact doubles
+        coordinates = [rng.uniform(-50, 700) for _ in range(8)] + [12.5, 12.5, 36.85, 790.2]
+        texts = ["ABV", "IBU", "OG", "4.7%", "35", "1048", "#12"]
+        return [TextElement(x=rng.choice(coordinates), y=rng.choice(coordinates), text=rng.choice(texts)) for _ in range(count)]
+
+    def test_same_results_as_linear_scans(self) :
+        rng = random.Random(0)
+        for _ in range(300) :
+            elements = self.random_elements(rng, rng.randint(1, 40))
+            index = TextElementIndex(elements)
+
+            references = elements + self.random_elements(rng, 5)
+            for reference in references :
+                # Identity matters as well, as callers keep track of consumed elements
+                self.assertIs(index.closest_x(reference), legacy_find_closest_x_element(elements, reference))
+                self.assertIs(index.closest(reference), legacy_find_closest_element(elements, reference))
+
+    def test_closest_x_below(self) :
+        rng = random.Random(1)
+        for _ in range(300) :
+            elements = self.random_elements(rng, rng.randint(1, 40))
+            index = TextElementIndex(elements)
+            for reference in elements :
+                # Same as querying a list made of the elements below the reference only
+                below = [x for x in elements if x.y < reference.y]
+                if len(below) == 0 :
+                    with self.assertRaises(IndexError) :
+                        index.closest_x(reference, below=reference.y)
+                    continue
+                self.assertIs(index.closest_x(reference, below=reference.y), legacy_find_closest_x_element(below, reference))
+
+    def test_reference_is_skipped(self) :
+        reference = TextElement(x=10, y=10, text="#1")
+        elements = [reference, TextElement(x=10, y=10, text="#1"), TextElement(x=10, y=10, text="NAME"), TextElement(x=11, y=10, text="OTHER")]
+        index = TextElementIndex(elements)
+        self.assertIs(index.closest(reference), elements[2])
+        self.assertIs(index.closest_x(reference), reference)
+
+    def test_nothing_close_enough(self) :
+        elements = [TextElement(x=0, y=0, text="A"), TextElement(x=2000, y=2000, text="B")]
+        index = TextElementIndex(elements)
+        self.assertIs(index.closest(TextElement(x=5000, y=5000)), elements[0])
+        self.assertIs(index.closest_x(TextElement(x=-1500)), elements[0])
+
+    def test_labels_same_results_as_linear_scans(self) :
+        rng = random.Random(0)
+        texts = ["MALT", "Malt", "malt", "HOPS", "YEAST", "MASH TEMP", "BREWER\x92S TIP", ""]
+        for _ in range(300) :
+            elements = [TextElement(x=rng.uniform(0, 700), y=rng.uniform(0, 700), text=rng.choice(texts)) for _ in range(rng.randint(0, 20))]
+            labels = TextLabelIndex(elements)
+            for text in texts + ["MISSING", "mash temp"] :
+                self.assertIs(labels.find(text), find_element(elements, text))
+
+    def test_labels_within_groups(self) :
+        rng = random.Random(0)
+        texts = ["MASH TEMP", "FERMENTATION", "BREWHOUSE TWIST", "TWIST", "Twist", "KEG ONLY", ""]
+        for _ in range(300) :
+            elements = [TextElement(x=rng.uniform(0, 700), y=rng.uniform(0, 700), text=rng.choice(texts)) for _ in range(rng.randint(1, 30))]
+            labels = TextLabelIndex(elements)
+
+            # Groups are shuffled slices of the page, just like categories made of sorted page columns
+            shuffled = list(elements)
+            rng.shuffle(shuffled)
+            cuts = sorted(rng.sample(range(1, len(shuffled) + 1), min(3, len(shuffled))))
+            groups = [shuffled[begin:end] for (begin, end) in zip([0] + cuts, cuts) if begin != end]
+            labels.group(groups)
+
+            for group in groups :
+                for text in texts + ["WIST", "MISSING"] :
+                    self.assertIs(labels.find(text, within=group), find_element(group, text))
+                    self.assertIs(labels.find_containing(text, within=group), legacy_find_element_substring(group, text))
+            for text in texts :
+                self.assertIs(labels.find_containing(text), legacy_find_element_substring(elements, text))
+                self.assertEqual(labels.find_all(text), [x for x in elements if x.text == text])
+
+    def test_labels_strict_lookup(self) :
+        labels = TextLabelIndex([TextElement(text="BASICS"), TextElement(text="basics")])
+        self.assertIs(labels.find_strict("basics"), labels.elements[1])
+        with self.assertRaises(AssertionError) :
+            labels.find_strict("Basics")
+
+
+if __name__ == "__main__" :
+    unittest.main()
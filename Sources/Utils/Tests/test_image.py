@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from skimage import measure
+from skimage.draw import polygon
+
+from ..image import _compute_perimeter, _compute_bounding_box, _extract_image
+from ...Tests.reference_implementations import legacy_compute_perimeter, legacy_compute_bounding_box, legacy_extract_image
+
+class TestImage(unittest.TestCase) :
+
+    def make_contours(self, seed : int) -> list[np.ndarray] :
+        # Noisy blobs produce a lot of small and large, open and closed contours
+        rng = np.random.default_rng(seed)
+        gray = rng.integers(0, 255, size=(120, 80)).astype(np.uint8)
+        gray[30:90, 20:60] = 250
+        return measure.find_contours(gray, 190)
+
+    def test_perimeter_matches_point_by_point_computation(self) :
+        for seed in range(5) :
+            for contour in self.make_contours(seed) :
+                self.assertEqual(_compute_perimeter(contour), legacy_compute_perimeter(contour))
+
+    def test_bounding_box_matches_point_by_point_computation(self) :
+        for seed in range(5) :
+            for contour in self.make_contours(seed) :
+                self.assertEqual(_compute_bounding_box(contour), legacy_compute_bounding_box(contour))
+
+    def test_single_point_contour(self) :
+        contour = np.array([[3.5, 2.0]])
+        self.assertEqual(_compute_perimeter(contour), 0.0)
+        self.assertEqual(_compute_bounding_box(contour), ([2.0, 2.0], [3.5, 3.5]))
+
+    def test_extract_image_mask_matches_full_image_mask(self) :
+        # Opaque pixels of the cropped output are the ones of the polygon rasterized over the whole image, then cropped
+        img = np.zeros((120, 80, 3), dtype=np.uint8)
+        contours = self.make_contours(1) + [np.array([[1.0, 1.0], [1.0, 6.0], [6.0, 6.0], [6.0, 1.0]]), np.array([[0.5, 2.5], [4.5, 14.0], [12.0, 0.5]])]
+        for contour in contours :
+            (x_boundaries, y_boundaries) = _compute_bounding_box(contour)
+            (left, right, top, bottom) = (round(x_boundaries[0]), round(x_boundaries[1]), round(y_boundaries[0]), round(y_boundaries[1]))
+            expected = np.zeros(img.shape[:2], dtype=bool)
+            (rr, cc) = polygon(contour[:, 0], contour[:, 1], expected.shape)
+            expected[rr, cc] = True
+            np.testing.assert_array_equal(_extract_image(img, contour)[:, :, 3] == 255, expected[top:bottom, left:right])
+
+    def test_extract_image_matches_full_image_masking(self) :
+        rng = np.random.default_rng(2)
+        img = rng.integers(0, 255, size=(120, 80, 3)).astype(np.uint8)
+        for contour in self.make_contours(3)[:20] :
+            for fit_crop_image in [True, False] :
+                np.testing.assert_array_equal(_extract_image(img, contour, (10, 20, 30, 0), fit_crop_image),
+                                              legacy_extract_image(img, contour, (10, 20, 30, 0), fit_crop_image))
+
+
+if __name__ == "__main__" :
+    unittest.main()
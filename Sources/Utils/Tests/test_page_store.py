@@ -0,0 +1,60 @@
+import json
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import gettempdir
+
+from ..page_store import *
+from ...Models.blocks import PageBlocks, TextElement
+
+class TestPageStore(unittest.TestCase) :
+
+    tmp_dir : Path
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_page_store")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_pages(self) -> list[tuple[PageBlocks, str]] :
+        pages = [
+            PageBlocks(elements=[TextElement(x=36.85, y=790.2, text="VOLUME"), TextElement(x=0.1 + 0.2, y=-10, text="65°C")], index=1),
+            PageBlocks(elements=[], index=2),
+            PageBlocks(elements=[TextElement(x=614.48, y=615.73, text="BREWER\x92S TIP"), TextElement(x=1, y=2, text="")], index=415)
+        ]
+        return [(page, "{:064x}".format(page.index)) for page in pages]
+
+    def test_round_trip(self) :
+        filepath = self.tmp_dir.joinpath("contents.bin")
+        pages = self.make_pages()
+        write_page_store(filepath, pages)
+
+        with PageStore(filepath) as store :
+            self.assertEqual(store.indices(), [1, 2, 415])
+            self.assertNotIn(3, store)
+            self.assertEqual(store.contents_hash(3), "")
+            for (page, contents_hash) in pages :
+                self.assertEqual(store.contents_hash(page.index), contents_hash)
+                # Same thing as what's read back from the json files (coordinates are not rounded)
+                from_json = PageBlocks()
+                from_json.from_json(json.loads(json.dumps(page.to_json())))
+                self.assertEqual(store.page(page.index), from_json)
+
+    def test_invalid_files(self) :
+        filepath = self.tmp_dir.joinpath("contents.bin")
+        self.assertIsNone(PageStore.open(filepath))
+
+        filepath.write_bytes(b"not a page store at all")
+        self.assertIsNone(PageStore.open(filepath))
+
+        write_page_store(filepath, self.make_pages())
+        filepath.write_bytes(filepath.read_bytes()[:-3])
+        self.assertIsNone(PageStore.open(filepath))
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,135 @@
+import json
+import shutil
+import unittest
+from pathlib import Path
+from tempfile import gettempdir
+
+from ..recipe_service import *
+from ..recipe_service import _read_recipes_nodes
+from ...Models.serializer import plan_for
+from ...Models.recipe import Recipe
+
+PATCHES_DIR = Path(__file__).parents[3].joinpath("Patches")
+
+class TestRecipeService(unittest.TestCase) :
+
+    tmp_dir : Path
+    recipes : list[Recipe]
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_recipe_service")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.recipes = []
+        for filepath in sorted(PATCHES_DIR.glob("recipe_*.json")) :
+            recipe = Recipe()
+            with open(filepath, "r") as file :
+                recipe.from_json(json.load(file))
+            self.recipes.append(recipe)
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_recipes_store(self) :
+        json_filepath = self.tmp_dir.joinpath("all_recipes.json")
+        dump_all_recipes_to_disk(json_filepath, self.recipes, with_store=True)
+        store_filepath = recipes_store_filepath(json_filepath)
+        self.assertTrue(store_filepath.exists())
+
+        self.assertEqual(read_recipes_store(store_filepath, json_filepath), self.recipes)
+        self.assertEqual(read_all_recipes(json_filepath), self.recipes)
+        self.assertEqual(read_recipe(json_filepath, self.recipes[3].number.value), self.recipes[3])
+        self.assertIsNone(read_recipe_from_store(store_filepath, -1))
+
+        # Store is opt-in, rewriting the json file without it drops the former one
+        dump_all_recipes_to_disk(json_filepath, self.recipes[:2])
+        self.assertFalse(store_filepath.exists())
+        self.assertEqual(read_all_recipes(json_filepath), self.recipes[:2])
+
+    def test_outdated_store_is_not_used(self) :
+        json_filepath = self.tmp_dir.joinpath("all_recipes.json")
+        dump_all_recipes_to_disk(json_filepath, self.recipes, with_store=True)
+        store_filepath = recipes_store_filepath(json_filepath)
+
+        # Json file edited by hand : the store does not hold the same recipes anymore
+        with open(json_filepath, "r") as file :
+            content = json.load(file)
+        content["recipes"] = content["recipes"][:2]
+        with open(json_filepath, "w") as file :
+            json.dump(content, file, indent=4)
+
+        self.assertIsNone(read_recipes_store(store_filepath, json_filepath))
+        self.assertEqual(read_all_recipes(json_filepath), self.recipes[:2])
+        self.assertIsNone(read_recipe(json_filepath, self.recipes[3].number.value))
+
+        store_filepath.write_bytes(b"not a database")
+        self.assertIsNone(read_recipes_store(store_filepath))
+        self.assertEqual(read_all_recipes(json_filepath), self.recipes[:2])
+
+    def test_recipe_book(self) :
+        json_filepath = self.tmp_dir.joinpath("all_recipes.json")
+        dump_all_recipes_to_disk(json_filepath, self.recipes)
+        dump_individual_recipes_files_to_disk(self.tmp_dir.joinpath("recipes"), self.recipes)
+        # Non ascii content moves byte offsets away from characters offsets
+        self.recipes[0].name.value = "Élan à l'œil"
+        with open(self.tmp_dir.joinpath("unicode.json"), "w") as file :
+            json.dump({"version" : "1", "recipes" : [x.to_json() for x in self.recipes]}, file, indent=2, ensure_ascii=False)
+
+        for path in [json_filepath, self.tmp_dir.joinpath("recipes"), self.tmp_dir.joinpath("unicode.json")] :
+            with RecipeBook(path, cache_size=2) as book :
+                expected = self.recipes if path.name == "unicode.json" else read_all_recipes(json_filepath)
+                if path.is_dir() :
+                    expected = sorted(expected, key=lambda x : x.number.value)
+                self.assertEqual(len(book), len(expected))
+                self.assertEqual(book.numbers(), [x.number.value for x in expected])
+                self.assertEqual(list(book), expected)
+
+                number = expected[3].number.value
+                self.assertIn(number, book)
+                self.assertEqual(book[number], expected[3])
+                self.assertIsNone(book.get(-1))
+                with self.assertRaises(KeyError) :
+                    book[-1]
+
+                # Most recently used recipes are kept, others get decoded again
+                recipe = book[number]
+                self.assertIs(book[number], recipe)
+                book[expected[0].number.value]
+                book[expected[1].number.value]
+                self.assertIsNot(book[number], recipe)
+
+        self.tmp_dir.joinpath("broken.json").write_text('{"recipes" : {}}')
+        with self.assertRaises(ValueError) :
+            RecipeBook(self.tmp_dir.joinpath("broken.json"))
+
+    def test_recipes_stream(self) :
+        json_filepath = self.tmp_dir.joinpath("all_recipes.json")
+        for recipes in [self.recipes, self.recipes[:1], []] :
+            write_recipes_stream(json_filepath, recipes)
+            self.assertEqual(json_filepath.read_text(), json.dumps({"recipes" : [x.to_json() for x in recipes]}, indent=4))
+            self.assertEqual(list(iter_recipes(json_filepath)), recipes)
+        self.assertFalse(json_filepath.with_name("all_recipes.json.tmp").exists())
+
+        # Chunks boundaries falling anywhere, including within multi bytes characters and numbers
+        self.recipes[0].name.value = "Élan à l'œil"
+        with open(json_filepath, "w") as file :
+            json.dump({"version" : 12345, "recipes" : [x.to_json() for x in self.recipes], "count" : len(self.recipes)}, file, ensure_ascii=False)
+        for chunk_size in [1, 3, 7, 4096] :
+            with open(json_filepath, "rb") as file :
+                nodes = list(_read_recipes_nodes(file, chunk_size))
+            self.assertEqual([plan_for(Recipe).decode(x[0]) for x in nodes], self.recipes)
+            data = json_filepath.read_bytes()
+            self.assertEqual([json.loads(data[x[1] : x[2]]) for x in nodes], [x[0] for x in nodes])
+
+        # Scalar values cut by a chunk boundary ("1." or "1e"), around the recipes array and at the very end of the file
+        for separators in [(", ", ": "), (",", ":")] :
+            content = json.dumps({"scale" : -1.25e-3, "recipes" : [x.to_json() for x in self.recipes], "flag" : True, "none" : None, "tail" : 1.5}, separators=separators)
+            json_filepath.write_text(content)
+            for chunk_size in [1, 2, 3] :
+                with open(json_filepath, "rb") as file :
+                    self.assertEqual([plan_for(Recipe).decode(x[0]) for x in _read_recipes_nodes(file, chunk_size)], self.recipes)
+
+
+if __name__ == "__main__" :
+    unittest.main()
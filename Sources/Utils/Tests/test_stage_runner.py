@@ -0,0 +1,150 @@
+import shutil
+import unittest
+from collections.abc import Mapping
+from pathlib import Path
+from tempfile import gettempdir
+
+from ..stage_runner import *
+from ..logger import Logger
+
+class TestStageRunner(unittest.TestCase) :
+
+    tmp_dir : Path
+    manifest_filepath : Path
+    logger : Logger
+    calls : list[str]
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.tmp_dir = Path(gettempdir()).joinpath("DiyDogExtractorTests/test_stage_runner")
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_filepath = self.tmp_dir.joinpath("pipeline_manifest.json")
+        self.logger = Logger(self.tmp_dir.joinpath("logs.txt"))
+        self.calls = []
+
+    def tearDown(self) -> None:
+        super().tearDown()
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def make_stages(self) -> list[Stage] :
+        source = self.tmp_dir.joinpath("source.txt")
+        words = self.tmp_dir.joinpath("words.txt")
+        counts = self.tmp_dir.joinpath("counts/count.txt")
+        if not source.exists() :
+            source.write_text("a b c")
+
+        def split(_ : dict) -> list[str] :
+            self.calls.append("split")
+            content = source.read_text().split()
+            words.write_text("\n".join(sorted(content)))
+            return content
+
+        def count(results : dict) -> int :
+            self.calls.append("count")
+            counts.parent.mkdir(exist_ok=True)
+            counts.write_text(str(len(results["split"])))
+            return len(results["split"])
+
+        # Declared out of order on purpose
+        return [
+            Stage("count", count, dependencies=["split"], outputs=[counts.parent]),
+            Stage("split", split, inputs=[source], outputs=[words], load=lambda : words.read_text().split())
+        ]
+
+    def test_stages_run_once(self) :
+        reports = run_pipeline(self.make_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual([(x.name, x.status) for x in reports], [("split", STATUS_RUN), ("count", STATUS_RUN)])
+        self.assertEqual(self.calls, ["split", "count"])
+
+        self.calls = []
+        reports = run_pipeline(self.make_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual([x.status for x in reports], [STATUS_SKIPPED, STATUS_SKIPPED])
+        self.assertEqual(self.calls, [])
+
+        reports = run_pipeline(self.make_stages(), self.manifest_filepath, self.logger, forced=["count"])
+        self.assertEqual(self.calls, ["count"])
+        print(format_reports(reports))
+
+    def test_changed_inputs_and_outputs(self) :
+        run_pipeline(self.make_stages(), self.manifest_filepath, self.logger)
+
+        # Same words in another order : split runs again, but count does not need to
+        self.calls = []
+        self.tmp_dir.joinpath("source.txt").write_text("c b a")
+        run_pipeline(self.make_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual(self.calls, ["split"])
+
+        self.calls = []
+        self.tmp_dir.joinpath("source.txt").write_text("a b c d")
+        run_pipeline(self.make_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual(self.calls, ["split", "count"])
+        self.assertEqual(self.tmp_dir.joinpath("counts/count.txt").read_text(), "4")
+
+        # Missing outputs : split results are read back instead of computed again
+        self.calls = []
+        shutil.rmtree(self.tmp_dir.joinpath("counts"))
+        run_pipeline(self.make_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual(self.calls, ["count"])
+        self.assertEqual(self.tmp_dir.joinpath("counts/count.txt").read_text(), "4")
+
+    def make_publishing_stages(self) -> list[Stage] :
+        stages = self.make_stages()
+        notes = self.tmp_dir.joinpath("notes.txt")
+        if not notes.exists() :
+            notes.write_text("notes")
+
+        def load_split() -> list[str] :
+            self.calls.append("load split")
+            return self.tmp_dir.joinpath("words.txt").read_text().split()
+        stages[1].load = load_split
+
+        # Only reads its own inputs, along with the count stage results
+        def summary(results : Mapping) -> str :
+            self.calls.append("summary")
+            return "{} : {}".format(notes.read_text(), results["count"])
+
+        # Only needs its dependencies to be up to date, never reads their results
+        def publish(_ : Mapping) -> None :
+            self.calls.append("publish")
+
+        return stages + [
+            Stage("summary", summary, dependencies=["count"], inputs=[notes]),
+            Stage("publish", publish, dependencies=["split", "count"], inputs=[notes])
+        ]
+
+    def test_dependencies_results_are_resolved_lazily(self) :
+        run_pipeline(self.make_publishing_stages(), self.manifest_filepath, self.logger)
+
+        # Publishing does not read anything back, nor does it run the count stage (which can't read its results back) again
+        self.calls = []
+        self.tmp_dir.joinpath("notes.txt").write_text("other notes")
+        stages = [x for x in self.make_publishing_stages() if x.name != "summary"]
+        reports = run_pipeline(stages, self.manifest_filepath, self.logger)
+        self.assertEqual(self.calls, ["publish"])
+        self.assertEqual([(x.name, x.status) for x in reports], [("split", STATUS_SKIPPED), ("count", STATUS_SKIPPED), ("publish", STATUS_RUN)])
+
+    def test_skipped_stage_runs_again_when_its_results_are_needed(self) :
+        run_pipeline(self.make_publishing_stages(), self.manifest_filepath, self.logger)
+
+        # Summary needs the count stage results, which can only be computed again : it is reported and recorded as such
+        self.calls = []
+        self.tmp_dir.joinpath("notes.txt").write_text("other notes")
+        reports = run_pipeline(self.make_publishing_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual(self.calls, ["summary", "count", "load split", "publish"])
+        self.assertEqual([(x.name, x.status) for x in reports], [("split", STATUS_SKIPPED), ("count", STATUS_RUN), ("summary", STATUS_RUN), ("publish", STATUS_RUN)])
+
+        # Nothing left to do
+        self.calls = []
+        reports = run_pipeline(self.make_publishing_stages(), self.manifest_filepath, self.logger)
+        self.assertEqual(self.calls, [])
+        self.assertEqual([x.status for x in reports], [STATUS_SKIPPED] * 4)
+
+    def test_invalid_dependencies(self) :
+        with self.assertRaises(ValueError) :
+            sort_stages([Stage("a", lambda x : None, dependencies=["b"]), Stage("b", lambda x : None, dependencies=["a"])])
+        with self.assertRaises(ValueError) :
+            sort_stages([Stage("a", lambda x : None, dependencies=["c"])])
+
+
+if __name__ == "__main__" :
+    unittest.main()
@@ -0,0 +1,207 @@
+import hashlib
+import json
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Optional
+
+from ..Models.jsonable import Jsonable
+
+# Extraction stages tracked by the manifest, each one of them can be recomputed separately for every page
+STAGE_TEXT = "text"
+STAGE_IMAGES = "images"
+STAGE_RECIPE = "recipe"
+
+def hash_bytes(data : bytes) -> str :
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(filepath : Path, chunk_size : int = 1024 * 1024) -> str :
+    hasher = hashlib.sha256()
+    with open(filepath, "rb") as file :
+        chunk = file.read(chunk_size)
+        while chunk :
+            hasher.update(chunk)
+            chunk = file.read(chunk_size)
+    return hasher.hexdigest()
+
+
+@dataclass
+class FileStamp(Jsonable) :
+    """Identifies a file's content. Size and modification time are used as a cheap first check, so that
+       files don't need to be hashed again when they were not touched since the last run"""
+    hash : str = ""
+    size : int = 0
+    mtime_ns : int = 0
+
+    @staticmethod
+    def from_file(filepath : Path) -> "FileStamp" :
+        stat = filepath.stat()
+        return FileStamp(hash=hash_file(filepath), size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    def matches(self, filepath : Path) -> bool :
+        if not filepath.exists() :
+            return False
+        stat = filepath.stat()
+        if stat.st_size != self.size :
+            return False
+        if stat.st_mtime_ns == self.mtime_ns :
+            return True
+
+        # File was touched, but its content may still be the same
+        if hash_file(filepath) != self.hash :
+            return False
+        self.mtime_ns = stat.st_mtime_ns
+        return True
+
+    def to_json(self) -> dict:
+        return {
+            "hash" : self.hash,
+            "size" : self.size,
+            "mtimeNs" : self.mtime_ns
+        }
+
+    def from_json(self, content: dict) -> None:
+        self.hash = self._read_prop("hash", content, "")
+        self.size = self._read_prop("size", content, 0)
+        self.mtime_ns = self._read_prop("mtimeNs", content, 0)
+
+
+@dataclass
+class StageRecord(Jsonable) :
+    """Records what a single stage produced for a page, and what it was computed from"""
+    input_hash : str = ""                                           # Hash of the stage input (source pdf page, cached contents, ...)
+    version : str = ""                                              # Extractor version that produced the artefacts
+    artefacts : dict[str, FileStamp] = field(default_factory=dict)  # Artefacts filepaths, relative to the cache root directory
+    metadata : dict = field(default_factory=dict)                   # Stage specific results that are not written elsewhere
+
+    def to_json(self) -> dict:
+        return {
+            "inputHash" : self.input_hash,
+            "version" : self.version,
+            "artefacts" : {key : value.to_json() for (key, value) in self.artefacts.items()},
+            "metadata" : self.metadata
+        }
+
+    def from_json(self, content: dict) -> None:
+        self.input_hash = self._read_prop("inputHash", content, "")
+        self.version = self._read_prop("version", content, "")
+        self.metadata = self._read_prop("metadata", content, {})
+        self.artefacts = {}
+        for (key, value) in self._read_prop("artefacts", content, {}).items() :
+            stamp = FileStamp()
+            stamp.from_json(value)
+            self.artefacts[key] = stamp
+
+
+@dataclass
+class PageRecord(Jsonable) :
+    source_hash : str = ""                                          # Hash of the page bytes, as read from the source pdf book
+    stages : dict[str, StageRecord] = field(default_factory=dict)
+
+    def to_json(self) -> dict:
+        return {
+            "sourceHash" : self.source_hash,
+            "stages" : {key : value.to_json() for (key, value) in self.stages.items()}
+        }
+
+    def from_json(self, content: dict) -> None:
+        self.source_hash = self._read_prop("sourceHash", content, "")
+        self.stages = {}
+        for (key, value) in self._read_prop("stages", content, {}).items() :
+            stage = StageRecord()
+            stage.from_json(value)
+            self.stages[key] = stage
+
+
+@dataclass
+class CacheManifest(Jsonable) :
+    """Content hash keyed description of the extraction cache.
+       It is used to find out which stages of which pages are stale and need to be computed again, instead of
+       rebuilding the whole cache every time something looks off."""
+    source : FileStamp = field(default_factory=FileStamp)           # Source pdf book
+    pages : dict[int, PageRecord] = field(default_factory=dict)
+
+    def to_json(self) -> dict:
+        return {
+            "source" : self.source.to_json(),
+            "pages" : {str(key) : value.to_json() for (key, value) in sorted(self.pages.items())}
+        }
+
+    def from_json(self, content: dict) -> None:
+        self.source = FileStamp()
+        self.source.from_json(self._read_prop("source", content, {}))
+        self.pages = {}
+        for (key, value) in self._read_prop("pages", content, {}).items() :
+            page = PageRecord()
+            page.from_json(value)
+            self.pages[int(key)] = page
+
+    @staticmethod
+    def load(filepath : Path) -> "CacheManifest" :
+        """Reads the manifest back from disk. A missing or unreadable manifest yields an empty one (everything is stale)"""
+        manifest = CacheManifest()
+        if not filepath.exists() :
+            return manifest
+        try :
+            with open(filepath, "r") as file :
+                manifest.from_json(json.load(file))
+        except (ValueError, KeyError, TypeError) :
+            manifest = CacheManifest()
+        return manifest
+
+    def save(self, filepath : Path) :
+        if not filepath.parent.exists() :
+            filepath.parent.mkdir(parents=True)
+
+        # Write then rename, so that an interrupted run never leaves a half written manifest behind
+        tmp_filepath = filepath.with_name(filepath.name + ".tmp")
+        with open(tmp_filepath, "w") as file :
+            json.dump(self.to_json(), file, indent=4)
+        tmp_filepath.replace(filepath)
+
+    def clear(self) :
+        self.__init__()
+
+    def source_unchanged(self, source_file : Path) -> bool :
+        return self.source.hash != "" and self.source.matches(source_file)
+
+    def record_source(self, source_file : Path) :
+        self.source = FileStamp.from_file(source_file)
+
+    def get_page(self, index : int) -> PageRecord :
+        if not index in self.pages :
+            self.pages[index] = PageRecord()
+        return self.pages[index]
+
+    def get_stage(self, index : int, stage : str) -> Optional[StageRecord] :
+        if not index in self.pages :
+            return None
+        return self.pages[index].stages.get(stage)
+
+    def is_stage_fresh(self, index : int, stage : str, input_hash : str, version : str, root_dir : Path) -> bool :
+        """A stage is fresh when it was computed from the same input, by the same extractor version, and all of its artefacts
+           are still on disk, untouched."""
+        record = self.get_stage(index, stage)
+        if record is None :
+            return False
+        if record.input_hash != input_hash or record.version != version :
+            return False
+        for (relative_path, stamp) in record.artefacts.items() :
+            if not stamp.matches(root_dir.joinpath(relative_path)) :
+                return False
+        return True
+
+    def record_stage(self, index : int, stage : str, input_hash : str, version : str, root_dir : Path, artefacts : list[Path], metadata : Optional[dict] = None) :
+        """Records a freshly computed stage. Artefacts that were not produced (missing on disk) are not recorded."""
+        record = StageRecord(input_hash=input_hash, version=version, metadata=metadata or {})
+        for artefact in artefacts :
+            if artefact.exists() :
+                record.artefacts[artefact.relative_to(root_dir).as_posix()] = FileStamp.from_file(artefact)
+        self.get_page(index).stages[stage] = record
+
+    def artefact_hash(self, index : int, stage : str, artefact : Path, root_dir : Path) -> str :
+        """Returns the recorded hash of an artefact, or an empty string if it was not recorded"""
+        record = self.get_stage(index, stage)
+        if record is None :
+            return ""
+        stamp = record.artefacts.get(artefact.relative_to(root_dir).as_posix())
+        return stamp.hash if stamp else ""
@@ -0,0 +1,193 @@
+import re
+from typing import Optional
+
+from ..Models.blocks import TextElement
+from .parsing import escape_content
+
+# Single pass tokenizer over raw pdf page content streams.
+# It only cares about text objects (BT ... ET) and the few text operators needed to rebuild text elements :
+#   - Tm      : sets the text matrix, its translation part gives the absolute position of the next text element
+#   - Td / TD : moves to the next line, offsets are added to the current position
+#   - Tj / TJ : shows text, consecutive text showing operators are merged in a single text element until the position changes
+# Hexadecimal strings are skipped, as they were never read by the former line based parser.
+# Operators may share lines and strings may contain any byte, so nothing relies on line splitting.
+# Reference : PDF 32000-1:2008, sections 7.2 (lexical conventions) and 9.4 (text objects)
+
+# Delimiters and whitespaces, as listed by PDF 32000-1:2008 (7.2.2 and 7.2.3)
+_DELIMITERS = rb"\x00\t\n\x0c\r ()<>\[\]{}/%"
+
+# Literal string without nested parentheses (by far the most common ones), its content is captured
+_SIMPLE_STRING = rb"\(([^()\\]*+(?:\\.[^()\\]*+)*+)\)"
+
+# Operators that never take string operands and don't change the text position (as far as the text elements are concerned),
+# they are skipped along with their operands :
+#   - graphics state : q Q cm w J j M d ri i gs
+#   - paths          : m l c v y h re S s f F f* B B* b b* n W W*
+#   - colors         : CS cs SC SCN sc scn G g RG rg K k
+#   - text state     : Tc Tw Tz TL Tf Tr Ts T*
+#   - others         : Do sh EMC
+# Python's regex engine tries alternatives one after the other, so they are packed in as few character classes as possible.
+_SKIPPED_OPERATORS = rb"(?:[fBbW]\*|[qQwJjMdimlcvyhSsfFBbnWGgKk]|cm|ri|gs|re|CS|cs|SCN?|scn?|RG|rg|T[cwzLfrs*]|Do|sh|EMC)"
+
+# Matches all the operands of an operation (numbers, names, arrays, dictionaries, strings, comments) along with skipped operators,
+# then what comes next : a literal string with nested parentheses (parsed separately), an operator, or an unexpected character.
+# Python only wakes up once per meaningful operator, everything in between is skipped by the regex engine.
+# Alternatives are sorted by frequency.
+_OPERATION_REGEX = re.compile(rb"""
+    (?P<operands>(?:
+          [^A-Za-z'"*()<>\[\]{}/%]++                    # Numbers and whitespaces (anything that is not a delimiter nor an operator start)
+        | \([^()\\]*+(?:\\.[^()\\]*+)*+\)                # Literal string without nested parentheses
+        | """ + _SKIPPED_OPERATORS + rb"""(?![^""" + _DELIMITERS + rb"""])
+        | /[^""" + _DELIMITERS + rb"""]*+
+        | [\[\]]
+        | <<
+        | >>
+        | <[0-9A-Fa-f\x00\t\n\x0c\r ]*+>
+        | [{}]
+        | %[^\r\n]*+
+    )*+)
+    (?:
+          (?P<string>\()
+        | (?P<operator>[A-Za-z'"*][^""" + _DELIMITERS + rb"""]*+)
+        | (?P<other>.)
+    )?
+""", re.VERBOSE | re.DOTALL)
+
+# Extracts literal strings out of operands. Comments are matched as well so that parentheses within them are not taken for strings,
+# they only produce empty strings which don't change the text.
+_OPERANDS_STRINGS_REGEX = re.compile(rb"%[^\r\n]*+|" + _SIMPLE_STRING, re.DOTALL)
+
+# Within literal strings, only escape sequences and parentheses change the parsing state
+_STRING_TOKEN_REGEX = re.compile(rb"\\(?:\r\n|.)|[()]", re.DOTALL)
+
+# Inline images binary data is skipped up to the end marker
+_INLINE_IMAGE_END_REGEX = re.compile(rb"[\x00\t\n\x0c\r ]EI(?![^\x00\t\n\x0c\r ])")
+
+def decode_string(raw : bytes) -> str :
+    """Decodes the raw content of a literal string (without its enclosing parentheses).
+       Page content is encoded with the iso-8859-1 encoding, escape sequences are then resolved."""
+    return escape_content(raw.decode("iso-8859-1"))
+
+def _read_string(data : bytes, start : int) -> tuple[bytes, int] :
+    """Reads a literal string whose opening parenthesis is located right before start.
+       @return (raw string content, position right after the closing parenthesis)"""
+    depth = 1
+    for match in _STRING_TOKEN_REGEX.finditer(data, start) :
+        token = match.group()
+        if token == b"(" :
+            depth += 1
+        elif token == b")" :
+            depth -= 1
+            if depth == 0 :
+                return (data[start : match.start()], match.end())
+
+    # Unterminated string, take everything that's left
+    return (data[start:], len(data))
+
+def _read_position(operands : bytes) -> Optional[tuple[float, float]] :
+    """Reads the two last numeric operands of a Tm, Td or TD operator"""
+    tokens = operands.split()
+    if len(tokens) < 2 :
+        return None
+    try :
+        return (float(tokens[-2]), float(tokens[-1]))
+    except ValueError :
+        return None
+
+def _decode_strings(raw_strings : list[bytes]) -> str :
+    """Decodes and concatenates the raw content of several literal strings"""
+    joined = b"".join(raw_strings)
+    if len(raw_strings) > 1 and b"\\" in joined :
+        # Strings are joined with a line continuation (dropped when resolving escape sequences),
+        # otherwise an octal sequence could continue in the next string
+        joined = b"\\\n".join(raw_strings)
+    return decode_string(joined)
+
+def parse_text_elements(data : bytes, blocks : Optional[list[bytes]] = None) -> list[TextElement] :
+    """Parses the text elements out of a raw page content stream.
+       @param :
+            data   : decoded (uncompressed) page content stream
+            blocks : if provided, receives the raw content of every text object (what's between BT and ET)
+       @return
+            text elements, in content stream order. Text elements of an unterminated text object are dropped.
+    """
+    out : list[TextElement] = []
+    block_elements : list[TextElement] = []
+    new_element : Optional[TextElement] = None
+    in_text_object = False
+    block_start = 0
+    x = 0.0
+    y = 0.0
+
+    # Raw literal strings found in the operands of the current operation
+    strings : list[bytes] = []
+
+    position = 0
+    length = len(data)
+    match_operation = _OPERATION_REGEX.match
+    find_strings = _OPERANDS_STRINGS_REGEX.findall
+    while position < length :
+        match = match_operation(data, position)
+        assert(match)
+        position = match.end()
+        kind = match.lastgroup
+
+        if in_text_object :
+            operands = match.group("operands")
+            if b"(" in operands :
+                strings.extend(find_strings(operands))
+
+        if kind == "string" :
+            (raw, position) = _read_string(data, position)
+            if in_text_object :
+                strings.append(raw)
+
+        elif kind == "operator" :
+            operator = match.group("operator")
+            if operator == b"BT" and not in_text_object :
+                in_text_object = True
+                block_start = position
+                block_elements = []
+                new_element = None
+                x = 0.0
+                y = 0.0
+
+            elif in_text_object :
+                if operator == b"Tj" or operator == b"TJ" :
+                    if not new_element :
+                        new_element = TextElement(x=x, y=y)
+                    # Sometimes PDF can chain multiple "Tj" instructions with different formatting (like color)
+                    # without resetting the transformation matrix, so they need to be read as a single line instead
+                    new_element.text += _decode_strings(strings)
+
+                elif operator == b"Tm" or operator == b"Td" or operator == b"TD" :
+                    offset = _read_position(match.group("operands"))
+                    if offset :
+                        if operator == b"Tm" :
+                            (x, y) = offset
+                        else :
+                            x += offset[0]
+                            y += offset[1]
+
+                    # New position means a new PDF write somewhere else in the page, so we can bump the element if any
+                    if new_element :
+                        block_elements.append(new_element)
+                        new_element = None
+
+                elif operator == b"ET" :
+                    if new_element :
+                        block_elements.append(new_element)
+                        new_element = None
+                    out.extend(block_elements)
+                    if blocks is not None :
+                        blocks.append(data[block_start : match.start("operator")])
+                    in_text_object = False
+
+            elif operator == b"ID" :
+                # Inline image data is binary and can't be tokenized
+                end = _INLINE_IMAGE_END_REGEX.search(data, position)
+                position = end.end() if end else length
+
+            strings.clear()
+
+    return out
@@ -0,0 +1,191 @@
+import json
+import os
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from ..Models.jsonable import Jsonable
+from .cache_manifest import FileStamp
+
+# Deployment builds a complete new tree next to the deployed one (staging), then swaps it in :
+# the deploy directory is a symbolic link to the current tree, replaced in a single rename so that readers
+# either see the former tree or the new one, never a half written one.
+# Files are hardlinked when they are never modified in place once deployed (their writers replace them instead, see filesystem.write_file_atomically()),
+# reflinked (copy on write clones, on filesystems that support them) or copied otherwise. Copies of files that did not change since the last deployment are taken over from the former tree.
+
+# Placement methods, as reported by deploy_files()
+PLACED_HARDLINK = "hardlink"
+PLACED_REFLINK = "reflink"
+PLACED_COPY = "copy"
+PLACED_UNCHANGED = "unchanged"
+
+# Linux ioctl that clones the extents of a file into another one (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+@dataclass
+class DeployItem :
+    source : Path
+    destination : str           # Relative to the deployed tree root
+    linkable : bool = True      # Whether the deployed file can be a hardlink to the source (i.e. nothing modifies it in place afterwards)
+
+
+@dataclass
+class DeployedFile(Jsonable) :
+    """Copied file of a former deployment, along with the source it was copied from"""
+    source : FileStamp = field(default_factory=FileStamp)
+    deployed : FileStamp = field(default_factory=FileStamp)
+
+    def to_json(self) -> dict:
+        return {
+            "source" : self.source.to_json(),
+            "deployed" : self.deployed.to_json()
+        }
+
+    def from_json(self, content: dict) -> None:
+        self.source = FileStamp()
+        self.source.from_json(self._read_prop("source", content, {}))
+        self.deployed = FileStamp()
+        self.deployed.from_json(self._read_prop("deployed", content, {}))
+
+
+@dataclass
+class DeployManifest(Jsonable) :
+    files : dict[str, DeployedFile] = field(default_factory=dict)  # Keys are destinations, relative to the deployed tree root
+
+    def to_json(self) -> dict:
+        return {"files" : {key : value.to_json() for (key, value) in sorted(self.files.items())}}
+
+    def from_json(self, content: dict) -> None:
+        self.files = {}
+        for (key, value) in self._read_prop("files", content, {}).items() :
+            deployed_file = DeployedFile()
+            deployed_file.from_json(value)
+            self.files[key] = deployed_file
+
+    @staticmethod
+    def load(filepath : Path) -> "DeployManifest" :
+        manifest = DeployManifest()
+        if not filepath.exists() :
+            return manifest
+        try :
+            with open(filepath, "r") as file :
+                manifest.from_json(json.load(file))
+        except (ValueError, KeyError, TypeError) :
+            manifest = DeployManifest()
+        return manifest
+
+    def save(self, filepath : Path) :
+        tmp_filepath = filepath.with_name(filepath.name + ".tmp")
+        with open(tmp_filepath, "w") as file :
+            json.dump(self.to_json(), file, indent=4)
+        tmp_filepath.replace(filepath)
+
+
+def reflink_file(source : Path, destination : Path) -> bool :
+    """Clones source into destination without copying data, returns False if the platform or filesystem does not support it"""
+    try :
+        import fcntl
+    except ImportError :
+        return False
+
+    with open(source, "rb") as src, open(destination, "wb") as dst :
+        try :
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return True
+        except OSError :
+            return False
+
+def place_file(source : Path, destination : Path, allow_hardlink : bool) -> str :
+    """Puts source at destination using the cheapest available method (hardlink if allowed, then reflink, then copy).
+       @return
+            the placement method that was used
+    """
+    if allow_hardlink :
+        try :
+            os.link(source, destination)
+            return PLACED_HARDLINK
+        except OSError :
+            # Different filesystems, or links not supported
+            pass
+
+    if reflink_file(source, destination) :
+        return PLACED_REFLINK
+    shutil.copyfile(source, destination)
+    return PLACED_COPY
+
+def _swap_in(staging_dir : Path, deploy_dir : Path) :
+    """Makes deploy_dir point to staging_dir"""
+    link = deploy_dir.with_name(deploy_dir.name + ".link")
+    if link.is_symlink() :
+        link.unlink()
+
+    # Trees deployed by former versions of the tool are plain directories, they are moved aside once
+    if deploy_dir.exists() and not deploy_dir.is_symlink() :
+        former_dir = staging_dir.with_name("{}_former".format(deploy_dir.name))
+        shutil.rmtree(former_dir, ignore_errors=True)
+        deploy_dir.rename(former_dir)
+
+    try :
+        os.symlink(os.path.relpath(staging_dir, deploy_dir.parent), link, target_is_directory=True)
+    except (OSError, NotImplementedError) :
+        # No symbolic links (Windows without the required privileges for instance), the tree is renamed in place instead
+        if deploy_dir.is_symlink() :
+            deploy_dir.unlink()
+        staging_dir.rename(deploy_dir)
+        return
+    os.replace(link, deploy_dir)
+
+def deploy_files(items : list[DeployItem], deploy_dir : Path, manifest_filepath : Path) -> dict[str, int] :
+    """Deploys files to a new tree and swaps it in place of the deployed one.
+       @param :
+            items             : files to deploy
+            deploy_dir        : deployed tree (a symbolic link to the current tree, where supported)
+            manifest_filepath : records what was copied, so that unchanged copies can be taken over by the next deployment
+       @return
+            number of files per placement method
+    """
+    versions_dir = deploy_dir.with_name(deploy_dir.name + "_versions")
+    previous_dir : Optional[Path] = deploy_dir.resolve() if deploy_dir.exists() else None
+    staging_dir = versions_dir.joinpath("{}_{}".format(deploy_dir.name, time.time_ns()))
+    staging_dir.mkdir(parents=True)
+
+    former_manifest = DeployManifest.load(manifest_filepath)
+    manifest = DeployManifest()
+    counts = {x : 0 for x in [PLACED_HARDLINK, PLACED_REFLINK, PLACED_COPY, PLACED_UNCHANGED]}
+    for item in items :
+        destination = staging_dir.joinpath(item.destination)
+        destination.parent.mkdir(parents=True, exist_ok=True)
+
+        # Copies (and reflinks) are taken over as long as neither the source nor the deployed file were touched since last time
+        method = ""
+        record = former_manifest.files.get(item.destination)
+        previous = previous_dir.joinpath(item.destination) if previous_dir else None
+        if not item.linkable and record and previous and record.source.matches(item.source) and record.deployed.matches(previous) :
+            try :
+                os.link(previous, destination)
+                method = PLACED_UNCHANGED
+            except OSError :
+                pass
+
+        if method == "" :
+            method = place_file(item.source, destination, item.linkable)
+            if method != PLACED_HARDLINK :
+                source_stamp = FileStamp.from_file(item.source)
+                stat = destination.stat()
+                record = DeployedFile(source=source_stamp, deployed=FileStamp(hash=source_stamp.hash, size=stat.st_size, mtime_ns=stat.st_mtime_ns))
+
+        if method != PLACED_HARDLINK and record :
+            manifest.files[item.destination] = record
+        counts[method] += 1
+
+    _swap_in(staging_dir, deploy_dir)
+    manifest.save(manifest_filepath)
+
+    # Former trees are not needed anymore
+    if versions_dir.exists() :
+        for entry in versions_dir.iterdir() :
+            if entry != staging_dir :
+                shutil.rmtree(entry, ignore_errors=True)
+    return counts
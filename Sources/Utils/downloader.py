@@ -1,20 +1,111 @@
+import re
 import requests
 from pathlib import Path
+from typing import Optional
+
 from .logger import Logger
+from .cache_manifest import hash_file
+
+# Downloaded data is written to disk in chunks of that size, so memory usage stays flat whatever the file size is
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT_S = 30
+
+def partial_filepath(output_file : Path) -> Path :
+    """Returns the temporary file used while downloading output_file"""
+    return output_file.with_name(output_file.name + ".part")
+
+def _parse_content_range(header : Optional[str]) -> tuple[Optional[int], Optional[int]] :
+    """Parses a Content-Range header, such as "bytes 100-199/1000" or "bytes */1000".
+       @return (start offset, total size), either of them is None when not available"""
+    if not header :
+        return (None, None)
+    match = re.match(r"bytes\s+(?:(\d+)-\d+|\*)/(\d+|\*)", header.strip())
+    if not match :
+        return (None, None)
+    start = int(match.group(1)) if match.group(1) is not None else None
+    total = int(match.group(2)) if match.group(2) != "*" else None
+    return (start, total)
+
+def _download_to_part(url : str, part_file : Path, logger : Logger) -> tuple[bool, Optional[int]] :
+    """Downloads url into part_file, resuming from what part_file already holds when the server supports it.
+       @return (success, expected total size if the server told us)"""
+    offset = part_file.stat().st_size if part_file.exists() else 0
+    headers = {"Range" : "bytes={}-".format(offset)} if offset > 0 else {}
+
+    with requests.get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT_S) as response :
+        match(response.status_code) :
+            case 200 :
+                # Server ignored the range request (or there was nothing to resume) : start over
+                mode = "wb"
+                offset = 0
+                content_length = response.headers.get("Content-Length")
+                expected_size = int(content_length) if content_length is not None else None
+
+            case 206 :
+                (start, expected_size) = _parse_content_range(response.headers.get("Content-Range"))
+                if start != offset :
+                    logger.log("Server answered with an unexpected range ({}), restarting download from scratch".format(response.headers.get("Content-Range")))
+                    part_file.unlink()
+                    return (False, None)
+                logger.log("Resuming download from byte {}".format(offset))
+                mode = "ab"
+
+            case 416 :
+                # Nothing left to download, the partial file might already be complete
+                (_, expected_size) = _parse_content_range(response.headers.get("Content-Range"))
+                if expected_size is not None and expected_size == offset :
+                    return (True, expected_size)
+                logger.log("Partial download does not match remote file, restarting download from scratch")
+                part_file.unlink()
+                return (False, None)
 
-def download_pdf(url : str, output_file : Path, logger : Logger) -> None:
-    response = requests.get(url)
-    match(response.status_code) :
-        case 200 :
-            pass
-        case _ :
-            logger.log("Could not download pdf file, error code was : {}".format(response.status_code))
-            return
+            case _ :
+                logger.log("Could not download pdf file, error code was : {}".format(response.status_code))
+                return (False, None)
 
+        with open(part_file, mode) as file :
+            for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE) :
+                file.write(chunk)
+
+    return (True, expected_size)
+
+def download_pdf(url : str, output_file : Path, logger : Logger, expected_sha256 : Optional[str] = None, max_attempts : int = 3) -> bool:
+    """Streams a remote file to disk.
+       Data is written to a "<output_file>.part" temporary file which is renamed to output_file once complete and verified.
+       An interrupted download leaves the .part file behind, and the next call resumes it using an HTTP Range request.
+
+       @param url : remote file url
+       @param output_file : final location of the downloaded file
+       @param expected_sha256 : optional checksum the downloaded file is checked against
+       @param max_attempts : how many times the download is retried (and resumed) after a failure
+       @return True if output_file was successfully downloaded"""
     # Create output directory if it does not exist yet
     if not output_file.parent.exists() :
         output_file.parent.mkdir(parents=True)
 
-    # Dump pdf to file
-    with open(output_file, "wb") as file :
-        file.write(response.content)
\ No newline at end of file
+    part_file = partial_filepath(output_file)
+    for attempt in range(max_attempts) :
+        try :
+            (success, expected_size) = _download_to_part(url, part_file, logger)
+        except requests.RequestException as e :
+            logger.log("Download attempt {} failed : {}".format(attempt + 1, e))
+            continue
+
+        if not success :
+            continue
+
+        actual_size = part_file.stat().st_size
+        if expected_size is not None and actual_size != expected_size :
+            # Connection was probably dropped midway, next attempt resumes from there
+            logger.log("Downloaded file is incomplete ({} bytes out of {}), resuming".format(actual_size, expected_size))
+            continue
+
+        if expected_sha256 is not None and hash_file(part_file) != expected_sha256.lower() :
+            logger.log("Downloaded file checksum does not match, discarding it")
+            part_file.unlink()
+            continue
+
+        part_file.replace(output_file)
+        return True
+
+    return False
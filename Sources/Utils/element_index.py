@@ -0,0 +1,158 @@
+import math
+from bisect import bisect_left
+from typing import Optional
+
+from ..Models.blocks import TextElement
+
+# Elements further than that from the reference are never considered as close
+MAX_DISTANCE = 1000
+
+class TextElementIndex :
+    """Spatial index over a list of text elements, used to answer closest element queries without walking the whole list.
+       Elements are sorted once along x, a query bisects the sorted coordinates and only visits the neighbours of the reference.
+       Results are the same as a linear scan of the list : when several elements are equally close, the first one in list order wins,
+       and when nothing is closer than MAX_DISTANCE, the first element of the list is returned.
+       Build it once per page and restrict queries to a part of the page (see closest_x()) rather than indexing sub lists.
+       Note : the index is a snapshot, it needs to be rebuilt if the list is modified (elements added, removed or moved)."""
+    elements : list[TextElement]
+    _by_x : list[int]
+    _xs : list[float]
+
+    def __init__(self, elements : list[TextElement]) -> None:
+        self.elements = list(elements)
+        # Sorted positions, ties keep list order
+        self._by_x = sorted(range(len(self.elements)), key=lambda i : self.elements[i].x)
+        self._xs = [self.elements[i].x for i in self._by_x]
+
+    def _closest_along(self, positions : list[int], values : list[float], reference : float, below : Optional[float] = None) -> TextElement :
+        start = bisect_left(values, reference)
+        best_distance = MAX_DISTANCE
+        best_index = -1
+
+        # Distances only grow when walking away from the reference, so each side is walked while it does not get worse than the best match
+        # (equally close elements may come in runs of identical coordinates, the one with the lowest list position wins)
+        for (begin, end, step) in [(start - 1, -1, -1), (start, len(values), 1)] :
+            for i in range(begin, end, step) :
+                distance = abs(reference - values[i])
+                if distance > best_distance :
+                    break
+                # Elements out of the queried part of the page are not candidates, but the ones behind them might be
+                if below is not None and not self.elements[positions[i]].y < below :
+                    continue
+                if distance < best_distance or positions[i] < best_index :
+                    best_distance = distance
+                    best_index = positions[i]
+
+        if best_index != -1 :
+            return self.elements[best_index]
+
+        # Same fallback as a linear scan over the queried elements only : the first one of them (raises IndexError if there is none)
+        if below is None :
+            return self.elements[0]
+        return [x for x in self.elements if x.y < below][0]
+
+    def closest_x(self, reference : TextElement, below : Optional[float] = None) -> TextElement :
+        """Finds the element whose x coordinate is the closest to the reference's one (the reference itself is a valid candidate)
+           @param below : when set, only elements whose y coordinate is strictly lower than this one are considered"""
+        return self._closest_along(self._by_x, self._xs, reference.x, below)
+
+    def closest(self, reference : TextElement) -> TextElement :
+        """Finds the closest element to the reference (euclidean distance), the reference itself (or any element equal to it) is skipped"""
+        start = bisect_left(self._xs, reference.x)
+        best_distance = MAX_DISTANCE
+        best_index = -1
+
+        # Elements are visited by growing x distance, until the x distance alone exceeds the best match distance.
+        # The margin accounts for rounding errors of the euclidean distance (it may be a tiny bit smaller than the x distance alone)
+        for (begin, end, step) in [(start - 1, -1, -1), (start, len(self._xs), 1)] :
+            for i in range(begin, end, step) :
+                if abs(reference.x - self._xs[i]) > best_distance * (1 + 1e-9) :
+                    break
+
+                element = self.elements[self._by_x[i]]
+                distance = math.sqrt(math.pow(reference.x - element.x, 2) + math.pow(reference.y - element.y, 2))
+
+                # Case where we stumble upon our reference, that's not the one we're aiming for !
+                if distance == 0 and element == reference :
+                    continue
+
+                if distance < best_distance or (distance == best_distance and self._by_x[i] < best_index) :
+                    best_distance = distance
+                    best_index = self._by_x[i]
+
+        if best_index == -1 :
+            return self.elements[0]
+        return self.elements[best_index]
+
+
+class TextLabelIndex :
+    """Text lookup table over a list of text elements, used to find labels (category names, field names) without walking the whole list.
+       Elements positions are stored per lowercase text, lookups then only compare the text against the few elements that share the same key.
+       Results are the same as a linear scan of the list : the match is case sensitive and the first matching element in list order wins.
+       The index is meant to be built once per page : lookups can be restricted to a part of the page (a category for instance) once the
+       page was split in groups (see group()), in which case the first matching element in group order wins.
+       Note : the index is a snapshot, it needs to be rebuilt if elements are added or removed, or if element texts change."""
+    elements : list[TextElement]
+    _positions : dict[str, list[int]]
+    # Elements ids -> (group, rank within group)
+    _ranks : dict[int, tuple[int, int]]
+    # Probing text -> positions of the elements containing it
+    _substrings : dict[str, list[int]]
+
+    def __init__(self, elements : list[TextElement]) -> None:
+        self.elements = list(elements)
+        self._positions = {}
+        self._ranks = {}
+        self._substrings = {}
+        for (i, element) in enumerate(self.elements) :
+            self._positions.setdefault(element.text.lower(), []).append(i)
+
+    def group(self, groups : list[list[TextElement]]) -> None :
+        """Splits the indexed elements in groups, so that lookups can then be restricted to one of them.
+           Each element is expected to belong to one group at most, groups lists shall not be reordered afterwards"""
+        self._ranks = {}
+        for (group_index, group) in enumerate(groups) :
+            for (rank, element) in enumerate(group) :
+                self._ranks[id(element)] = (group_index, rank)
+
+    def _restrict(self, candidates : list[TextElement], within : Optional[list[TextElement]]) -> list[TextElement] :
+        if within is None :
+            return candidates
+        if len(within) == 0 :
+            return []
+
+        # Raises a KeyError if the list is not one of the groups
+        group = self._ranks[id(within[0])][0]
+        out = [x for x in candidates if self._ranks.get(id(x), (-1, 0))[0] == group]
+        out.sort(key=lambda x : self._ranks[id(x)][1])
+        return out
+
+    def find_all(self, text : str, within : Optional[list[TextElement]] = None) -> list[TextElement] :
+        """Returns all elements whose text is exactly the probing text
+           @param within : when set, only elements of this group are returned, in group order"""
+        candidates = [self.elements[i] for i in self._positions.get(text.lower(), []) if self.elements[i].text == text]
+        return self._restrict(candidates, within)
+
+    def find(self, text : str, within : Optional[list[TextElement]] = None) -> Optional[TextElement] :
+        """Returns the first element whose text is exactly the probing text, if any"""
+        found = self.find_all(text, within)
+        return found[0] if len(found) != 0 else None
+
+    def find_strict(self, text : str, within : Optional[list[TextElement]] = None) -> TextElement :
+        """Same as find(), but the element *needs* to be there"""
+        elem = self.find(text, within)
+        assert(elem)
+        return elem
+
+    def find_containing(self, text : str, within : Optional[list[TextElement]] = None) -> Optional[TextElement] :
+        """Returns the first element whose text contains the probing text, if any. Exact match is not required.
+           Texts are walked once per probing text, later lookups of the same text (in other groups for instance) are answered from memory"""
+        positions = self._substrings.get(text)
+        if positions is None :
+            # Elements containing the text always have a lowercase key containing the lowercase text
+            lowered = text.lower()
+            positions = sorted([i for (key, values) in self._positions.items() if lowered in key for i in values])
+            self._substrings[text] = positions
+
+        found = self._restrict([self.elements[i] for i in positions if text in self.elements[i].text], within)
+        return found[0] if len(found) != 0 else None
@@ -4,7 +4,23 @@ from typing import Callable
 
 def ensure_folder_exist(folder_path : Path) :
     if not folder_path.exists():
-        folder_path.mkdir(parents=True)
+        # Extraction worker processes may race to create the same folder
+        folder_path.mkdir(parents=True, exist_ok=True)
+
+def write_file_atomically(filepath : Path, write : Callable[[Path], None]) :
+    """Writes a file through a temporary file next to it, which is renamed over the destination once complete.
+       The destination is replaced by a new file rather than rewritten in place : hardlinks to the former file (such as deployed trees)
+       keep their content, and readers never see a half written file.
+       @param :
+            filepath : destination file
+            write    : writes the contents to the path it is given (temporary file path, with a ".tmp" extension)
+    """
+    tmp_filepath = filepath.with_name(filepath.name + ".tmp")
+    try :
+        write(tmp_filepath)
+        os.replace(tmp_filepath, filepath)
+    finally :
+        tmp_filepath.unlink(missing_ok=True)
 
 def list_files_with_predicate(directory : Path, predicate, *args) :
     file_list : list[Path] = []
@@ -1,6 +1,7 @@
 from array import array
 import math
-import sys
+import time
+from typing import Optional
 import cv2
 import numpy as np
 from pathlib import Path
@@ -16,7 +17,8 @@ from skimage.draw import polygon
 
 
 from PIL import Image
-from .filesystem import ensure_folder_exist
+from .filesystem import ensure_folder_exist, write_file_atomically
+from .pdf_book import zone_pixel_box
 from ..Models.recipe import PackagingType
 from .logger import Logger
 
@@ -38,24 +40,13 @@ packaging_type_lookup_contouring = [
     [PackagingType.Barrel,      0.74    ],
 ]
 
-def _compute_perimeter(data : array) -> float:
-    perimeter = 0.0
-    for i in range(0,len(data)):
-        if i == len(data) - 1 :
-            pass
-        # Should wrap back to 0 when i == len(data), so that we also compute the distance between the first and last item
-        next = (i + 1) % (len(data))
-        distance = math.sqrt(math.pow(data[i][0] - data[next][0], 2) + math.pow(data[i][1] - data[next][1], 2))
-        perimeter += distance
+def _compute_perimeter(data : np.ndarray) -> float:
+    # Wraps back to the first point, so that we also compute the distance between the first and last item
+    deltas = np.diff(data, axis=0, append=data[:1])
+    distances = np.sqrt(deltas[:, 0] * deltas[:, 0] + deltas[:, 1] * deltas[:, 1])
 
-    return perimeter
-
-def _find_min_max(value : float, boundaries : list[float]) -> list[float] :
-    if value < boundaries[0] :
-        boundaries[0] = value
-    if value > boundaries[1] :
-        boundaries[1] = value
-    return boundaries
+    # Summed up in order with python floats, which gives the exact same result as a point by point accumulation
+    return sum(distances.tolist(), 0.0)
 
 
 # Copied from https://stackoverflow.com/a/31402351
@@ -66,14 +57,12 @@ def _find_boundaries_non_transparent(data : np.ndarray) -> list[int] :
     return out
 
 def _compute_bounding_box(contour : np.ndarray) -> tuple[list[float], list[float]] :
-    x_boundaries = [sys.float_info.max, 0.0]
-    y_boundaries = [sys.float_info.max, 0.0]
-
-    for point in contour :
-        # Contours are given with the (row, column) nomenclature, so point[0] is the row (y) and point[1] the column (x) ... haha ...
-        y_boundaries = _find_min_max(point[0], y_boundaries)
-        x_boundaries = _find_min_max(point[1], x_boundaries)
-
+    # Contours are given with the (row, column) nomenclature, so point[0] is the row (y) and point[1] the column (x) ... haha ...
+    # Upper boundaries never go below 0, as contours live in image space
+    mins = contour.min(axis=0)
+    maxs = np.maximum(contour.max(axis=0), 0.0)
+    x_boundaries = [float(mins[1]), float(maxs[1])]
+    y_boundaries = [float(mins[0]), float(maxs[0])]
     return (x_boundaries, y_boundaries)
 
 def _compute_aspect_ratio(contour : np.ndarray) -> float :
@@ -112,23 +101,28 @@ def _extract_image(img : cv2.Mat, contour : np.ndarray, background_color=(0,0,0,
     height = len(img)
     width = len(img[0])
 
-    # Heavily inspired from http://tonysyu.github.io/scikit-image/auto_examples/plot_shapes.html
-    extracted_image = np.full((height, width, 4), fill_value=background_color, dtype=np.uint8)
-    rr, cc = polygon(contour[:,0], contour[:,1], img.shape )
-    rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-    extracted_image[rr, cc, 0:3] = rgb_img[rr, cc, 0:3]
-    extracted_image[rr,cc,3] = 255
-
-    output_image = Image.fromarray(extracted_image, mode="RGBA")
+    # Output window : either the whole image or the contour bounding box only.
+    # Bounding box is rounded the same way PIL's Image.crop() does it (python's round()), which was used before.
+    (left, top, right, bottom) = (0, 0, width, height)
     if fit_crop_image :
         (x_boundaries, y_boundaries) = _compute_bounding_box(contour)
-        left = x_boundaries[0]
-        right = x_boundaries[1]
-        top = y_boundaries[0]
-        bottom = y_boundaries[1]
-        output_image = output_image.crop((left, top, right, bottom))  # type: ignore
+        left = round(x_boundaries[0])
+        right = round(x_boundaries[1])
+        top = round(y_boundaries[0])
+        bottom = round(y_boundaries[1])
 
-    return np.array(output_image)
+    # Heavily inspired from http://tonysyu.github.io/scikit-image/auto_examples/plot_shapes.html
+    # Polygon is only rasterized within the output window : shifting the contour by the (integer) window origin is exact,
+    # so pixels are the same as the ones of a full image mask, cropped afterwards
+    extracted_image = np.full((bottom - top, right - left, 4), fill_value=background_color, dtype=np.uint8)
+    mask = np.zeros((bottom - top, right - left), dtype=bool)
+    (rr, cc) = polygon(contour[:,0] - top, contour[:,1] - left, shape=mask.shape)
+    mask[rr, cc] = True
+
+    # Only the pixels of the mask are converted from BGR to RGB
+    extracted_image[mask, 0:3] = img[top:bottom, left:right][mask][:, 2::-1]
+    extracted_image[mask, 3] = 255
+    return extracted_image
 
 def remove_gray_background(img : cv2.Mat) -> cv2.Mat :
     """Trying to get rid of the patterns with color extraction...
@@ -196,17 +190,43 @@ def _find_closest_packaging_type(aspect_ratio : float, lookup_source : list[list
 
     return most_probable_pack[0]
 
-def _extract_silhouette_with_ml(img : cv2.Mat) -> tuple[float, np.ndarray] :
+class ImageExtractionContext :
+    """Long lived state of the image extraction process.
+       It owns the rembg session (the loaded background removal model), which is costly to set up.
+       It is meant to be created once per process and passed along to every extract_biggest_silhouette() call.
+       It also records the time spent on each extracted image."""
+    model_name : str
+    timings : list[tuple[int, float]]
+
+    def __init__(self, model_name : str = "u2net") -> None:
+        self.model_name = model_name
+        self.session = rembg.new_session(model_name)
+        self.timings = []
+
+    def record_timing(self, beer_number : int, elapsed : float) :
+        self.timings.append((beer_number, elapsed))
+
+    def timing_report(self) -> str :
+        if len(self.timings) == 0 :
+            return "No image extracted with model {}".format(self.model_name)
+
+        durations = [x[1] for x in self.timings]
+        slowest = max(self.timings, key=lambda x : x[1])
+        return "Extracted {} images with model {} : total {:.2f}s, mean {:.3f}s/image, min {:.3f}s, max {:.3f}s (beer #{})".format(
+            len(durations), self.model_name, sum(durations), sum(durations) / len(durations), min(durations), slowest[1], slowest[0])
+
+def _extract_silhouette_with_ml(img : cv2.Mat, context : ImageExtractionContext) -> tuple[float, np.ndarray] :
     """Uses Machine learning models (rembg module) to extract image from its background
        This method works very well for "bottles" and cans packages, however it fails for kegs and barrels.
        @param :
-            img : input image, directly read from disk
+            img     : input BGR image, in memory (packaging zone converted from the rendered pixmap, or read from disk by the file based entry point)
+            context : shared image extraction context, which holds the rembg session
        @return
             a tuple of the aspect ratio and the output image
             -> Aspect ratio will be used to discriminate the kind of object we are probably facing, and try to extract
             the image with the contouring method instead (hybrid approach)
        """
-    out_img = Image.fromarray(rembg.remove(img)) # type: ignore
+    out_img = Image.fromarray(rembg.remove(img, session=context.session)) # type: ignore
     boundaries = _find_boundaries_non_transparent(np.array(out_img))
 
     left = boundaries[2]
@@ -224,29 +244,40 @@ def _extract_silhouette_with_contouring(img : cv2.Mat, background_color = (0,0,0
        fails on bottle labels where white levels are quite high (fools the iso-value research method of the marching squares algorithm).
        This method is complementary to the ML one.
        @param :
-            img              : input image, directly read from disk
+            img              : input BGR image, in memory (same image as the one handed to the ML method)
             background_color : used when performing image masking. Outer pixels, excluded from the mask, will receive this background color (transparent by default)
             fit_crop_image   : fits the image to the minimal boundaries of the masked image.
        @return
             a tuple of the aspect ratio and the output image
             -> Aspect ratio will be used to discriminate the kind of object we are probably facing.
        """
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     [perimeter, aspect_ratio, contour] = _scikit_find_biggest_contour(gray)
 
     # Force encode output as .png, in order to be sure file format supports transparency
     extracted_image = _extract_image(img, contour, background_color, fit_crop_image)
     return (aspect_ratio, extracted_image)
 
-def extract_biggest_silhouette(source : Path, destination : Path, logger : Logger, background_color = (0,0,0,0), fit_crop_image = True, beer_number = 0) -> PackagingType :
-    """Extracts the biggest contiguous/opaque element from a source image and produces a .png output image with transparency
+def extract_biggest_silhouette(source : Path, destination : Path, logger : Logger, background_color = (0,0,0,0), fit_crop_image = True, beer_number = 0, context : Optional[ImageExtractionContext] = None) -> PackagingType :
+    """Extracts the biggest contiguous/opaque element from a source image file and produces a .png output image with transparency.
+       See extract_biggest_silhouette_from_image() for parameters, source being the source image file path."""
+    if not source.exists() :
+        logger.log("Could not find input image at pointed disk node : {}".format(source))
+        raise IOError("Could not read input image")
+
+    img = cv2.imread(source.as_posix())
+    return extract_biggest_silhouette_from_image(img, destination, logger, background_color, fit_crop_image, beer_number, context)
+
+def extract_biggest_silhouette_from_image(img : np.ndarray, destination : Path, logger : Logger, background_color = (0,0,0,0), fit_crop_image = True, beer_number = 0, context : Optional[ImageExtractionContext] = None) -> PackagingType :
+    """Extracts the biggest contiguous/opaque element from an in-memory image and produces a .png output image with transparency
        @param :
-            source           : source image file path
+            img              : source BGR image (as read by cv2.imread() or converted from a pdf render with pixmap_to_bgr())
             destination      : output image file path
             logger           : main logger used to log out some useful parsing information
             background_color : output image will have this background color (rgba format). Default is transparent.
             fit_crop_image   : if set to True, will crop the image to the bounding box of the resulting object
             ml_mode          : uses the Machine Learning algorithms in order to extract the images
+            context          : image extraction context, reused across calls. A new one (and its rembg session) is created if None.
        @returns :
             aspect ratio of the image (float) value
     """
@@ -254,17 +285,16 @@ def extract_biggest_silhouette(source : Path, destination : Path, logger : Logge
     output_folder = destination.parent
     ensure_folder_exist(output_folder)
 
-    if not source.exists() :
-        logger.log("Could not find input image at pointed disk node : {}".format(source))
-        raise IOError("Could not read input image")
+    if context is None :
+        context = ImageExtractionContext()
 
-    img = cv2.imread(source.as_posix())
+    start = time.perf_counter()
     aspect_ratio = 0.0
 
     output_image_filepath = destination.parent.joinpath(destination.stem + ".png")
     # Trying with contouring first
 
-    (aspect_ratio, output_image) = _extract_silhouette_with_ml(img)
+    (aspect_ratio, output_image) = _extract_silhouette_with_ml(img, context)
     rounded_ar = round(aspect_ratio, 2)
     probable_packaging_type = _find_closest_packaging_type(rounded_ar, packaging_type_lookup_ml)
 
@@ -301,18 +331,33 @@ def extract_biggest_silhouette(source : Path, destination : Path, logger : Logge
         (aspect_ratio, output_image) = _extract_silhouette_with_contouring(img, background_color, fit_crop_image)
         probable_packaging_type_contouring = _find_closest_packaging_type(rounded_ar, packaging_type_lookup_contouring)
 
+    # Extracted silhouettes are deployed as hardlinks, they are replaced rather than rewritten in place
     output_image = Image.fromarray(output_image)
-    output_image.save(output_image_filepath)
+    write_file_atomically(output_image_filepath, lambda x : output_image.save(x, format="PNG"))
+    context.record_timing(beer_number, time.perf_counter() - start)
     return probable_packaging_type
 
 
-def extract_zone_from_image(pixmap : Pixmap, box : list[float]) -> Image.Image :
-    image_data = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+def pixmap_to_array(pixmap : Pixmap) -> np.ndarray :
+    """Wraps pixmap samples in a (height, width, channels) numpy array, without copying them.
+       Note : the array is a view on the pixmap memory, it is only valid as long as the pixmap itself is alive."""
+    return np.ndarray((pixmap.height, pixmap.width, pixmap.n), dtype=np.uint8, buffer=pixmap.samples_mv, strides=(pixmap.stride, pixmap.n, 1))
 
-    left = int(round(box[0] * pixmap.width))
-    right = int(box[1] *  pixmap.width)
-    top = int(box[2] * pixmap.height)
-    bottom = int(box[3] * pixmap.height)
-    cropped_image = image_data.crop(box=(left, top, right, bottom)) # type: ignore
-
-    return cropped_image
\ No newline at end of file
+def pixmap_to_bgr(pixmap : Pixmap, box : Optional[list[float]] = None) -> np.ndarray :
+    """Converts an RGB pixmap to a BGR image, laid out as if it was read from disk by cv2.imread().
+       @param :
+            pixmap : rendered RGB pixmap
+            box    : optional [x0, x1, y0, y1] zone (relative to pixmap dimensions) to crop before conversion
+       @return
+            BGR image, which owns its memory (pixmap can be released afterwards)"""
+    samples = pixmap_to_array(pixmap)
+    if box is not None :
+        (left, top, right, bottom) = zone_pixel_box(pixmap.width, pixmap.height, box)
+        samples = samples[top:bottom, left:right]
+    return cv2.cvtColor(samples, cv2.COLOR_RGB2BGR)
+
+def save_bgr_image(filepath : Path, img : np.ndarray) :
+    ensure_folder_exist(filepath.parent)
+    # Encoded in memory, as the temporary file extension does not tell the image format
+    (_, data) = cv2.imencode(filepath.suffix, img)
+    write_file_atomically(filepath, lambda x : x.write_bytes(data.tobytes()))
@@ -1,14 +1,33 @@
 from pathlib import Path
+from typing import Optional
 
 class Logger :
     filepath : Path
     _first_run : bool = True
+    _captured : Optional[list[str]] = None
 
 
     def __init__(self, filepath : Path) -> None:
         self.filepath = filepath
 
+    def capture(self) :
+        """Keeps log lines in memory instead of writing them, until they are collected with take_captured().
+           Used by worker processes : lines are handed back to the parent process along with each result,
+           so that concurrent workers never write to the log file themselves."""
+        self._captured = []
+
+    def take_captured(self) -> list[str] :
+        """Returns the lines logged since last call (capture mode only), and forgets them"""
+        lines = self._captured if self._captured is not None else []
+        if self._captured is not None :
+            self._captured = []
+        return lines
+
     def log(self, msg : str) :
+        if self._captured is not None :
+            self._captured.append(msg)
+            return
+
         # Create directory if need be
         if self._first_run :
             if not self.filepath.parent.exists() :
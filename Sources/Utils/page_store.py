@@ -0,0 +1,162 @@
+import mmap
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ..Models.blocks import PageBlocks, TextElement
+
+# Single file binary store holding the text content of all the pages of the book, an alternative to reading back one json file per page.
+# Everything is little endian and 8 bytes aligned, so that arrays are read straight from the memory mapped file :
+#   header     : magic "DDPS", format version (u32), pages count (u32), elements count (u32)
+#   page table : one entry per page (see _PAGE_DTYPE), in beer order
+#   xs, ys     : float64 coordinates of all the elements, page after page
+#   offsets    : u32 start offset of every element text within the text blob, followed by the blob length
+#   texts      : utf-8 text blob
+# Coordinates are kept as float64 : rounding them would shift elements across the row/column thresholds used by the recipe parsers.
+
+_MAGIC = b"DDPS"
+_FORMAT_VERSION = 1
+_HEADER_DTYPE = np.dtype([("magic", "S4"), ("version", "<u4"), ("pages", "<u4"), ("elements", "<u4")])
+_PAGE_DTYPE = np.dtype([
+    ("index", "<i4"),       # Beer index of the page
+    ("first", "<u4"),       # Position of the first element of the page
+    ("count", "<u4"),       # Number of elements in the page
+    ("reserved", "<u4"),
+    ("hash", "S64")         # Hash of the page contents this entry was built from (sha256 hex digest)
+])
+
+def write_page_store(filepath : Path, pages : list[tuple[PageBlocks, str]]) -> None :
+    """Writes a page store file.
+       The file is written next to its final location and moved in place once complete, so readers never see a partial file.
+       @param :
+            filepath : page store file
+            pages    : (page, hash of its contents) list
+    """
+    elements_count = sum([len(x[0].elements) for x in pages])
+    header = np.zeros(1, dtype=_HEADER_DTYPE)
+    header[0] = (_MAGIC, _FORMAT_VERSION, len(pages), elements_count)
+
+    table = np.zeros(len(pages), dtype=_PAGE_DTYPE)
+    first = 0
+    for (i, (page, contents_hash)) in enumerate(pages) :
+        table[i] = (page.index, first, len(page.elements), 0, contents_hash.encode("ascii"))
+        first += len(page.elements)
+
+    elements = [x for (page, _) in pages for x in page.elements]
+    xs = np.array([x.x for x in elements], dtype="<f8")
+    ys = np.array([x.y for x in elements], dtype="<f8")
+    encoded = [x.text.encode("utf-8") for x in elements]
+    offsets = np.zeros(elements_count + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(x) for x in encoded], dtype=np.int64)
+
+    if not filepath.parent.exists() :
+        filepath.parent.mkdir(parents=True)
+    tmp_filepath = filepath.with_name(filepath.name + ".tmp")
+    with open(tmp_filepath, "wb") as file :
+        for array in [header, table, xs, ys, offsets] :
+            file.write(array.tobytes())
+        file.write(b"".join(encoded))
+    os.replace(tmp_filepath, filepath)
+
+
+class PageStore :
+    """Read only access to a page store file, which is memory mapped : opening it only reads the header and the page table,
+       text elements are only built for the pages that are actually read."""
+    filepath : Path
+    _file : Optional[mmap.mmap]
+    _rows : dict[int, int]
+    _table : np.ndarray
+    _xs : np.ndarray
+    _ys : np.ndarray
+    _offsets : np.ndarray
+    _texts_start : int
+
+    def __init__(self, filepath : Path) -> None:
+        """Opens a page store file, raises ValueError if it is not a valid one"""
+        self.filepath = filepath
+        with open(filepath, "rb") as file :
+            if os.fstat(file.fileno()).st_size < _HEADER_DTYPE.itemsize :
+                raise ValueError("{} is too small to be a page store".format(filepath))
+            self._file = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try :
+            # Header is copied out, so that it does not keep a view over the mapped file
+            header = np.frombuffer(self._file[: _HEADER_DTYPE.itemsize], dtype=_HEADER_DTYPE)[0]
+            if header["magic"] != _MAGIC or header["version"] != _FORMAT_VERSION :
+                raise ValueError("{} is not a page store, or was written by another version of the tool".format(filepath))
+            pages_count = int(header["pages"])
+            elements_count = int(header["elements"])
+
+            offset = _HEADER_DTYPE.itemsize
+            self._table = np.frombuffer(self._file, dtype=_PAGE_DTYPE, count=pages_count, offset=offset)
+            offset += self._table.nbytes
+            self._xs = np.frombuffer(self._file, dtype="<f8", count=elements_count, offset=offset)
+            offset += self._xs.nbytes
+            self._ys = np.frombuffer(self._file, dtype="<f8", count=elements_count, offset=offset)
+            offset += self._ys.nbytes
+            self._offsets = np.frombuffer(self._file, dtype="<u4", count=elements_count + 1, offset=offset)
+            self._texts_start = offset + self._offsets.nbytes
+            if self._texts_start + int(self._offsets[-1]) != len(self._file) :
+                raise ValueError("{} is truncated".format(filepath))
+        except ValueError :
+            # Also raised by numpy when arrays don't fit in the file
+            self.close()
+            raise
+
+        self._rows = {int(x) : i for (i, x) in enumerate(self._table["index"].tolist())}
+
+    @staticmethod
+    def open(filepath : Path) -> Optional["PageStore"] :
+        """Opens a page store file. A missing or unreadable file yields None (pages need to be read from their json files)"""
+        if not filepath.exists() :
+            return None
+        try :
+            return PageStore(filepath)
+        except (ValueError, OSError) :
+            return None
+
+    def close(self) -> None :
+        # Arrays are views over the mapped file and need to be released first
+        self._table = self._xs = self._ys = self._offsets = np.empty(0)
+        if self._file is not None :
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "PageStore" :
+        return self
+
+    def __exit__(self, *args) -> None :
+        self.close()
+
+    def __contains__(self, index : int) -> bool :
+        return index in self._rows
+
+    def indices(self) -> list[int] :
+        """Beer indices of all the stored pages, in storage order"""
+        return list(self._rows)
+
+    def contents_hash(self, index : int) -> str :
+        """Returns the hash of the contents the page was stored from, or an empty string if the page is not stored"""
+        row = self._rows.get(index)
+        if row is None :
+            return ""
+        return self._table[row]["hash"].decode("ascii")
+
+    def page(self, index : int) -> PageBlocks :
+        """Reads a single page back, raises KeyError if the page is not stored"""
+        assert(self._file is not None)
+        entry = self._table[self._rows[index]]
+        first = int(entry["first"])
+        end = first + int(entry["count"])
+
+        xs = self._xs[first : end].tolist()
+        ys = self._ys[first : end].tolist()
+        offsets = self._offsets[first : end + 1].tolist()
+        blob = self._file[self._texts_start + offsets[0] : self._texts_start + offsets[-1]]
+        base = offsets[0]
+        texts = [blob[start - base : end - base].decode("utf-8") for (start, end) in zip(offsets, offsets[1:])]
+
+        elements = [TextElement(x=x, y=y, text=text) for (x, y, text) in zip(xs, ys, texts)]
+        return PageBlocks(elements=elements, index=int(entry["index"]))
@@ -1,82 +1,63 @@
-def extract_groups(line : str) -> list[str] :
-    groups : list[str] = []
-    current = ""
-
-    block_parsing = False
-    for i in range(0, len(line)) :
-        if not block_parsing :
-
-            # Start of a group
-            if line[i] == "(" :
-                if i == 0 :
-                    block_parsing = True
-                elif i != 0 and line[i - 1] != "\\" :
-                    block_parsing = True
-                continue
-
-        # In that mode, we take everything that's enclosed within a group
-        else :
-            # End of a group
-            if line[i] == ")" and line[i - 1] != "\\" :
-                block_parsing = False
-                groups.append(current)
-                current = ""
-                continue
-            else :
-                current += line[i]
-
-    return groups
-
-# Extract content from a single line of text
-def parse_line(line : str) -> str :
-    # We need to take out the unicode escapes if it happens to have some
-    #decoded_line = line.encode().decode("unicode-escape")
-    decoded_line = line
-    tj_index = decoded_line.find("Tj")
-    if tj_index == -1 :
-        tj_index = decoded_line.find("TJ")
-
-    inner_block = decoded_line
-
-    # Looking for a very specific pattern , usually we don't have other kind of constructs
-    # So that's why it's so tied to a specific implementation
-    if decoded_line[0] == "[" and decoded_line[tj_index - 1] == "]":
-        inner_block = decoded_line[1 : tj_index - 1]
-
-    groups = extract_groups(inner_block)
-    out = ""
-    for group in groups :
-        out += group
-
-    # Removing extra escapements
-    out = escape_content(out)
-    return out
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+# Patterns shared by the recipe page parsers
+GRAMS_PATTERN = re.compile(r"([0-9]+\.?[0-9]*) *([k]?[g])")
+NUMERICS_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)")
+DEGREES_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)[ ]?°[CF]")
+DEGREES_C_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)[ ]?°C")
+DEGREES_F_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)[ ]?°F")
+
+# This one is simpler as sometimes lb data is missing
+LBS_PATTERN = re.compile(r"([0-9]+\.[0-9]+)")
+
+# Combines NUMERICS_PATTERN and DEGREES_PATTERN in a single scan of the text.
+# It only stops at the start of digit runs (digits not preceded by another digit) and captures, without consuming anything :
+#   - number  : the number starting there (what NUMERICS_PATTERN would match at this position)
+#   - degrees : the temperature value starting there, if any (what DEGREES_PATTERN would match at this position)
+# The first DEGREES_PATTERN match of a text always starts a digit run, so the first captured temperature is the same one,
+# even for odd texts such as "1.2.3°C" where the temperature starts in the middle of a number.
+_NUMERIC_FIELDS_REGEX = re.compile(r"(?<![0-9])(?=(?P<number>[0-9]+\.?[0-9]*))(?:(?=(?P<degrees>[0-9]+\.?[0-9]*)[ ]?°[CF]))?")
+
+# Escape sequences of pdf literal strings (PDF 32000-1:2008, 7.3.4.2) : 1 to 3 octal digits give a character code,
+# a backslash at the end of a line is a line continuation (both are dropped), any other escaped character is taken as-is.
+# Note that "\n", "\t" ... and "\x" escapes aren't decoded either, the escaped letter is simply kept.
+_ESCAPE_REGEX = re.compile(r"\\([0-7]{1,3}|\r\n|.)", re.DOTALL)
 
 def escape_content(line : str) -> str :
-    start = 0
-    end = len(line) - 1
-    index = line.find("\\", 0, end)
-    escaped_version = ""
-    while index != -1 :
-        escaped_version += line[start : index]
-
-        # Decode hexadecmial
-        if line[index + 1] == "x" :
-            pass
-
-        # Decode octal
-        if line[index + 1].isnumeric() :
-            octal_str = line[index + 1 : index + 4]
-            character = chr(int(octal_str, 8))
-            escaped_version += character
-            start = index + 4
-            index = line.find("\\", start, end)
-            continue
-
-        # Regular case
-        escaped_version += line[index + 1]
-        start = index + 2
-        index = line.find("\\", start, end)
-    escaped_version += line[start : end + 1]
-
-    return escaped_version
\ No newline at end of file
+    """Resolves the escape sequences of a pdf literal string content (used by the content stream tokenizer, see content_stream.decode_string()).
+       Differs from the former decoding (see Tests/reference_implementations.py) on malformed input only : octal sequences shorter than 3 digits
+       followed by other characters (or "\\8", "\\9") used to raise or to swallow these characters, and line continuations used to be kept as line breaks."""
+    # Fast path, most lines don't have any escape sequence
+    if "\\" not in line :
+        return line
+
+    # Split gives [text, sequence, text, sequence, ..., text].
+    # A trailing backslash is never matched, as there is nothing left to escape after it
+    parts = _ESCAPE_REGEX.split(line)
+    parts[1::2] = [chr(int(x, 8)) if x[0] in "01234567" else "" if x[0] in "\r\n" else x for x in parts[1::2]]
+    return "".join(parts)
+
+@dataclass
+class NumericFields :
+    leading : Optional[float] = None    # Number the text starts with (same as NUMERICS_PATTERN.match())
+    first : Optional[float] = None      # First number of the text (same as NUMERICS_PATTERN.findall()[0])
+    degrees : Optional[float] = None    # First temperature of the text, either in °C or °F (same as DEGREES_PATTERN.findall()[0])
+
+def scan_numeric_fields(text : str) -> NumericFields :
+    """Extracts all the numeric fields of a text in a single regex pass.
+       Fields that can't be found in the text are left to None."""
+    fields = NumericFields()
+    for match in _NUMERIC_FIELDS_REGEX.finditer(text) :
+        if fields.first is None :
+            fields.first = float(match.group("number"))
+            if match.start() == 0 :
+                fields.leading = fields.first
+
+        degrees = match.group("degrees")
+        if degrees is not None :
+            fields.degrees = float(degrees)
+            # Nothing left to look for
+            break
+    return fields
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import fitz
+from fitz.utils import get_page_pixmap
+
+from .filesystem import write_file_atomically
+
+# Default pdf rendering resolution (PDF user space units are 1/72 inch, so this renders pages at their nominal size)
+DEFAULT_RENDER_DPI = 72
+
+def zone_pixel_box(width : int, height : int, zone : list[float]) -> tuple[int, int, int, int] :
+    """Converts a relative [x0, x1, y0, y1] zone to a (left, top, right, bottom) pixel box, within an image of the given size"""
+    left = int(round(zone[0] * width))
+    right = int(zone[1] * width)
+    top = int(zone[2] * height)
+    bottom = int(zone[3] * height)
+    return (left, top, right, bottom)
+
+
+class PdfBook :
+    """Single handle on the source pdf book, shared by the text and image extraction stages.
+       MuPDF reads the file lazily through its own file stream (only the cross reference table is parsed upon opening),
+       so pages are decoded on demand and the whole book is never loaded in memory at once.
+       Note : handles can't be shared across processes, each worker process needs to open its own book."""
+    filepath : Path
+    document : fitz.Document
+
+    def __init__(self, filepath : Path) -> None:
+        self.filepath = filepath
+        self.document = fitz.Document(filepath.as_posix()) # type: ignore
+
+    def __enter__(self) -> "PdfBook" :
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) :
+        self.document.close()
+
+    def page_count(self) -> int :
+        return self.document.page_count
+
+    def page_contents(self, page_number : int) -> bytes :
+        """Returns the decoded content stream of a page (all of its content streams concatenated)"""
+        return self.document[page_number].read_contents()
+
+    def render_page(self, page_number : int, dpi : int = DEFAULT_RENDER_DPI) -> fitz.Pixmap :
+        """Renders the full page as a pixmap"""
+        return get_page_pixmap(self.document, page_number, dpi=dpi)
+
+    def render_zone(self, page_number : int, zone : list[float], dpi : int = DEFAULT_RENDER_DPI) -> fitz.Pixmap :
+        """Renders only a zone of the page, MuPDF does not rasterize anything outside of it.
+           Output is aligned on the same pixel grid as the full page render cropped with zone_pixel_box() (same size, same pixels),
+           anti-aliasing of shapes crossing the zone borders may only differ slightly.
+           @param :
+                page_number : page index within the book
+                zone        : [x0, x1, y0, y1] zone, relative to the page dimensions (0 to 1)
+                dpi         : render resolution
+           @return
+                pixmap of the zone only"""
+        page = self.document[page_number]
+        zoom = dpi / 72
+        matrix = fitz.Matrix(zoom, zoom)
+        full_size = (page.rect * matrix).irect
+        (left, top, right, bottom) = zone_pixel_box(full_size.width, full_size.height, zone)
+
+        # Clip rectangle is expressed in page coordinates, pixel box is converted back to it
+        origin = page.rect.tl
+        clip = fitz.Rect(left / zoom, top / zoom, right / zoom, bottom / zoom) + (origin.x, origin.y, origin.x, origin.y)
+        return page.get_pixmap(matrix=matrix, clip=clip)
+
+    def save_single_page(self, page_number : int, filepath : Path) :
+        """Writes a page to disk as a standalone single page pdf document"""
+        if not filepath.parent.exists() :
+            filepath.parent.mkdir(parents=True, exist_ok=True)
+
+        single_page = fitz.Document()
+        single_page.insert_pdf(self.document, from_page=page_number, to_page=page_number)
+        # No new document id, so that the same page always produces the same file.
+        # Cached pages are deployed as hardlinks, they are replaced rather than rewritten in place
+        write_file_atomically(filepath, lambda x : single_page.save(x.as_posix(), garbage=3, deflate=True, no_new_id=True))
+        single_page.close()
@@ -1,33 +1,358 @@
-
+import codecs
 import json
+import os
+import re
+import sqlite3
+from collections import OrderedDict
+from dataclasses import dataclass
 from pathlib import Path
+from typing import IO, Any, Iterable, Iterator, Optional
 
 # Local utils imports
 from ..Models.recipe import Recipe
-from ..Utils.filesystem import ensure_folder_exist
+from ..Models.serializer import plan_for, recipes_from_json, collector_paused
+from ..Utils.filesystem import ensure_folder_exist, list_files_pattern
+from ..Utils.cache_manifest import FileStamp
+
+# Recipes books written in the cache are also written in a compact single file SQLite database, next to the json file (all_recipes.json -> all_recipes.db).
+# One row per recipe, in book order, holding the compact json of the recipe. It records the json file it was written along with,
+# so that it's only used as long as the json file was not modified by something else.
+# This is an internal cache format : it's opt-in (see dump_all_recipes_to_disk()) and never part of the published database.
+RECIPES_STORE_SUFFIX = ".db"
+_STORE_FORMAT_VERSION = "1"
+
+def recipes_store_filepath(json_filepath : Path) -> Path :
+    return json_filepath.with_suffix(RECIPES_STORE_SUFFIX)
+
+def dump_recipes_store(output_file : Path, all_recipes : list[Recipe], source_file : Optional[Path] = None) :
+    """Writes recipes to a recipes store. The file is written next to its final location and moved in place once complete.
+       @param :
+            output_file : recipes store file
+            all_recipes : recipes, in book order
+            source_file : json file holding the same recipes, the store is only used along with this very file
+    """
+    tmp_filepath = output_file.with_name(output_file.name + ".tmp")
+    if tmp_filepath.exists() :
+        tmp_filepath.unlink()
+
+    source_stamp = FileStamp.from_file(source_file) if source_file is not None else FileStamp()
+    encode = plan_for(Recipe).encode
+    connection = sqlite3.connect(tmp_filepath)
+    try :
+        with connection :
+            connection.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.execute("CREATE TABLE recipes (position INTEGER PRIMARY KEY, number INTEGER, name TEXT, content TEXT)")
+            connection.execute("CREATE INDEX recipes_number ON recipes (number)")
+            connection.executemany("INSERT INTO meta VALUES (?, ?)", [("version", _STORE_FORMAT_VERSION), ("source", json.dumps(source_stamp.to_json()))])
+            connection.executemany("INSERT INTO recipes VALUES (?, ?, ?, ?)",
+                                   [(i, x.number.value, x.name.value, json.dumps(encode(x), separators=(",", ":"))) for (i, x) in enumerate(all_recipes)])
+    finally :
+        connection.close()
+    os.replace(tmp_filepath, output_file)
+
+def _open_recipes_store(input_file : Path, source_file : Optional[Path] = None) -> Optional[sqlite3.Connection] :
+    """Opens a recipes store for reading. Missing, unreadable or outdated (source file changed since) stores yield None"""
+    if not input_file.exists() :
+        return None
+    connection = None
+    try :
+        connection = sqlite3.connect("{}?mode=ro".format(input_file.resolve().as_uri()), uri=True)
+        meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+    except sqlite3.Error :
+        if connection is not None :
+            connection.close()
+        return None
+
+    valid = meta.get("version") == _STORE_FORMAT_VERSION
+    if valid and source_file is not None :
+        source_stamp = FileStamp()
+        source_stamp.from_json(json.loads(meta.get("source", "{}")))
+        valid = source_stamp.hash != "" and source_stamp.matches(source_file)
+    if not valid :
+        connection.close()
+        return None
+    return connection
+
+def read_recipes_store(input_file : Path, source_file : Optional[Path] = None) -> Optional[list[Recipe]] :
+    """Reads all recipes of a recipes store, in book order. Returns None if the store can't be used (see _open_recipes_store())"""
+    connection = _open_recipes_store(input_file, source_file)
+    if connection is None :
+        return None
+    try :
+        with collector_paused() :
+            contents = [json.loads(x[0]) for x in connection.execute("SELECT content FROM recipes ORDER BY position")]
+    finally :
+        connection.close()
+    return recipes_from_json(contents)
+
+def read_recipe_from_store(input_file : Path, number : int, source_file : Optional[Path] = None) -> Optional[Recipe] :
+    """Reads a single recipe out of a recipes store, without reading the other ones.
+       Returns None if the recipe is not in the store, or if the store can't be used"""
+    connection = _open_recipes_store(input_file, source_file)
+    if connection is None :
+        return None
+    try :
+        return _find_recipe(connection, number)
+    finally :
+        connection.close()
+
+def _find_recipe(connection : sqlite3.Connection, number : int) -> Optional[Recipe] :
+    row = connection.execute("SELECT content FROM recipes WHERE number = ? ORDER BY position LIMIT 1", (number,)).fetchone()
+    if row is None :
+        return None
+    return plan_for(Recipe).decode(json.loads(row[0]))
 
-def dump_all_recipes_to_disk(output_file : Path, all_recipes:  list[Recipe]) :
-    json_data = []
-    for recipe in all_recipes :
-        json_data.append(recipe.to_json())
-    with open(output_file, "w") as file :
-        json.dump({"recipes" : json_data}, file, indent=4)
+def write_recipes_stream(output_file : Path, recipes : Iterable[Recipe]) :
+    """Writes a recipes book json file one recipe at a time, so that only one encoded recipe is held in memory at once.
+       Output is the same as json.dump({"recipes" : [...]}, indent=4). The file is written next to its final location and moved in place once complete.
+       @param :
+            output_file : recipes book json file
+            recipes     : recipes, in book order (any iterable, including generators)
+    """
+    tmp_filepath = output_file.with_name(output_file.name + ".tmp")
+    encode = plan_for(Recipe).encode
+    try :
+        with open(tmp_filepath, "w") as file :
+            file.write('{\n    "recipes": [')
+            count = 0
+            for recipe in recipes :
+                # Json strings can't hold line breaks, lines of the encoded recipe only need to be shifted to the array level
+                file.write(("\n" if count == 0 else ",\n") + "        " + json.dumps(encode(recipe), indent=4).replace("\n", "\n        "))
+                count += 1
+            file.write("]\n}" if count == 0 else "\n    ]\n}")
+    except BaseException :
+        tmp_filepath.unlink(missing_ok=True)
+        raise
+    os.replace(tmp_filepath, output_file)
+
+def dump_all_recipes_to_disk(output_file : Path, all_recipes:  Iterable[Recipe], with_store : bool = False) :
+    """Writes a recipes book json file.
+       @param :
+            all_recipes : recipes, in book order. Recipes are streamed to the file, so any iterable works unless with_store is set (a list is needed then)
+            with_store : also writes the compact recipes store next to it. Only meant for cache directories,
+                         otherwise an existing store is removed (it would be outdated anyway)
+    """
+    write_recipes_stream(output_file, all_recipes)
+    store_filepath = recipes_store_filepath(output_file)
+    if with_store :
+        dump_recipes_store(store_filepath, all_recipes, output_file)
+    else :
+        store_filepath.unlink(missing_ok=True)
 
 def read_all_recipes(input_file : Path) -> list[Recipe] :
-    all_recipes : list[Recipe] = []
-    with open(input_file, 'r') as file :
+    # Compact store is used whenever it was written along with this very json file
+    recipes = read_recipes_store(recipes_store_filepath(input_file), input_file)
+    if recipes is not None :
+        return recipes
+
+    with open(input_file, 'r') as file, collector_paused() :
         content = json.load(file)
-        for recipe in content["recipes"] :
-            new_recipe = Recipe()
-            new_recipe.from_json(recipe)
-            all_recipes.append(new_recipe)
+    return recipes_from_json(content["recipes"])
 
-    return all_recipes
+def read_recipe(input_file : Path, number : int) -> Optional[Recipe] :
+    """Reads a single recipe (by number) from a recipes book json file, or from its compact store when possible"""
+    connection = _open_recipes_store(recipes_store_filepath(input_file), input_file)
+    if connection is None :
+        with RecipeBook(input_file) as book :
+            return book.get(number)
+    try :
+        return _find_recipe(connection, number)
+    finally :
+        connection.close()
 
 def dump_individual_recipes_files_to_disk(output_folder : Path, recipes_list : list[Recipe]):
     ensure_folder_exist(output_folder)
+    encode = plan_for(Recipe).encode
     for recipe in recipes_list :
         filename = f"recipe_{recipe.number.value}.json"
         filepath = output_folder.joinpath(filename)
         with open(filepath, 'w') as file :
-            json.dump(recipe.to_json(), file, indent=4)
\ No newline at end of file
+            json.dump(encode(recipe), file, indent=4)
+
+
+_WHITESPACES = re.compile(r"[ \t\n\r]*")
+# Characters that may follow a complete json value
+_VALUE_DELIMITERS = {" ", "\t", "\n", "\r", ",", "]", "}"}
+_CHUNK_SIZE = 1 << 16
+
+@dataclass
+class _BookEntry :
+    number : int
+    filepath : Path
+    start : int         # Byte offsets of the recipe json node within the file
+    end : int
+
+def _read_recipes_nodes(file : IO[bytes], chunk_size : int = _CHUNK_SIZE) -> Iterator[tuple[dict, int, int]] :
+    """Reads the recipes array of a recipes book json file ({"recipes" : [...]}) one node at a time, from a binary file.
+       Only the node being parsed (and what's left of the current chunk) is held in memory. Raises ValueError on malformed files.
+       @return :
+            recipes json nodes, along with their start and end byte offsets in the file
+    """
+    decoder = json.JSONDecoder()
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    text = ""                   # Not yet consumed part of the file
+    text_offset = 0             # Byte offset of text[0]
+    index = 0
+    eof = False
+
+    def fill() -> bool :
+        nonlocal text, eof
+        if eof :
+            return False
+        data = file.read(chunk_size)
+        eof = len(data) == 0
+        text += utf8_decoder.decode(data, final=eof)
+        return not eof
+
+    def skip(expected : str = "") -> None :
+        nonlocal index
+        while True :
+            index = _WHITESPACES.match(text, index).end()   #type: ignore
+            if index < len(text) or not fill() :
+                break
+        if expected != "" :
+            if text[index : index + 1] != expected :
+                raise ValueError("{} : expected '{}' at position {}".format(file.name, expected, text_offset + index))
+            index += 1
+            skip()
+
+    def decode() -> Any :
+        # Objects, arrays and strings are complete once decoded, as they end with their own delimiter.
+        # Other values (numbers, true, false, null) are only known to be complete when followed by a delimiter :
+        # "1." or "1e" at the end of a chunk decodes as 1, while the number goes on in the next chunk
+        nonlocal index
+        while True :
+            try :
+                (value, end) = decoder.raw_decode(text, index)
+                if isinstance(value, (dict, list, str)) or eof or text[end : end + 1] in _VALUE_DELIMITERS :
+                    index = end
+                    return value
+            except json.JSONDecodeError :
+                if eof :
+                    raise
+            fill()
+
+    def byte_length(part : str) -> int :
+        return len(part) if part.isascii() else len(part.encode("utf-8"))
+
+    skip("{")
+    while text[index : index + 1] != "}" :
+        key = decode()
+        skip(":")
+        if key != "recipes" :
+            decode()
+            skip()
+        else :
+            skip("[")
+            while text[index : index + 1] != "]" :
+                # Consumed text is dropped before each recipe
+                text_offset += byte_length(text[:index])
+                (text, index) = (text[index:], 0)
+                node = decode()
+                yield (node, text_offset, text_offset + byte_length(text[:index]))
+                skip()
+                if text[index : index + 1] == "," :
+                    skip(",")
+            skip("]")
+        if text[index : index + 1] == "," :
+            skip(",")
+
+def _index_recipes_array(filepath : Path) -> list[_BookEntry] :
+    """Finds where every recipe of a recipes book json file is located. No Recipe object is built."""
+    with open(filepath, "rb") as file :
+        return [_BookEntry(node.get("number") or 0, filepath, start, end) for (node, start, end) in _read_recipes_nodes(file)]
+
+def iter_recipes(input_file : Path) -> Iterator[Recipe] :
+    """Yields recipes of a recipes book json file one by one, in book order, without ever loading the whole file"""
+    decode = plan_for(Recipe).decode
+    with open(input_file, "rb") as file :
+        for (node, _, _) in _read_recipes_nodes(file) :
+            yield decode(node)
+
+class RecipeBook :
+    """Read only, lazy access to a recipes book : either an all_recipes.json file or a directory of recipe_<number>.json files.
+       Opening the book only locates recipes within the file(s). Recipes are decoded when they are accessed (by number or by iterating
+       over the book) and the most recently used ones are kept in a cache : the returned recipes are shared with it, modifying them
+       modifies what later reads return."""
+    path : Path
+    cache_size : int
+    _entries : list[_BookEntry]
+    _positions : dict[int, int]                   # Recipe number -> position of the first recipe with this number
+    _cache : OrderedDict[int, Recipe]             # Positions -> decoded recipes, least recently used first
+    _file : Optional[IO[bytes]]
+
+    def __init__(self, path : Path, cache_size : int = 64) -> None:
+        """Opens a recipes book, raises ValueError if the json file is not a recipes book"""
+        self.path = path
+        self.cache_size = max(1, cache_size)
+        self._cache = OrderedDict()
+        self._file = None
+        if path.is_dir() :
+            numbered = [(x.stem[len("recipe_"):], x) for x in list_files_pattern(path, "recipe_", ".json")]
+            numbered = sorted([(int(number), x) for (number, x) in numbered if number.isdigit()])
+            self._entries = [_BookEntry(number, x, 0, x.stat().st_size) for (number, x) in numbered]
+        else :
+            self._entries = _index_recipes_array(path)
+            self._file = open(path, "rb")
+
+        self._positions = {}
+        for (position, entry) in enumerate(self._entries) :
+            self._positions.setdefault(entry.number, position)
+
+    def close(self) -> None :
+        if self._file is not None :
+            self._file.close()
+            self._file = None
+        self._cache.clear()
+
+    def __enter__(self) -> "RecipeBook" :
+        return self
+
+    def __exit__(self, *args) -> None :
+        self.close()
+
+    def __len__(self) -> int :
+        return len(self._entries)
+
+    def __contains__(self, number : int) -> bool :
+        return number in self._positions
+
+    def numbers(self) -> list[int] :
+        """Recipes numbers, in book order"""
+        return [x.number for x in self._entries]
+
+    def _read(self, position : int) -> Recipe :
+        recipe = self._cache.get(position)
+        if recipe is not None :
+            self._cache.move_to_end(position)
+            return recipe
+
+        entry = self._entries[position]
+        if self._file is not None :
+            self._file.seek(entry.start)
+            data = self._file.read(entry.end - entry.start)
+        else :
+            data = entry.filepath.read_bytes()
+        recipe = plan_for(Recipe).decode(json.loads(data))
+
+        self._cache[position] = recipe
+        if len(self._cache) > self.cache_size :
+            self._cache.popitem(last=False)
+        return recipe
+
+    def get(self, number : int) -> Optional[Recipe] :
+        """Returns the recipe with this number, or None if it's not in the book"""
+        position = self._positions.get(number)
+        if position is None :
+            return None
+        return self._read(position)
+
+    def __getitem__(self, number : int) -> Recipe :
+        recipe = self.get(number)
+        if recipe is None :
+            raise KeyError(number)
+        return recipe
+
+    def __iter__(self) -> Iterator[Recipe] :
+        for position in range(len(self._entries)) :
+            yield self._read(position)
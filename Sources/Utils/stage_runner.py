@@ -0,0 +1,274 @@
+import json
+import os
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from ..Models.jsonable import Jsonable
+from .cache_manifest import FileStamp, StageRecord, hash_bytes
+from .filesystem import list_all_files
+from .logger import Logger
+
+# Runs a set of stages in a single process, in dependency order. Each stage is identified by a fingerprint built out of
+# its parameters, the content of its input files and the results of the stages it depends on. A stage whose fingerprint
+# did not change since last run, and whose outputs are still on disk untouched, is skipped.
+# Stages receive the results of their dependencies lazily : results of skipped stages are only read back when a stage that
+# runs actually reads them. Skipped stages that can't read their results back are run again (and reported as such) in that case.
+
+STATUS_RUN = "run"
+STATUS_SKIPPED = "skipped"
+
+@dataclass
+class Stage :
+    name : str
+    run : Callable[[Mapping[str, Any]], Any]                        # Receives the results of the dependencies, by stage name
+    dependencies : list[str] = field(default_factory=list)
+    inputs : list[Path] = field(default_factory=list)               # Files the stage reads, other than its dependencies results
+    parameters : dict = field(default_factory=dict)                 # Options and versions that change the stage results
+    outputs : list[Path] = field(default_factory=list)              # Files (or directories) the stage writes
+    load : Optional[Callable[[], Any]] = None                       # Reads the results back from the outputs, when the stage is skipped
+
+
+@dataclass
+class StageReport :
+    name : str
+    status : str
+    wall_time : float = 0.0         # Seconds
+    peak_rss : int = 0              # Peak resident memory of the process while the stage ran, in kB (0 if unknown)
+
+
+@dataclass
+class PipelineManifest(Jsonable) :
+    """Fingerprints and outputs of the last successful run of each stage"""
+    stages : dict[str, StageRecord] = field(default_factory=dict)
+
+    def to_json(self) -> dict:
+        return {"stages" : {key : value.to_json() for (key, value) in self.stages.items()}}
+
+    def from_json(self, content: dict) -> None:
+        self.stages = {}
+        for (key, value) in self._read_prop("stages", content, {}).items() :
+            record = StageRecord()
+            record.from_json(value)
+            self.stages[key] = record
+
+    @staticmethod
+    def load(filepath : Path) -> "PipelineManifest" :
+        manifest = PipelineManifest()
+        if not filepath.exists() :
+            return manifest
+        try :
+            with open(filepath, "r") as file :
+                manifest.from_json(json.load(file))
+        except (ValueError, KeyError, TypeError) :
+            manifest = PipelineManifest()
+        return manifest
+
+    def save(self, filepath : Path) :
+        if not filepath.parent.exists() :
+            filepath.parent.mkdir(parents=True)
+        tmp_filepath = filepath.with_name(filepath.name + ".tmp")
+        with open(tmp_filepath, "w") as file :
+            json.dump(self.to_json(), file, indent=4)
+        tmp_filepath.replace(filepath)
+
+
+def _reset_peak_rss() -> bool :
+    """Resets the peak resident memory of the process, so that it can be measured per stage (Linux only)"""
+    try :
+        with open("/proc/self/clear_refs", "w") as file :
+            file.write("5")
+        return True
+    except OSError :
+        return False
+
+def _peak_rss() -> int :
+    """Peak resident memory of the process, in kB"""
+    try :
+        with open("/proc/self/status", "r") as file :
+            for line in file :
+                if line.startswith("VmHWM:") :
+                    return int(line.split()[1])
+    except (OSError, ValueError, IndexError) :
+        pass
+
+    # Peak since the process started, can't be reset
+    try :
+        import resource
+    except ImportError :
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS
+    return peak // 1024 if os.uname().sysname == "Darwin" else peak
+
+def sort_stages(stages : list[Stage]) -> list[Stage] :
+    """Orders stages so that every stage comes after its dependencies (declaration order is kept otherwise)"""
+    by_name = {x.name : x for x in stages}
+    ordered : list[Stage] = []
+    visiting : set[str] = set()
+
+    def visit(stage : Stage) :
+        if stage.name in [x.name for x in ordered] :
+            return
+        if stage.name in visiting :
+            raise ValueError("Stage dependency cycle found through stage {}".format(stage.name))
+        visiting.add(stage.name)
+        for dependency in stage.dependencies :
+            if not dependency in by_name :
+                raise ValueError("Stage {} depends on unknown stage {}".format(stage.name, dependency))
+            visit(by_name[dependency])
+        visiting.remove(stage.name)
+        ordered.append(stage)
+
+    for stage in stages :
+        visit(stage)
+    return ordered
+
+def _output_files(stage : Stage) -> list[Path] :
+    files : list[Path] = []
+    for output in stage.outputs :
+        files += sorted(list_all_files(output)) if output.is_dir() else [output]
+    return files
+
+def _artefact_key(filepath : Path, root_dir : Path) -> str :
+    return Path(os.path.relpath(filepath, root_dir)).as_posix()
+
+def _input_hashes(stage : Stage, record : Optional[StageRecord], root_dir : Path) -> dict[str, FileStamp] :
+    """Stamps the stage input files. Files that were not touched since last run are not hashed again"""
+    former = {}
+    if record is not None :
+        for (key, value) in record.metadata.get("inputs", {}).items() :
+            former[key] = FileStamp()
+            former[key].from_json(value)
+
+    stamps : dict[str, FileStamp] = {}
+    for input_file in stage.inputs :
+        key = _artefact_key(input_file, root_dir)
+        if key in former and former[key].matches(input_file) :
+            stamps[key] = former[key]
+        elif input_file.exists() :
+            stamps[key] = FileStamp.from_file(input_file)
+        else :
+            stamps[key] = FileStamp()
+    return stamps
+
+def _fingerprint(stage : Stage, inputs : dict[str, FileStamp], signatures : dict[str, str]) -> str :
+    content = {
+        "parameters" : stage.parameters,
+        "inputs" : {key : value.hash for (key, value) in sorted(inputs.items())},
+        "dependencies" : {x : signatures[x] for x in stage.dependencies}
+    }
+    return hash_bytes(json.dumps(content, sort_keys=True, default=str).encode("utf-8"))
+
+def _is_fresh(stage : Stage, record : Optional[StageRecord], fingerprint : str, root_dir : Path) -> bool :
+    if record is None or record.input_hash != fingerprint :
+        return False
+    if not all([x.exists() for x in stage.outputs]) :
+        return False
+    return all([stamp.matches(root_dir.joinpath(key)) for (key, stamp) in record.artefacts.items()])
+
+class DependencyResults(Mapping[str, Any]) :
+    """Results of the dependencies of a stage, by stage name. Each result is only resolved when the stage reads it"""
+
+    def __init__(self, dependencies : list[str], resolve : Callable[[str], Any]) -> None:
+        self._dependencies = dependencies
+        self._resolve = resolve
+
+    def __getitem__(self, name : str) -> Any :
+        if not name in self._dependencies :
+            raise KeyError(name)
+        return self._resolve(name)
+
+    def __iter__(self) -> Iterator[str] :
+        return iter(self._dependencies)
+
+    def __len__(self) -> int :
+        return len(self._dependencies)
+
+def run_pipeline(stages : list[Stage], manifest_filepath : Path, logger : Logger, forced : Optional[list[str]] = None) -> list[StageReport] :
+    """Runs stale stages in dependency order.
+       @param :
+            stages            : stages to run
+            manifest_filepath : records stages fingerprints. Paths are recorded relative to its directory
+            logger            : progress logs
+            forced            : names of the stages that run even though they look up to date
+       @return
+            one report per stage, in run order
+    """
+    forced = forced or []
+    root_dir = manifest_filepath.parent
+    manifest = PipelineManifest.load(manifest_filepath)
+    ordered = sort_stages(stages)
+    by_name = {x.name : x for x in ordered}
+
+    results : dict[str, Any] = {}
+    signatures : dict[str, str] = {}
+    reports : list[StageReport] = []
+
+    def run_stage(stage : Stage) :
+        logger.log("Running stage {} ...".format(stage.name))
+        record = manifest.stages.get(stage.name)
+        # Where the peak can't be reset, this is the peak since the process started
+        _reset_peak_rss()
+        start = time.perf_counter()
+        results[stage.name] = stage.run(DependencyResults(stage.dependencies, result_of))
+        wall_time = time.perf_counter() - start
+        reports.append(StageReport(stage.name, STATUS_RUN, wall_time, _peak_rss()))
+
+        # Inputs are stamped again, stages may produce some of them (a downloaded file for instance)
+        inputs = _input_hashes(stage, record, root_dir)
+        fingerprint = _fingerprint(stage, inputs, signatures)
+
+        # Stages that depend on this one only need to run again if its outputs actually changed
+        record = StageRecord(input_hash=fingerprint, metadata={"inputs" : {key : value.to_json() for (key, value) in inputs.items()}})
+        for output in _output_files(stage) :
+            record.artefacts[_artefact_key(output, root_dir)] = FileStamp.from_file(output)
+        outputs_hash = hash_bytes("".join([key + value.hash for (key, value) in sorted(record.artefacts.items())]).encode("utf-8"))
+        signatures[stage.name] = outputs_hash if len(stage.outputs) != 0 else fingerprint
+        record.metadata["signature"] = signatures[stage.name]
+        manifest.stages[stage.name] = record
+
+        # Saved after each stage, so that an interrupted run keeps what was done
+        manifest.save(manifest_filepath)
+
+    def result_of(name : str) -> Any :
+        # Only skipped stages results can be missing : they are read back from their outputs,
+        # or the stage runs again if it has no way to read them back
+        if not name in results :
+            stage = by_name[name]
+            if stage.load is not None :
+                logger.log("Reading back results of stage {} ...".format(name))
+                results[name] = stage.load()
+            else :
+                logger.log("Stage {} can't read its results back, it runs again for the stages that need them.".format(name))
+                reports[:] = [x for x in reports if x.name != name]
+                run_stage(stage)
+        return results[name]
+
+    for stage in ordered :
+        record = manifest.stages.get(stage.name)
+        inputs = _input_hashes(stage, record, root_dir)
+        fingerprint = _fingerprint(stage, inputs, signatures)
+        if not stage.name in forced and _is_fresh(stage, record, fingerprint, root_dir) :
+            assert(record is not None)
+            logger.log("Stage {} is up to date, skipped.".format(stage.name))
+            signatures[stage.name] = record.metadata.get("signature", fingerprint)
+            reports.append(StageReport(stage.name, STATUS_SKIPPED))
+            continue
+        run_stage(stage)
+
+    return reports
+
+def format_reports(reports : list[StageReport]) -> str :
+    """Formats stage reports as a table"""
+    lines = ["{:<16}{:<10}{:>12}{:>14}".format("Stage", "Status", "Wall time", "Peak RSS")]
+    for report in reports :
+        if report.status == STATUS_SKIPPED :
+            lines.append("{:<16}{:<10}{:>12}{:>14}".format(report.name, report.status, "-", "-"))
+            continue
+        peak = "{:.1f} MB".format(report.peak_rss / 1024) if report.peak_rss != 0 else "?"
+        lines.append("{:<16}{:<10}{:>12}{:>14}".format(report.name, report.status, "{:.2f} s".format(report.wall_time), peak))
+    lines.append("{:<16}{:<10}{:>12}".format("Total", "", "{:.2f} s".format(sum([x.wall_time for x in reports]))))
+    return "\n".join(lines)
@@ -162,26 +162,8 @@ def dump_dbs(name_list : list[str], content_mapping : list[T], db_basename : str
     with open(output_content_mapping_filepath, 'w') as file :
         json.dump(content_rv_db_json, file, indent=4)
 
-def main(args : list[str]):
-    usage_str = "Usage : python -m Sources.dbanalyser [input_file] [output_file]"
-    parser = argparse.ArgumentParser("DB Analyser", usage=usage_str, description="Analyses an existing extracted database and produces reversed indexed db by properties.")
-    parser.add_argument("input_file", help="Input file (all_recipes.json) where db is stored as json text")
-    parser.add_argument("output_directory", help="Output directory where analyzed reversed db will be written")
-
-
-    commands = parser.parse_args(args)
-    input_file = Path(commands.input_file)
-    output_directory = Path(commands.output_directory)
-    fs.ensure_folder_exist(output_directory)
-
-    logger = Logger(output_directory.joinpath("dbanalyser_logs.txt"))
-    if not input_file.exists():
-        logger.log("/!\\ Input file does not exist, cannot continue with db analysis.")
-        return 1
-
-    logger.log("Reading all recipes from file ...")
-    all_recipes = read_all_recipes(input_file)
-
+def analyse_recipes(all_recipes : list[rcp.Recipe], output_directory : Path, logger : Logger) -> None :
+    """Builds reversed indexed databases (by hops, malts, yeasts, tags, food pairings and styles) and writes them to the output directory"""
     logger.log("Extracting hops data ...")
     (hops_list, hops_mappings) = extract_properties(all_recipes, PropKind.Hop)
     logger.log("-> Ok")
@@ -230,6 +212,28 @@ def main(args : list[str]):
     dump_dbs(styles_list, styles_mappings, "styles", output_directory)
     logger.log("-> Ok")
 
+def main(args : list[str]):
+    usage_str = "Usage : python -m Sources.dbanalyser [input_file] [output_file]"
+    parser = argparse.ArgumentParser("DB Analyser", usage=usage_str, description="Analyses an existing extracted database and produces reversed indexed db by properties.")
+    parser.add_argument("input_file", help="Input file (all_recipes.json) where db is stored as json text")
+    parser.add_argument("output_directory", help="Output directory where analyzed reversed db will be written")
+
+
+    commands = parser.parse_args(args)
+    input_file = Path(commands.input_file)
+    output_directory = Path(commands.output_directory)
+    fs.ensure_folder_exist(output_directory)
+
+    logger = Logger(output_directory.joinpath("dbanalyser_logs.txt"))
+    if not input_file.exists():
+        logger.log("/!\\ Input file does not exist, cannot continue with db analysis.")
+        return 1
+
+    logger.log("Reading all recipes from file ...")
+    all_recipes = read_all_recipes(input_file)
+
+    analyse_recipes(all_recipes, output_directory, logger)
+
 
     return 0
 
@@ -1,51 +1,104 @@
 #!/usr/bin/python
 
 import string
-import re
 import sys
 import math
 import json
 from pathlib import Path
 import argparse
 from enum import Enum
-import shutil
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
 
 
 from copy import copy
 import traceback
 from typing import Optional
 
-from pypdf import PageObject, PdfWriter, PdfReader
-import fitz
-from fitz.utils import get_page_pixmap
 
 # Local imports
 
-from .Utils.parsing import parse_line
 from .Utils.logger import Logger
-from .Utils.downloader import download_pdf
-from .Utils.recipe_service import dump_all_recipes_to_disk
-from .Models.blocks import PageBlocks, Coordinates, TextBlock, TextElement
+from .Utils.downloader import download_pdf, partial_filepath
+from .Utils.pdf_book import PdfBook, DEFAULT_RENDER_DPI
+from .Utils.content_stream import parse_text_elements
+from .Utils.element_index import TextElementIndex, TextLabelIndex
+from .Utils.parsing import scan_numeric_fields
+from .Utils.recipe_service import dump_all_recipes_to_disk, RECIPES_STORE_SUFFIX
+from .Utils.page_store import PageStore, write_page_store
+from .Utils.deployment import DeployItem, deploy_files
+from .Models.blocks import PageBlocks, TextElement
 from .Models import recipe as rcp
 from .Models import record as rec
 from .Utils import image as utim
 
-from .Utils.filesystem import ensure_folder_exist, list_all_files, list_pages_with_number, list_files_pattern
+from .Utils.filesystem import ensure_folder_exist, write_file_atomically, list_all_files, list_pages_with_number, list_files_pattern
+from .Utils.cache_manifest import CacheManifest, STAGE_TEXT, STAGE_IMAGES, STAGE_RECIPE, hash_bytes
 C_DIYDOG_URL = "https://brewdogmedia.s3.eu-west-2.amazonaws.com/docs/2019+DIY+DOG+-+V8.pdf"
 
-GRAMS_PATTERN = re.compile(r"([0-9]+\.?[0-9]*) *([k]?[g])")
-NUMERICS_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)")
-DEGREES_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)[ ]?°[CF]")
-DEGREES_C_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)[ ]?°C")
-DEGREES_F_PATTERN = re.compile(r"([0-9]+\.?[0-9]*)[ ]?°F")
-
-# This one is simpler as sometimes lb data is missing
-LBS_PATTERN = re.compile(r"([0-9]+\.[0-9]+)")
-
 THIS_DIR = Path(__file__).parent
 CACHE_DIRECTORY = THIS_DIR.joinpath(".cache")
 logger = Logger(CACHE_DIRECTORY.joinpath("logs.txt"))
 
+CACHED_PDF_PAGES_DIR = CACHE_DIRECTORY.joinpath("pages")
+CACHED_BLOCKS_DIR = CACHE_DIRECTORY.joinpath("blocks")
+CACHED_PDF_RAW_CONTENT_DIR = CACHE_DIRECTORY.joinpath("pdf_raw_contents")
+# Pages decoded content
+CACHED_CONTENT_DIR = CACHE_DIRECTORY.joinpath("contents")
+# Same contents, for all pages at once in a single binary file
+CACHED_PAGE_STORE_FILEPATH = CACHE_DIRECTORY.joinpath("contents.bin")
+CACHED_IMAGES_DIR = CACHE_DIRECTORY.joinpath("images")
+# Recipes as parsed from the pages content, before images and pdf pages are hooked to them
+CACHED_PARSED_RECIPES_DIR = CACHE_DIRECTORY.joinpath("parsed_recipes")
+MANIFEST_FILEPATH = CACHE_DIRECTORY.joinpath("manifest.json")
+DEPLOY_MANIFEST_FILEPATH = CACHE_DIRECTORY.joinpath("deploy_manifest.json")
+
+# Bump this whenever the extraction logic changes, so that artefacts produced by former versions are considered stale
+EXTRACTOR_VERSION = "2"
+
+# Packaging image location within beer pages, relative to page dimensions : left, right, top, bottom
+#                                                                           x0    x1     y0    y1
+PACKAGING_ZONE = [0.64, 0.92, 0.26, 0.69]
+
+# Page 22 is the first beer
+FIRST_BEER_PAGE = 21
+# Page 436 is the very last beer
+LAST_BEER_PAGE = 436
+
+class CacheTier(Enum) :
+    """How much of the intermediate artefacts is written to the cache directory"""
+    Minimal = "minimal"     # Only what later stages of the same run need : single page pdf files, pages text contents and extracted silhouettes
+    Standard = "standard"   # Minimal + parsed recipes, so that recipes of unchanged pages are not parsed again on the next run
+    Debug = "debug"         # Standard + everything that only helps debugging : raw content streams, raw text blocks, full page and packaging zone renders
+
+# Cache tier used by each text extraction worker process
+_worker_cache_tier : CacheTier = CacheTier.Standard
+
+# Pdf book owned by each extraction worker process (one handle per process, they can't be shared)
+_worker_pdf_book : Optional[PdfBook] = None
+
+# Image extraction context (and its rembg session) owned by each image extraction worker process, loaded once and reused for all the images it processes
+_worker_image_context : Optional[utim.ImageExtractionContext] = None
+
+
+def worker_pool(jobs : int, initializer, initargs : tuple) -> ProcessPoolExecutor :
+    """Creates a pool of extraction worker processes.
+       Workers are not forked from this process : some of our dependencies (pymatting's numba kernels, pulled by rembg) start native threads
+       upon import, and forking a process that runs such threads leaves the parent hanging on exit."""
+    start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=jobs, mp_context=multiprocessing.get_context(start_method), initializer=initializer, initargs=initargs)
+
+
+def collect_worker_results(results) -> list :
+    """Unpacks (result, log lines) pairs returned by worker processes, writing their log lines in submission order.
+       Workers capture their logs rather than writing them, so that lines of concurrent pages never interleave in the log file."""
+    outputs = []
+    for (result, lines) in results :
+        for line in lines :
+            logger.log(line)
+        outputs.append(result)
+    return outputs
+
 
 def custom_assert_equal(val1, val2) :
     if val1 != val2 :
@@ -59,67 +112,54 @@ def celsius_to_fahrenheit(value : float) -> float :
 def fahrenheit_to_celsius(value : float) -> float :
     return (value - 32)/1.8
 
-# Useful doc : https://pypdf.readthedocs.io/en/latest/user/extract-text.html
 
-
-def cache_raw_blocks(filepath : Path, blocks : list[list[str]] ) :
+def cache_raw_blocks(filepath : Path, blocks : list[bytes] ) :
+    """Writes raw text objects (BT ... ET content) to disk, as-is, separated by an empty line"""
     if not filepath.parent.exists() :
-        filepath.parent.mkdir(parents=True)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
 
     with open(filepath, "wb") as file :
         for block in blocks :
-            for line in block :
-                data = (line + "\n").encode("utf-8")
-                file.write(data)
-            file.write("\n".encode("utf-8"))
-
-
-def cache_single_pdf_page(filepath : Path, page : PageObject ) :
-    if not filepath.parent.exists() :
-        filepath.parent.mkdir(parents=True)
-
-    pdf_writer = PdfWriter()
-    pdf_writer.add_page(page)
-    with open(filepath, "wb") as file :
-        pdf_writer.write(file)
-
-def cache_pdf_contents(filepath : Path, page : PageObject) :
-    if not filepath.parent.exists() :
-        filepath.parent.mkdir(parents=True)
-
-    contents = page.get_contents()
-    if contents :
-        raw_data : bytes = contents.get_data()
-        str_contents = raw_data.decode()
-        with open(filepath, "w") as file :
-            file.writelines(str_contents)
-    else :
-        raise Exception("Content is missing from page document")
-
-
-def cache_images(directory : Path, page_file : Path, beer_number = 0) -> rcp.PackagingType:
+            # Drop the end of line that follows the BT operator
+            if block.startswith(b"\r\n") :
+                block = block[2:]
+            elif block[:1] in [b"\n", b"\r"] :
+                block = block[1:]
+            file.write(block)
+            file.write(b"\n")
+
+
+def cache_images(directory : Path,
+                 book : PdfBook,
+                 page_number : int,
+                 beer_number = 0,
+                 context : Optional[utim.ImageExtractionContext] = None,
+                 render_dpi : int = DEFAULT_RENDER_DPI,
+                 debug_images : bool = False) -> Optional[rcp.PackagingType]:
+    """Renders the packaging zone of a page and extracts the packaging silhouette out of it.
+       Only the packaging zone is rendered, unless debug_images is set : the full page is then rendered and kept as well (full.png),
+       along with the packaging zone image (cropped.png).
+       Returns the most probable packaging type, or None if the extraction failed (errors are logged)."""
     if not directory.exists() :
         directory.mkdir(parents=True)
 
-    most_probable_packaging = rcp.PackagingType.Bottle
+    most_probable_packaging : Optional[rcp.PackagingType] = None
+    if context is None :
+        context = utim.ImageExtractionContext()
 
     try :
-        document = fitz.Document(page_file) # type: ignore
-
-        full_page_rendered = get_page_pixmap(document, 0)
-        full_page_rendered.pil_save(directory.joinpath("full.png"))
-
-        # Cropping area : left, right, top, bottom
-        #                  x0    x1     y0    y1
-        cropping_zone = [0.64, 0.92, 0.26, 0.69]
-        cropped_image = utim.extract_zone_from_image(full_page_rendered, cropping_zone )
-
-        cropped_image_path = directory.joinpath("cropped.png")
-        cropped_image.save(cropped_image_path)
+        # Rendered pixels are handed over to the silhouette extraction in memory, intermediate images are only written in debug mode
+        if debug_images :
+            full_page_rendered = book.render_page(page_number, render_dpi)
+            write_file_atomically(directory.joinpath("full.png"), lambda x : full_page_rendered.pil_save(x, format="PNG"))
+            cropped_image = utim.pixmap_to_bgr(full_page_rendered, PACKAGING_ZONE)
+            utim.save_bgr_image(directory.joinpath("cropped.png"), cropped_image)
+        else :
+            cropped_image = utim.pixmap_to_bgr(book.render_zone(page_number, PACKAGING_ZONE, render_dpi))
 
         extracted_shape = directory.joinpath("extracted_silhouette.png")
-        most_probable_packaging = utim.extract_biggest_silhouette(cropped_image_path, extracted_shape, logger, fit_crop_image=True, beer_number=beer_number)
-        logger.log("Extracted image {} with potential packaging : {}".format(beer_number, most_probable_packaging))
+        most_probable_packaging = utim.extract_biggest_silhouette_from_image(cropped_image, extracted_shape, logger, fit_crop_image=True, beer_number=beer_number, context=context)
+        logger.log("Extracted image {} with potential packaging : {} in {:.3f}s".format(beer_number, most_probable_packaging, context.timings[-1][1]))
 
     # Sometimes we can't even list the images because of some weird errors earlier in the pdf parsing methods
     except Exception as e :
@@ -128,137 +168,31 @@ def cache_images(directory : Path, page_file : Path, beer_number = 0) -> rcp.Pac
     return most_probable_packaging
 
 
-def extract_raw_text_blocks_from_content(contents : str) -> list[list[str]] :
-    """Extracts text blocks (raw) from input text contents. This essentially uses the BT ET parts and splits blocks based on this"""
-    text_block_parsing = False
-    out : list[list[str]] = []
-    current : list[str] = []
-    for line in contents.split("\n") :
-        if text_block_parsing :
-            if line == "ET" :
-                # Finishing parsing this block
-                text_block_parsing = False
-                out.append(current)
-                current = []
-            else :
-                current.append(line)
-
-        # Look for starting patterns
-        else :
-            if line == "BT" :
-                text_block_parsing = True
-
-    return out
-
-def text_blocks_from_raw_blocks(raw_blocks : list[list[str]]) -> list[TextElement] :
-    out : list[TextElement] = []
-    for blocks in raw_blocks :
-        current_coords = Coordinates()
-        new_element : Optional[TextElement] = None
-        for line in blocks :
-            if line.find("TJ") != -1 or line.find("Tj") != -1 :
-                if not new_element :
-                    new_element = TextElement()
-                    new_element.x = current_coords.x
-                    new_element.y = current_coords.y
-
-                parsed_line = parse_line(line)
-                # This is required as sometimes PDF can chain multiple "Tj" instructions with different formatting (like color)
-                # Without resetting the transformation matrix, so they need to be read as a single line instead
-                new_element.text += parsed_line
-                continue
-
-            elif line.find("Tm") != -1:
-                tokens = line.split()
-                tm_index = tokens.index("Tm")
-                current_coords.x = float(tokens[tm_index - 2])
-                current_coords.y = float(tokens[tm_index - 1])
-
-                # New transformation matrix means a new PDF write somewhere else in the page, so we can bump the element if any
-                if new_element :
-                    out.append(new_element)
-                    new_element = None
-
-            elif line.find("Td") != -1 or line.find("TD") != -1:
-                tokens = line.split()
-                td_index = tokens.index("Td")
-                if td_index == -1 :
-                    td_index = tokens.index("TD")
-
-                current_coords.x += float(tokens[td_index - 2])
-                current_coords.y += float(tokens[td_index - 1])
-
-                # Td/TD mean a new line, with an updated transformation matrix, so we can bump the element if any
-                if new_element :
-                    out.append(new_element)
-                    new_element = None
-
-        # Consume new element at the end of the parsing if needed
-        if new_element :
-            out.append(new_element)
-            new_element = None
-
-    return out
-
-
 def cache_contents(filepath : Path, page : PageBlocks) :
     if not filepath.parent.exists() :
-        filepath.parent.mkdir(parents=True)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
 
     with open(filepath, "w") as file :
         content = page.to_json()
         json.dump(content, file, indent=4)
 
-def cache_pdf_raw_contents(filepath : Path, content : str) :
+def cache_pdf_raw_contents(filepath : Path, content : bytes) :
     if not filepath.parent.exists() :
-        filepath.parent.mkdir(parents=True)
+        filepath.parent.mkdir(parents=True, exist_ok=True)
 
-    with open(filepath, "w") as file :
+    # Raw bytes are written untouched (content streams are iso-8859-1 encoded, not utf-8)
+    with open(filepath, "wb") as file :
         file.write(content)
 
-def find_closest_x_element(elements : list[TextElement], reference : TextElement) -> TextElement :
-    min_distance = 1000
-    closest : TextElement = elements[0]
-    for element in elements :
-        distance = abs(reference.x - element.x)
-        if distance < min_distance :
-            closest = element
-            min_distance = distance
-
-    return closest
-
-def find_closest_y_element(elements : list[TextElement], reference : TextElement) -> TextElement :
-    min_distance = 1000
-    closest : TextElement = elements[0]
-    for element in elements :
-        distance = abs(reference.y - element.y)
-        if distance < min_distance :
-            closest = element
-            min_distance = distance
-
-    return closest
-
-def find_closest_element(elements : list[TextElement], reference : TextElement) -> TextElement :
-    min_distance = 1000
-    closest : TextElement = elements[0]
-    for element in elements :
-        distance = math.sqrt(math.pow(reference.x - element.x, 2) + math.pow(reference.y - element.y, 2))
-
-        # Case where we stumble upon our reference, that's not the one we're aiming for !
-        if distance == 0 and element == reference:
-            continue
-
-        if distance < min_distance :
-            closest = element
-            min_distance = distance
-
-    return closest
-
-def extract_header(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
+def extract_header(elements : list[TextElement], recipe : rcp.Recipe, index : Optional[TextElementIndex] = None) -> rcp.Recipe :
     # Sort list based on y indices, top to bottom
     consumed_elements : list[TextElement] = []
     elements.sort(key=lambda x : x.y, reverse=True )
 
+    # The page's header index is usually handed over by extract_recipe(), built over the same (sorted) elements
+    if index is None :
+        index = TextElementIndex(elements)
+
     number_element =  elements[0]
 
     # Sometimes the beer number element is not the first one (for some reason...)
@@ -269,7 +203,7 @@ def extract_header(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Rec
             number_element = elem
 
     # The beer's name is always the closest item to the beer's number, in the formatting
-    name_elem = find_closest_element(elements, number_element)
+    name_elem = index.closest(number_element)
 
     if recipe.number.value == 15:
         pass
@@ -323,11 +257,9 @@ def extract_header(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Rec
             consumed_elements.append(element)
             continue
 
-    below_abv_elems : list[TextElement] = []
-    for element in elements :
-        if abv_elem and element.y < abv_elem.y :
-            below_abv_elems.append(element)
-
+    # Data elements are looked for below the ABV element only
+    # (without ABV element, no element qualifies)
+    below_abv = abv_elem.y if abv_elem else -math.inf
 
     # Handle data elements one by one
     abv_data_elem : Optional[TextElement] = None
@@ -336,32 +268,32 @@ def extract_header(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Rec
 
     # Extract abv, ibu and og which are closest to column
     if abv_elem :
-        abv_data_elem = find_closest_x_element(below_abv_elems, abv_elem)
+        abv_data_elem = index.closest_x(abv_elem, below=below_abv)
         consumed_elements.append(abv_data_elem)
 
     # Sometimes, IBU does not exist for some beers (such as the beer #33 Tactical Nuclear Penguin)
     if ibu_elem :
-        ibu_data_elem = find_closest_x_element(below_abv_elems, ibu_elem)
+        ibu_data_elem = index.closest_x(ibu_elem, below=below_abv)
         consumed_elements.append(ibu_data_elem)
 
     # Same remark, sometimes OG is not there neither
     if og_elem :
-        og_data_elem = find_closest_x_element(below_abv_elems, og_elem)
+        og_data_elem = index.closest_x(og_elem, below=below_abv)
         consumed_elements.append(og_data_elem)
 
 
     # Then extract data from them adequately
     if abv_data_elem :
         # Fill in the recipe with the header's content
-        match = NUMERICS_PATTERN.match(abv_data_elem.text)
-        if match :
-            recipe.basics.value.abv = float(match.groups()[0])
+        abv = scan_numeric_fields(abv_data_elem.text).leading
+        if abv is not None :
+            recipe.basics.value.abv = abv
 
     # Same, skip if nothing was parsed
     if ibu_data_elem :
-        match = NUMERICS_PATTERN.match(ibu_data_elem.text)
-        if match :
-            recipe.basics.value.ibu = float(match.groups()[0])
+        ibu = scan_numeric_fields(ibu_data_elem.text).leading
+        if ibu is not None :
+            recipe.basics.value.ibu = ibu
 
     # Same, skip if nothing was parsed
     if og_data_elem :
@@ -423,26 +355,6 @@ def find_element(elements : list[TextElement], text : str) -> Optional[TextEleme
             return element
     return None
 
-def find_element_substring(elements : list[TextElement], text : str) -> Optional[TextElement] :
-    """Returns the first element in the given collection whose text contains the probing text. Exact match is not required"""
-    for element in elements :
-        if text in element.text :
-            return element
-    return None
-
-# Variant of the above one, but we enforce the object state
-# used essentially to cover the use case where data *needs* to be there
-def find_element_strict(elements : list[TextElement], text : str) -> TextElement :
-    elem = find_element(elements, text)
-    assert(elem)
-    return elem
-
-def get_elem_index(elements : list[TextElement], text : str) -> int :
-    for i in range(0, len(elements)) :
-        if elements[i].text == text :
-            return i
-    return -1
-
 def filter_categories_and_content(reference_list : list[TextElement], elements : list[TextElement] ) -> list[list[TextElement]] :
     categorized_lists : list[list[TextElement]] = []
     current_category : list[TextElement] = []
@@ -539,12 +451,13 @@ def line_from_text_elements(elements: list[TextElement]) -> str :
     out.strip()
     return out
 
-def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
+def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe, labels : TextLabelIndex) -> rcp.Recipe :
     elements.sort(key=lambda x : x.y, reverse=True)
+    basics_elem = labels.find("BASICS", within=elements)
     rows = split_blocks_based_on_y_distance(elements)
     for row in rows :
         # Skipping this element, we don't need it now
-        if find_element(row, "BASICS") :
+        if basics_elem and basics_elem in row :
             continue
 
         raw_columns = group_in_distinct_columns(row)
@@ -563,14 +476,14 @@ def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe) ->
                 volume = rcp.Volume()
 
                 # Extract litres
-                match = NUMERICS_PATTERN.match(flattened_rows[1].text)
-                if match :
-                    volume.litres = float(match.groups()[0])
+                litres = scan_numeric_fields(flattened_rows[1].text).leading
+                if litres is not None :
+                    volume.litres = litres
 
                 # Extract galons
-                match = NUMERICS_PATTERN.match(flattened_rows[2].text)
-                if match :
-                    volume.galons = float(match.groups()[0])
+                galons = scan_numeric_fields(flattened_rows[2].text).leading
+                if galons is not None :
+                    volume.galons = galons
 
                 # Dispatch the volume accordingly
                 if flattened_rows[0].text == "VOLUME" :
@@ -582,9 +495,9 @@ def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe) ->
                 if recipe.basics.value.abv != 0.0 :
                     continue
                 # Parsing ABV in case it was not extracted from header yet ; There should only be 2 columns here
-                match = NUMERICS_PATTERN.match(flattened_rows[1].text)
-                if match :
-                    recipe.basics.value.abv = float(match.groups()[0])
+                abv = scan_numeric_fields(flattened_rows[1].text).leading
+                if abv is not None :
+                    recipe.basics.value.abv = abv
 
             case "TARGET OG" :
                 if recipe.basics.value.target_og != 0.0 :
@@ -599,11 +512,13 @@ def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe) ->
 
             case "TARGET FG" :
                 try :
-                    matches = NUMERICS_PATTERN.findall(flattened_rows[1].text)
+                    target_fg = scan_numeric_fields(flattened_rows[1].text).first
                     # We're only taking the first one, by convention
                     # Some beers have a range (such as the beer #192) which we can't reproduce with a single
                     # value without adding extra complexity to the data model, so taking the first value will do the job instead
-                    recipe.basics.value.target_fg = float(matches[0])
+                    if target_fg is None :
+                        raise ValueError("no numeric value")
+                    recipe.basics.value.target_fg = target_fg
                 except Exception as e :
                     logger.log("/!\\ Caught weird stuff in Target FG for beer {}. Text was : {}".format(recipe.number.value, flattened_rows[1]))
 
@@ -617,7 +532,10 @@ def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe) ->
                     fval = -1.0
                 else :
                     try :
-                        fval = float(NUMERICS_PATTERN.findall(flattened_rows[1].text)[0])
+                        first = scan_numeric_fields(flattened_rows[1].text).first
+                        if first is None :
+                            raise ValueError("no numeric value in '{}'".format(value))
+                        fval = first
                     except Exception as e:
                         logger.log("/!\\ Could not convert value for {} because {}.".format(flattened_rows[0].text, e))
                         continue
@@ -637,26 +555,26 @@ def parse_basics_category(elements : list[TextElement], recipe : rcp.Recipe) ->
                     recipe.basics.value.ph = 4.4
 
             case "ATTENUATION LEVEL" :
-                match = NUMERICS_PATTERN.match(flattened_rows[1].text)
-                if match :
-                    recipe.basics.value.attenuation_level = float(match.groups()[0])
+                attenuation_level = scan_numeric_fields(flattened_rows[1].text).leading
+                if attenuation_level is not None :
+                    recipe.basics.value.attenuation_level = attenuation_level
 
             case _ :
                 logger.log("/!\\ Unhandled element in beer number {}. Element was : {}".format(recipe.number.value, flattened_rows[0].text))
 
     return recipe
 
-def parse_method_timings_category(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
+def parse_method_timings_category(elements : list[TextElement], recipe : rcp.Recipe, labels : TextLabelIndex) -> rcp.Recipe :
 
     elements.sort(key=lambda x : x.y, reverse=True)
-    mash_temp_elem = find_element_strict(elements, "MASH TEMP")
+    mash_temp_elem = labels.find_strict("MASH TEMP", within=elements)
     # Some bers are missing the "Fermentation" element as well, such as the #406 one
-    fermentation_elem = find_element(elements, "FERMENTATION")
+    fermentation_elem = labels.find("FERMENTATION", within=elements)
 
-    # Not all beers have the "Twist" element
-    twist_elem = find_element_substring(elements, "TWIST")
+    # Not all beers have the "Twist" element (only partially matched, such as "BREWHOUSE TWIST")
+    twist_elem = labels.find_containing("TWIST", within=elements)
     # Pops here and there for beer #265 for instance, goes along with the Twist/Brewhouse one
-    additions_elem : Optional[TextElement] = find_element(elements, "ADDITIONS")
+    additions_elem : Optional[TextElement] = labels.find("ADDITIONS", within=elements)
 
     mash_temp_data_list : list[TextElement] = []
     fermentation_data_list : list[TextElement] = []
@@ -703,24 +621,26 @@ def parse_method_timings_category(elements : list[TextElement], recipe : rcp.Rec
             method_timings.mash_tips.append(flattened_row[0].text)
         else :
             mash_temp = rcp.MashTemp()
+            # Temperatures and timing are read in a single pass over each column of the row
+            fields = [scan_numeric_fields(x.text) for x in flattened_row[:3]]
             if len(flattened_row) == 2 :
-                matches = DEGREES_PATTERN.findall(flattened_row[0].text)
-                if len(matches) != 0 :
-                    mash_temp.celsius = float(matches[0])
+                celsius = fields[0].degrees
+                if celsius is not None :
+                    mash_temp.celsius = celsius
                     mash_temp.fahrenheit = celsius_to_fahrenheit(mash_temp.celsius)
                 else :
                     logger.log("/!\\ Could not read temperature from mash instructions for beer {}. Line was {}".format(recipe.number.value, line_from_text_elements(flattened_row)))
 
-                matches = NUMERICS_PATTERN.findall(flattened_row[1].text)
-                if len(matches) != 0 :
-                    mash_temp.time = float(matches[0])
+                time = fields[1].first
+                if time is not None :
+                    mash_temp.time = time
                 else :
                     logger.log("/!\\ Could not read timing from mash instructions for beer {}. Line was {}".format(recipe.number.value, line_from_text_elements(flattened_row)))
             else :
                 # Extract Celsius degrees from mash temp
-                matches = DEGREES_PATTERN.findall(flattened_row[0].text)
-                if len(matches) != 0 :
-                    mash_temp.celsius = float(matches[0])
+                celsius = fields[0].degrees
+                if celsius is not None :
+                    mash_temp.celsius = celsius
                 else :
                     logger.log("/!\\ Caught weird looking patterns for Celsius degrees for beer {} when parsing mash temps data : {}".format(recipe.number.value, flattened_row[0].text))
                     error_on_celsius = True
@@ -729,18 +649,18 @@ def parse_method_timings_category(elements : list[TextElement], recipe : rcp.Rec
 
 
                 # Repeat for Fahrenheit degrees from mash temp
-                matches = DEGREES_PATTERN.findall(flattened_row[1].text)
-                if len(matches) != 0 :
-                    mash_temp.fahrenheit = float(matches[0])
+                fahrenheit = fields[1].degrees
+                if fahrenheit is not None :
+                    mash_temp.fahrenheit = fahrenheit
                 else :
                     logger.log("/!\\ Caught weird looking patterns for Fahrenheit degrees for beer {} when parsing mash temps data : {}".format(recipe.number.value, flattened_row[1].text))
                     error_on_farenheit = True
 
                 # Not all beers have timing data for mash temperatures
                 if len(flattened_row) == 3 :
-                    matches = NUMERICS_PATTERN.findall(flattened_row[2].text)
-                    if len(matches) != 0 :
-                        mash_temp.time = float(matches[0])
+                    time = fields[2].first
+                    if time is not None :
+                        mash_temp.time = time
                     else :
                         logger.log("/!\\ Caught weird looking patterns for timing for beer {} when parsing mash temps data : {}".format(recipe.number.value, flattened_row[2].text))
 
@@ -768,15 +688,14 @@ def parse_method_timings_category(elements : list[TextElement], recipe : rcp.Rec
                 # Handle fermentation steps as well
                 # Note that the protections below are there to protect against the infamous secret beer #89 which does not come with ingredients nor
                 # Mashing/Fermentation data
-                matches = DEGREES_PATTERN.findall(fermentation_data_list[0].text)
-                if len(matches) != 0 :
-                    method_timings.fermentation.celsius = float(matches[0])
+                degrees = scan_numeric_fields(fermentation_data_list[0].text).degrees
+                if degrees is not None :
+                    method_timings.fermentation.celsius = degrees
                 else :
                     logger.log("/!\\ Caught weird looking patterns for fermentation temperature for beer {} when parsing mash temps data : {}".format(recipe.number.value, fermentation_data_list[0].text))
 
-                matches = DEGREES_PATTERN.findall(fermentation_data_list[0].text)
-                if len(matches) != 0 :
-                    method_timings.fermentation.fahrenheit = float(matches[0])
+                if degrees is not None :
+                    method_timings.fermentation.fahrenheit = degrees
                 else :
                     logger.log("/!\\ Caught weird looking patterns for fermentation temperature for beer {} when parsing mash temps data : {}".format(recipe.number.value, fermentation_data_list[0].text))
             else :
@@ -796,9 +715,9 @@ def parse_method_timings_category(elements : list[TextElement], recipe : rcp.Rec
 
             # Some twists are decoupled with the amount (g) and Time columns
             if len(flattened_row) == 3 :
-                matches = NUMERICS_PATTERN.findall(flattened_row[1].text)
-                if len(matches) != 0 :
-                    twist.amount = float(matches[0])
+                amount = scan_numeric_fields(flattened_row[1].text).first
+                if amount is not None :
+                    twist.amount = amount
                 else :
                     twist.amount = -1.0
                     logger.log("/!\\ Missing data for twist amount in beer {}. Parsed block was : {}".format(recipe.number.value, line_from_text_elements(flattened_row)))
@@ -865,10 +784,10 @@ class HopParsingErrors(Enum):
     ERROR_OK = "No error"
 
 
-def parse_ingredients_category(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
-    malt_elem = find_element(elements, "MALT")
-    hops_elem = find_element(elements, "HOPS")
-    yeast_elem = find_element(elements, "YEAST")
+def parse_ingredients_category(elements : list[TextElement], recipe : rcp.Recipe, labels : TextLabelIndex) -> rcp.Recipe :
+    malt_elem = labels.find("MALT", within=elements)
+    hops_elem = labels.find("HOPS", within=elements)
+    yeast_elem = labels.find("YEAST", within=elements)
 
     # Beer without ingredients, the beer #89 is one of them
     if not malt_elem and not hops_elem and not yeast_elem :
@@ -922,12 +841,12 @@ def parse_ingredients_category(elements : list[TextElement], recipe : rcp.Recipe
         # Sometimes, unit is missing (such as in the beer #185, missing "lb", sometimes it is misspelled (6.6gal1lb -> Typo))
         # And sometimes the "k" of "kg" disappeared, giving incorrect malt amounts such as
         # in the beer #4 whose Carafa special says "0.18 grams". Who will ever put 0.18 grams of malt in a recipe ??
-        match = NUMERICS_PATTERN.match(dataset[1].text)
-        if match :
-            new_malt.kgs = float(match.groups()[0])
-        match = NUMERICS_PATTERN.match(dataset[2].text)
-        if match :
-            new_malt.lbs = float(match.groups()[0])
+        kgs = scan_numeric_fields(dataset[1].text).leading
+        if kgs is not None :
+            new_malt.kgs = kgs
+        lbs = scan_numeric_fields(dataset[2].text).leading
+        if lbs is not None :
+            new_malt.lbs = lbs
         recipe.ingredients.value.malts.append(new_malt)
 
 
@@ -963,9 +882,9 @@ def parse_ingredients_category(elements : list[TextElement], recipe : rcp.Recipe
 
         when = dataset[columns_count - 1].text
         # We need the regex pattern because on some beers, the "g" is there as well !
-        match = NUMERICS_PATTERN.match(dataset[columns_count - 2].text)
-        if match :
-            amount = float(match.groups()[0])
+        leading = scan_numeric_fields(dataset[columns_count - 2].text).leading
+        if leading is not None :
+            amount = leading
         else:
             logger.log("/!\\ Could not extract amount from beer {}. Original text was : {}".format(recipe.number.value, dataset[columns_count - 2].text))
             hops_parsing_error = HopParsingErrors.ERROR_INCORRECT_AMOUNT
@@ -984,13 +903,14 @@ def parse_ingredients_category(elements : list[TextElement], recipe : rcp.Recipe
 
     return recipe
 
-def parse_food_pairing_category(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
+def parse_food_pairing_category(elements : list[TextElement], recipe : rcp.Recipe, labels : TextLabelIndex) -> rcp.Recipe :
     elements.sort(key=lambda x : x.y, reverse=True)
+    food_pairing_elem = labels.find("FOOD PAIRING", within=elements)
     rows = split_blocks_based_on_y_distance(elements)
     food_pairing = []
     for row in rows :
         # Skipping this element, we don't need it now
-        if find_element(row, "FOOD PAIRING") :
+        if food_pairing_elem and food_pairing_elem in row :
             continue
 
         raw_columns = group_in_distinct_columns(row)
@@ -1012,26 +932,29 @@ def parse_brewers_tip_category(elements : list[TextElement], recipe : rcp.Recipe
     recipe.brewers_tip.value = description.strip()
     return recipe
 
-def parse_packaging_category(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
+def parse_packaging_category(elements : list[TextElement], recipe : rcp.Recipe, labels : TextLabelIndex) -> rcp.Recipe :
     # packaging is parsed using aspect ratio when extracting the images
     packaging = rcp.PackagingType.Bottle
-    if find_element(elements, "KEG ONLY") :
+    if labels.find("KEG ONLY", within=elements) :
         packaging = rcp.PackagingType.Keg
 
     recipe.packaging.value = packaging
     return recipe
 
-def extract_body(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recipe :
+def extract_body(elements : list[TextElement], recipe : rcp.Recipe, labels : Optional[TextLabelIndex] = None) -> rcp.Recipe :
 
-    this_beer_is_elem   : TextElement = find_element_strict(elements, "THIS BEER IS")
-    basics_elem         : TextElement = find_element_strict(elements, "BASICS")
-    ingredients_elem    : TextElement = find_element_strict(elements, "INGREDIENTS")
-    method_timings_elem : TextElement = find_element_strict(elements, "METHOD / TIMINGS")
-    brewers_tip_elem    : TextElement = find_element_strict(elements, "BREWER\x92S TIP")
-    packaging_elem      : TextElement = find_element_strict(elements, "PACKAGING")
+    # All labels are looked up in the same page index, usually handed over by extract_recipe()
+    if labels is None :
+        labels = TextLabelIndex(elements)
+    this_beer_is_elem   : TextElement = labels.find_strict("THIS BEER IS")
+    basics_elem         : TextElement = labels.find_strict("BASICS")
+    ingredients_elem    : TextElement = labels.find_strict("INGREDIENTS")
+    method_timings_elem : TextElement = labels.find_strict("METHOD / TIMINGS")
+    brewers_tip_elem    : TextElement = labels.find_strict("BREWER\x92S TIP")
+    packaging_elem      : TextElement = labels.find_strict("PACKAGING")
 
     # Food pairing is not always there for all recipes
-    food_pairing_elem   : Optional[TextElement] = find_element(elements, "FOOD PAIRING")
+    food_pairing_elem   : Optional[TextElement] = labels.find("FOOD PAIRING")
 
 
     # List of known good references/categories
@@ -1057,7 +980,7 @@ def extract_body(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recip
 
     # Find the misplaced "MALT" text element, which is written in a weird coordinate system
     # And put that one right below the ingredients category
-    malt_elem = find_element(elements, "MALT")
+    malt_elem = labels.find("MALT")
     if malt_elem :
         malt_elem.x = ingredients_elem.x + 5
         malt_elem.y = ingredients_elem.y - 10
@@ -1082,13 +1005,13 @@ def extract_body(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recip
     # Sometimes, the Method / timings element is not placed correctly (pdf placing artifacts...?)
     # Custom code for beer # 307 ... such a shame to do that kind of stuff ...
     if recipe.number.value == 307 :
-        found = find_element(column_1_elements, "METHOD / TIMINGS")
+        found = next((x for x in labels.find_all("METHOD / TIMINGS") if x.x >= column_1_x_start and x.x < column_2_x_start), None)
         if found :
             logger.log("Found Method/Timings element in wrong column, moving it to column 0")
             column_1_elements.remove(found)
 
             # Duplicate parts of the previous element
-            mash_temp_elem = find_element(column_0_elements, "MASH TEMP")
+            mash_temp_elem = next((x for x in labels.find_all("MASH TEMP") if x.x < column_1_x_start), None)
             if mash_temp_elem :
                 found.x = mash_temp_elem.x - 10
                 found.y = mash_temp_elem.y + 10
@@ -1107,6 +1030,9 @@ def extract_body(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recip
     column_1_categories = filter_categories_and_content(references_list, column_1_elements)
     column_2_categories = filter_categories_and_content(references_list, column_2_elements)
 
+    # Category parsers restrict their lookups to their own category
+    labels.group(column_0_categories + column_1_categories + column_2_categories)
+
     # Perform all data parsing
     for column_data in [column_0_categories, column_1_categories, column_2_categories] :
         for category in column_data :
@@ -1115,22 +1041,22 @@ def extract_body(elements : list[TextElement], recipe : rcp.Recipe) -> rcp.Recip
                     recipe = parse_this_beer_is_category(category, recipe)
 
                 case "BASICS" :
-                    recipe = parse_basics_category(category, recipe)
+                    recipe = parse_basics_category(category, recipe, labels)
 
                 case "METHOD / TIMINGS" :
-                    recipe = parse_method_timings_category(category, recipe)
+                    recipe = parse_method_timings_category(category, recipe, labels)
 
                 case "FOOD PAIRING" :
-                    recipe = parse_food_pairing_category(category, recipe)
+                    recipe = parse_food_pairing_category(category, recipe, labels)
 
                 case "INGREDIENTS" :
-                    recipe = parse_ingredients_category(category, recipe)
+                    recipe = parse_ingredients_category(category, recipe, labels)
 
                 case "BREWER\x92S TIP" :
                     recipe = parse_brewers_tip_category(category, recipe)
 
                 case "PACKAGING" :
-                    recipe = parse_packaging_category(category, recipe)
+                    recipe = parse_packaging_category(category, recipe, labels)
 
                 case _ :
                     raise Exception("Caught unexpected category name : {}".format(category[0].text))
@@ -1157,10 +1083,15 @@ def extract_recipe(page : PageBlocks) -> rcp.Recipe :
         else :
             body_elements.append(element)
 
+    # Lookups all go through indices built once for the page : closest elements in the header, labels in the body
+    header_elements.sort(key=lambda x : x.y, reverse=True)
+    header_index = TextElementIndex(header_elements)
+    body_labels = TextLabelIndex(body_elements)
+
     out = rcp.Recipe()
-    out = extract_header(header_elements, out)
+    out = extract_header(header_elements, out, header_index)
     out = extract_footer(footer_elements, out)
-    out = extract_body(body_elements, out)
+    out = extract_body(body_elements, out, body_labels)
     return out
 
 def hook_pdf_and_extracted_image_to_recipe(recipe : rcp.Recipe):
@@ -1176,40 +1107,459 @@ def hook_pdf_and_extracted_image_to_recipe(recipe : rcp.Recipe):
     recipe.pdf_page.value = rec.FileRecord(relative_pdf_page_filepath)
 
 
-def copy_files_to(filelist : list[Path], dest_dir : Path) :
-    for file in filelist :
-        shutil.copy(file, dest_dir)
+def recipes_deploy_items(recipes_dir : Path) -> list[DeployItem] :
+    """Recipes are modified in place by the patching and sanitizing tools once deployed, so they are only reflinked or copied
+       (unchanged copies are kept from the former deployment). Compact recipes stores are cache files, they are not deployed"""
+    return [DeployItem(x, "recipes/" + x.name, linkable=False) for x in list_all_files(recipes_dir) if x.suffix != RECIPES_STORE_SUFFIX]
+
+def media_deploy_items(cached_images_dir : Path, cached_pdf_pages_dir : Path) -> list[DeployItem] :
+    """Pdf pages and extracted images, hardlinked to the cached ones where possible.
+       Cache writers replace these files rather than rewriting them in place (see write_file_atomically()), so deployed links keep their content"""
+    items : list[DeployItem] = []
+    for pdf_page in list_files_pattern(cached_pdf_pages_dir, "page", ".pdf") :
+        items.append(DeployItem(pdf_page, "pdf_pages/" + pdf_page.name))
+
+    # A bit of renaming for the images
+    for image in list_files_pattern(cached_images_dir, "extracted_silhouette") :
+        number = int(image.parent.name.lstrip("page_"))
+        items.append(DeployItem(image, "images/beer_{}.png".format(number)))
+    return items
 
 def deploy_to_directory(cached_recipes_dir : Path,
                         cached_images_dir : Path,
                         cached_pdf_pages_dir : Path,
-                        dep_recipes_dir : Path,
-                        dep_pdf_pages_dir : Path,
-                        dep_images_dir : Path) :
-    recipe_filelist = list_all_files(cached_recipes_dir)
-    extracted_images_list = list_files_pattern(cached_images_dir, "extracted_silhouette")
-    pdf_pages_list = list_files_pattern(cached_pdf_pages_dir, "page", ".pdf")
+                        deploy_dir : Path) -> dict[str, int] :
+    """Deploys recipes, pdf pages and extracted images to the deploy directory, which is swapped with the new tree at once.
+       @return
+            number of deployed files per placement method
+    """
+    items = recipes_deploy_items(cached_recipes_dir) + media_deploy_items(cached_images_dir, cached_pdf_pages_dir)
+    return deploy_files(items, deploy_dir, DEPLOY_MANIFEST_FILEPATH)
+
+
+def extract_page(book : PdfBook, page_number : int, cache_tier : CacheTier = CacheTier.Standard) -> Optional[PageBlocks] :
+    """Extracts a single beer page from the pdf book, caches its intermediate artefacts to disk and returns its text content.
+       @param :
+            book        : DiyDog pdf book
+            page_number : page index within the pdf book
+            cache_tier  : raw content stream and raw text blocks are only written in debug tier
+       @return
+            the page text elements, or None if page content could not be decoded
+    """
+    beer_index = page_number - FIRST_BEER_PAGE + 1
+    logger.log("Extracting page : {}, beer index : {}".format(page_number, beer_index))
+    encoded_name = "page_{}".format(beer_index)
+
+    logger.log("Caching page to disk ...")
+    book.save_single_page(page_number, CACHED_PDF_PAGES_DIR.joinpath(encoded_name + ".pdf"))
+    content_filepath = CACHED_CONTENT_DIR.joinpath(encoded_name + ".json")
+
+    # Fetch raw contents and manually parse it (works better than brute text extraction)
+    logger.log("Extracting textual content of page ...")
+    data = book.page_contents(page_number)
+    if len(data) == 0 :
+        raise Exception("Cannot read page !")
+
+    if cache_tier == CacheTier.Debug :
+        cache_pdf_raw_contents(CACHED_PDF_RAW_CONTENT_DIR.joinpath(encoded_name + ".txt"), data)
+
+    # Content stream is tokenized in a single pass, straight from the raw bytes.
+    # Only literal strings are decoded (iso-8859-1), the rest of the stream never goes through a str conversion
+    logger.log("Parsing content stream into pre-processed text blocks")
+    raw_blocks : list[bytes] = []
+    try :
+        text_blocks = parse_text_elements(data, raw_blocks)
+    except Exception as ex :
+        logger.log("/!\\ Caught exception while parsing")
+        logger.log("   Exception was : {}".format(ex))
+        return None
+
+    if cache_tier == CacheTier.Debug :
+        logger.log("Caching raw text blocks ...")
+        cache_raw_blocks(CACHED_BLOCKS_DIR.joinpath(encoded_name + ".txt"), raw_blocks)
+
+    # Post processing of text blocks :
+    logger.log("Post processing text blocks ...")
+    temp_blocks = []
+    for block in text_blocks :
+        # Strip whitespaces and removes empty items
+        block.text = block.text.strip()
+        if block.text != "" :
+            temp_blocks.append(block)
+
+    text_blocks = temp_blocks
+
+    logger.log("Caching preprocessed contents ...")
+    # Adding page blocks now, so that we
+    # don't have to parse them again
+    page_blocks = PageBlocks()
+    page_blocks.elements = text_blocks
+    page_blocks.index = beer_index
+    cache_contents(content_filepath, page_blocks)
+    return page_blocks
+
+def _init_page_extraction_worker(pdf_file : Path, cache_tier : CacheTier, cache_dirs : tuple[Path, Path, Path, Path]) :
+    global _worker_pdf_book
+    global _worker_cache_tier
+    global CACHED_PDF_PAGES_DIR, CACHED_CONTENT_DIR, CACHED_PDF_RAW_CONTENT_DIR, CACHED_BLOCKS_DIR
+    logger.capture()
+    _worker_pdf_book = PdfBook(pdf_file)
+    _worker_cache_tier = cache_tier
+    # Workers import this module anew, point them at the cache folders of their parent
+    (CACHED_PDF_PAGES_DIR, CACHED_CONTENT_DIR, CACHED_PDF_RAW_CONTENT_DIR, CACHED_BLOCKS_DIR) = cache_dirs
+
+def _extract_page_worker(page_number : int) -> tuple[Optional[PageBlocks], list[str]] :
+    assert(_worker_pdf_book)
+    page = extract_page(_worker_pdf_book, page_number, _worker_cache_tier)
+    return (page, logger.take_captured())
+
+def extract_all_pages(pdf_file : Path, jobs : int = 1, page_numbers : Optional[list[int]] = None, cache_tier : CacheTier = CacheTier.Standard) -> list[PageBlocks] :
+    """Extracts beer pages from the pdf book (all of them, unless a list of page numbers is given).
+       When jobs > 1, the page range is sharded across a pool of worker processes, each one opening its own pdf book handle.
+       Results are always returned in page order, so that the output does not depend on the number of jobs."""
+    if page_numbers is None :
+        page_numbers = list(range(FIRST_BEER_PAGE, LAST_BEER_PAGE))
+    results : list[Optional[PageBlocks]] = []
+    if jobs > 1 :
+        # A few shards per worker, so that slow pages don't keep the other workers idle at the end of the run
+        chunksize = max(1, math.ceil(len(page_numbers) / (jobs * 4)))
+        cache_dirs = (CACHED_PDF_PAGES_DIR, CACHED_CONTENT_DIR, CACHED_PDF_RAW_CONTENT_DIR, CACHED_BLOCKS_DIR)
+        with worker_pool(jobs, _init_page_extraction_worker, (pdf_file, cache_tier, cache_dirs)) as executor :
+            # executor.map yields results in submission order, whatever the completion order is
+            results = collect_worker_results(executor.map(_extract_page_worker, page_numbers, chunksize=chunksize))
+    else :
+        with PdfBook(pdf_file) as book :
+            for page_number in page_numbers :
+                results.append(extract_page(book, page_number, cache_tier))
 
-    copy_files_to(recipe_filelist, dep_recipes_dir)
-    copy_files_to(pdf_pages_list, dep_pdf_pages_dir)
+    return [x for x in results if x is not None]
 
-    # A bit of renaming for the images
-    for image in extracted_images_list :
-        number = int(image.parent.name.lstrip("page_"))
-        image_name = f"beer_{number}.png"
-        shutil.copyfile(image, dep_images_dir.joinpath(image_name))
 
+def page_number_to_beer_index(page_number : int) -> int :
+    return page_number - FIRST_BEER_PAGE + 1
 
-def main(args) :
+def beer_index_to_page_number(beer_index : int) -> int :
+    return beer_index + FIRST_BEER_PAGE - 1
+
+def text_stage_artefacts(beer_index : int, cache_tier : CacheTier = CacheTier.Debug) -> list[Path] :
+    """Artefacts written by the text stage for a page, in the given cache tier (defaults to all of them)"""
+    encoded_name = "page_{}".format(beer_index)
+    artefacts = [
+        CACHED_PDF_PAGES_DIR.joinpath(encoded_name + ".pdf"),
+        CACHED_CONTENT_DIR.joinpath(encoded_name + ".json")
+    ]
+    if cache_tier == CacheTier.Debug :
+        artefacts.append(CACHED_PDF_RAW_CONTENT_DIR.joinpath(encoded_name + ".txt"))
+        artefacts.append(CACHED_BLOCKS_DIR.joinpath(encoded_name + ".txt"))
+    return artefacts
+
+def images_stage_artefacts(beer_index : int) -> list[Path] :
+    page_images_dir = CACHED_IMAGES_DIR.joinpath("page_{}".format(beer_index))
+    return [
+        page_images_dir.joinpath("full.png"),
+        page_images_dir.joinpath("cropped.png"),
+        page_images_dir.joinpath("extracted_silhouette.png")
+    ]
+
+def parsed_recipe_filepath(beer_index : int) -> Path :
+    return CACHED_PARSED_RECIPES_DIR.joinpath("recipe_{}.json".format(beer_index))
+
+def hash_source_pages(pdf_file : Path) -> dict[int, str] :
+    """Hashes the content of every beer page, as read from the source pdf book. Keys are beer indices."""
+    source_hashes : dict[int, str] = {}
+    with PdfBook(pdf_file) as book :
+        for page_number in range(FIRST_BEER_PAGE, LAST_BEER_PAGE) :
+            source_hashes[page_number_to_beer_index(page_number)] = hash_bytes(book.page_contents(page_number))
+    return source_hashes
+
+def update_text_stage(manifest : CacheManifest, pdf_file : Path, source_hashes : dict[int, str], jobs : int, cache_tier : CacheTier = CacheTier.Standard) -> dict[int, PageBlocks] :
+    """Extracts the pages whose text stage is stale, and records them in the manifest. Returns the freshly extracted pages.
+       Pages extracted with a lower cache tier are stale as well, as some of the artefacts of the requested tier are missing."""
+    def is_fresh(beer_index : int) -> bool :
+        if not manifest.is_stage_fresh(beer_index, STAGE_TEXT, source_hashes[beer_index], EXTRACTOR_VERSION, CACHE_DIRECTORY) :
+            return False
+        return all([manifest.artefact_hash(beer_index, STAGE_TEXT, x, CACHE_DIRECTORY) != "" for x in text_stage_artefacts(beer_index, cache_tier)])
+
+    stale_pages = [x for x in source_hashes if not is_fresh(x)]
+    if len(stale_pages) == 0 :
+        logger.log("-> OK : Text content of all {} pages is up to date".format(len(source_hashes)))
+        return {}
+
+    logger.log("Extracting {} stale beer pages to {}".format(len(stale_pages), CACHED_PDF_PAGES_DIR))
+    pages_content = extract_all_pages(pdf_file, jobs, [beer_index_to_page_number(x) for x in stale_pages], cache_tier)
+    for page in pages_content :
+        manifest.record_stage(page.index, STAGE_TEXT, source_hashes[page.index], EXTRACTOR_VERSION, CACHE_DIRECTORY, text_stage_artefacts(page.index, cache_tier))
+    logger.log("-> OK : Pages extracted successfully in {}".format(CACHED_PDF_PAGES_DIR))
+    return {x.index : x for x in pages_content}
+
+def update_images_stage(manifest : CacheManifest,
+                        pdf_file : Path,
+                        pages_list : list[tuple[int, Path]],
+                        source_hashes : dict[int, str],
+                        image_jobs : int,
+                        image_worker_memory : int,
+                        model_name : str,
+                        render_dpi : int = DEFAULT_RENDER_DPI,
+                        debug_images : bool = False) -> list[tuple[int, rcp.PackagingType]] :
+    """Extracts packaging images of the pages whose image stage is stale, and records them in the manifest.
+       Returns the packaging map of all pages, in beer order."""
+    # Images depend on the rendering settings as well, changing them makes all images stale
+    def input_hash(number : int) -> str :
+        return hash_bytes("{}:{}:{}:{}".format(source_hashes.get(number, ""), model_name, render_dpi, debug_images).encode())
+
+    stale_pages = [x for x in pages_list if not manifest.is_stage_fresh(x[0], STAGE_IMAGES, input_hash(x[0]), EXTRACTOR_VERSION, CACHE_DIRECTORY)]
+    if len(stale_pages) != 0 :
+        logger.log("Caching images of {} stale pages to disk ...".format(len(stale_pages)))
+        if image_jobs > 1 :
+            logger.log("Image extraction will run with {} worker processes".format(image_jobs))
+        for (number, packaging) in extract_all_images(stale_pages, pdf_file, CACHED_IMAGES_DIR, image_jobs, image_worker_memory, model_name, render_dpi, debug_images) :
+            # Failed pages are left stale, so that they are tried again on the next run
+            artefacts = images_stage_artefacts(number)
+            if packaging is None or not artefacts[-1].exists() :
+                logger.log("/!\\ Images of page {} could not be extracted, they will be extracted again next time".format(number))
+                continue
+            manifest.record_stage(number, STAGE_IMAGES, input_hash(number), EXTRACTOR_VERSION, CACHE_DIRECTORY, artefacts, {"packaging" : packaging.value})
+    else :
+        logger.log("-> OK : Images of all {} pages are up to date".format(len(pages_list)))
+
+    packaging_type_beer_number_map : list[tuple[int, rcp.PackagingType]] = []
+    for (number, _) in pages_list :
+        record = manifest.get_stage(number, STAGE_IMAGES)
+        if record and "packaging" in record.metadata :
+            packaging_type_beer_number_map.append((number, rcp.PackagingType[record.metadata["packaging"]]))
+    return packaging_type_beer_number_map
+
+def read_cached_contents(page_index : int) -> PageBlocks :
+    """Reads the cached text content of a page back from its json file"""
+    page = PageBlocks()
+    page.index = page_index
+    with open(CACHED_CONTENT_DIR.joinpath("page_{}.json".format(page_index)), "r") as file :
+        page.from_json(json.load(file))
+    return page
+
+def update_page_store(manifest : CacheManifest, pages_list : list[tuple[int, Path]], extracted_pages : dict[int, PageBlocks]) -> Optional[PageStore] :
+    """Brings the page store up to date with the cached text contents of the pages, and opens it.
+       The store is only written again when the contents of some page changed since last time, up to date pages are copied over from the previous store.
+       Returns None if the store could not be opened (pages are then read back from their json files)."""
+    store = PageStore.open(CACHED_PAGE_STORE_FILEPATH)
+    contents_hashes : dict[int, str] = {}
+    for (page_index, _) in pages_list :
+        contents_hash = manifest.artefact_hash(page_index, STAGE_TEXT, CACHED_CONTENT_DIR.joinpath("page_{}.json".format(page_index)), CACHE_DIRECTORY)
+        if contents_hash != "" :
+            contents_hashes[page_index] = contents_hash
+
+    if store is not None and store.indices() == list(contents_hashes) and all([store.contents_hash(x) == y for (x, y) in contents_hashes.items()]) :
+        logger.log("-> OK : Page store is up to date")
+        return store
+
+    logger.log("Writing text contents of {} pages to the page store {}".format(len(contents_hashes), CACHED_PAGE_STORE_FILEPATH.name))
+    pages : list[tuple[PageBlocks, str]] = []
+    for (page_index, contents_hash) in contents_hashes.items() :
+        page = extracted_pages.get(page_index)
+        if page is None and store is not None and store.contents_hash(page_index) == contents_hash :
+            page = store.page(page_index)
+        if page is None :
+            if not CACHED_CONTENT_DIR.joinpath("page_{}.json".format(page_index)).exists() :
+                continue
+            page = read_cached_contents(page_index)
+        pages.append((page, contents_hash))
+
+    if store is not None :
+        store.close()
+    write_page_store(CACHED_PAGE_STORE_FILEPATH, pages)
+    return PageStore.open(CACHED_PAGE_STORE_FILEPATH)
+
+def parse_page_recipe(page_index : int, page : Optional[PageBlocks] = None) -> tuple[Optional[rcp.Recipe], list[str]] :
+    """Parses the recipe of a single beer page.
+       @param :
+            page_index : beer index of the page
+            page       : page text content, read back from the cached contents when not given
+       @return
+            (parsed recipe, []) or (None, error report lines) when the recipe could not be parsed
+    """
+    if page is None :
+        logger.log("Reading back cached text content from json file page_{}.json".format(page_index))
+        page = read_cached_contents(page_index)
+
+    logger.log("Parsing recipe from page {}".format(page.index))
+    try :
+        return (extract_recipe(page), [])
+    except Exception as e :
+        return (None, [
+            "Could not extract recipe from beer {}".format(page.index),
+            "Error was : {}".format(e),
+            traceback.format_exc()
+        ])
+
+def _init_recipe_parsing_worker() :
+    logger.capture()
+
+def _parse_recipe_worker(job : tuple[int, Optional[PageBlocks]]) -> tuple[tuple[Optional[rcp.Recipe], list[str]], list[str]] :
+    result = parse_page_recipe(job[0], job[1])
+    return (result, logger.take_captured())
+
+def parse_all_recipes(jobs_list : list[tuple[int, Optional[PageBlocks]]], jobs : int = 1) -> list[tuple[Optional[rcp.Recipe], list[str]]] :
+    """Parses recipes out of the given pages, pages that are not given are read back from the cached contents.
+       When jobs > 1, pages are loaded and parsed by a pool of worker processes.
+       Results are always returned in the same order as jobs_list, error reports are left to the caller so that logs don't depend on the number of jobs."""
+    if jobs > 1 and len(jobs_list) > 1 :
+        chunksize = max(1, math.ceil(len(jobs_list) / (jobs * 4)))
+        with worker_pool(jobs, _init_recipe_parsing_worker, ()) as executor :
+            return collect_worker_results(executor.map(_parse_recipe_worker, jobs_list, chunksize=chunksize))
+    return [parse_page_recipe(x[0], x[1]) for x in jobs_list]
+
+def update_recipes_stage(manifest : CacheManifest,
+                         pages_list : list[tuple[int, Path]],
+                         extracted_pages : dict[int, PageBlocks],
+                         jobs : int = 1,
+                         store : Optional[PageStore] = None,
+                         cache_tier : CacheTier = CacheTier.Standard) -> list[rcp.Recipe] :
+    """Parses recipes out of the pages whose cached contents changed since last run and records them in the manifest.
+       Up to date recipes are read back from the parsed recipes cache instead. Recipes are returned in beer order.
+       Pages contents are read from memory, then from the page store (if given), then from their json files.
+       In minimal cache tier, parsed recipes are not cached (they are parsed again on the next run)."""
+    recipes : dict[int, rcp.Recipe] = {}
+    stale_pages : list[tuple[int, Optional[PageBlocks]]] = []
+    contents_hashes : dict[int, str] = {}
+    for (page_index, _) in pages_list :
+        content_filepath = CACHED_CONTENT_DIR.joinpath("page_{}.json".format(page_index))
+        recipe_filepath = parsed_recipe_filepath(page_index)
+        contents_hash = manifest.artefact_hash(page_index, STAGE_TEXT, content_filepath, CACHE_DIRECTORY)
+
+        if contents_hash != "" and manifest.is_stage_fresh(page_index, STAGE_RECIPE, contents_hash, EXTRACTOR_VERSION, CACHE_DIRECTORY) :
+            new_recipe = rcp.Recipe()
+            with open(recipe_filepath, "r") as file :
+                new_recipe.from_json(json.load(file))
+            recipes[page_index] = new_recipe
+            continue
+
+        # Skip deserialization if it already exist in memory
+        page = extracted_pages.get(page_index)
+        if page is None and store is not None and page_index in store and store.contents_hash(page_index) == contents_hash :
+            page = store.page(page_index)
+        if page is None and not content_filepath.exists() :
+            continue
+        stale_pages.append((page_index, page))
+        contents_hashes[page_index] = contents_hash
+
+    if len(stale_pages) != 0 and jobs > 1 :
+        logger.log("Parsing {} recipes with {} worker processes".format(len(stale_pages), jobs))
+
+    for ((page_index, _), (new_recipe, errors)) in zip(stale_pages, parse_all_recipes(stale_pages, jobs)) :
+        for line in errors :
+            logger.log(line)
+        if new_recipe is None :
+            continue
+        recipes[page_index] = new_recipe
+        if cache_tier == CacheTier.Minimal :
+            continue
+
+        recipe_filepath = parsed_recipe_filepath(page_index)
+        ensure_folder_exist(recipe_filepath.parent)
+        with open(recipe_filepath, "w") as file :
+            json.dump(new_recipe.to_json(), file, indent=4)
+        manifest.record_stage(page_index, STAGE_RECIPE, contents_hashes[page_index], EXTRACTOR_VERSION, CACHE_DIRECTORY, [recipe_filepath])
+
+    return [recipes[x] for (x, _) in pages_list if x in recipes]
+
+def _init_image_extraction_worker(pdf_file : Path, max_memory_mb : int, model_name : str) :
+    global _worker_image_context
+    global _worker_pdf_book
+    logger.capture()
+    if max_memory_mb > 0 :
+        try :
+            import resource
+            limit = max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError) as e :
+            logger.log("/!\\ Could not cap image worker memory to {}MB : {}".format(max_memory_mb, e))
+    _worker_image_context = utim.ImageExtractionContext(model_name)
+    _worker_pdf_book = PdfBook(pdf_file)
+
+def _extract_images_worker(page : tuple[int, Path], cached_images_dir : Path, render_dpi : int, debug_images : bool) -> tuple[tuple[int, Optional[rcp.PackagingType]], list[str]] :
+    assert(_worker_pdf_book)
+    (number, page_filepath) = page
+    page_images_dir = cached_images_dir.joinpath(page_filepath.stem)
+    logger.log("Caching images for page {}".format(page_filepath.stem))
+    packaging = cache_images(page_images_dir, _worker_pdf_book, beer_index_to_page_number(number), number, _worker_image_context, render_dpi, debug_images)
+    return ((number, packaging), logger.take_captured())
+
+def extract_all_images(pages_list : list[tuple[int, Path]],
+                       pdf_file : Path,
+                       cached_images_dir : Path,
+                       jobs : int = 1,
+                       max_memory_mb : int = 0,
+                       model_name : str = "u2net",
+                       render_dpi : int = DEFAULT_RENDER_DPI,
+                       debug_images : bool = False) -> list[tuple[int, Optional[rcp.PackagingType]]] :
+    """Extracts packaging silhouettes for all cached pdf pages.
+       Pages are rendered straight from the source pdf book, cached single page pdf files are only used to name the outputs.
+       @param :
+            pages_list        : (beer number, single page pdf file) list, sorted by beer number
+            pdf_file          : source pdf book
+            cached_images_dir : root directory where images are cached (one subfolder per page)
+            jobs              : number of worker processes. Each worker creates its own image extraction context once and reuses it.
+            max_memory_mb     : address space cap applied to each worker process (0 means no cap)
+            model_name        : rembg model used for background removal
+            render_dpi        : resolution at which packaging zones are rendered
+            debug_images      : also renders and keeps full pages images
+       @return
+            (beer number, most probable packaging type) list, in the same order as pages_list. Packaging is None for pages whose extraction failed
+    """
+    if jobs > 1 :
+        with worker_pool(jobs, _init_image_extraction_worker, (pdf_file, max_memory_mb, model_name)) as executor :
+            # Results come back in submission order, so the packaging map is always assembled in beer order
+            count = len(pages_list)
+            return collect_worker_results(executor.map(_extract_images_worker, pages_list, [cached_images_dir] * count, [render_dpi] * count, [debug_images] * count))
+
+    context = utim.ImageExtractionContext(model_name)
+    packaging_type_beer_number_map : list[tuple[int, Optional[rcp.PackagingType]]] = []
+    with PdfBook(pdf_file) as book :
+        for page in pages_list :
+            number = page[0]
+            page_filepath = page[1]
+
+            page_images_dir = cached_images_dir.joinpath(page_filepath.stem)
+            logger.log("Caching images for page {}".format(page_filepath.stem))
+            most_probable_packaging_type = cache_images(page_images_dir, book, beer_index_to_page_number(number), number, context, render_dpi, debug_images)
+            packaging_type_beer_number_map.append((number, most_probable_packaging_type))
+
+    logger.log(context.timing_report())
+    return packaging_type_beer_number_map
+
+
+def build_arg_parser() -> argparse.ArgumentParser :
     arg_parser = argparse.ArgumentParser("Python DiyDogExtractor tool. This software downloads the published DiyDog pdf book and tries to reconstruct a complete database out of it/")
-    arg_parser.add_argument("force_caching", default="false", help="Force the tool to regenerate its cache from scratch. Downloads only if .pdf file is not there")
+    arg_parser.add_argument("force_caching", default="false", help="Force the tool to regenerate its cache from scratch. Downloads only if .pdf file is not there. Otherwise, only stale cache entries are regenerated.")
     arg_parser.add_argument("skip_image_extraction", default="false", help="Skips the image extraction step, as it takes quite a long time to achieve")
     arg_parser.add_argument("aggregate_results", default="false", help="Aggregates single recipes in a single big recipe collection")
-    commands = arg_parser.parse_args(args)
-
+    arg_parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes used to extract pdf pages and parse recipes. Output is identical whatever the number of jobs.")
+    arg_parser.add_argument("--image-jobs", type=int, default=1, help="Number of worker processes used to extract packaging images.")
+    arg_parser.add_argument("--image-worker-memory", type=int, default=0, help="Memory cap (in MB) of each image extraction worker process. 0 means no cap.")
+    arg_parser.add_argument("--rembg-model", default="u2net", help="rembg model used to remove packaging images background.")
+    arg_parser.add_argument("--render-dpi", type=int, default=DEFAULT_RENDER_DPI, help="Resolution at which packaging images are rendered out of the pdf pages.")
+    arg_parser.add_argument("--debug-images", action="store_true", help="Also renders full pages images (full.png) next to the extracted packaging images.")
+    arg_parser.add_argument("--cache-tier", choices=[x.value for x in CacheTier], default=CacheTier.Standard.value,
+                            help="Intermediate artefacts written to the cache : 'minimal' only keeps what later stages need, 'standard' also caches parsed recipes, "
+                                 "'debug' writes everything (raw content streams, raw text blocks, full page renders).")
+    return arg_parser
+
+def extract_database(commands : argparse.Namespace, deploy : bool = True) -> list[rcp.Recipe] :
+    """Runs the whole extraction, from the pdf book download to the deployed database.
+       @param :
+            commands : parsed command line arguments (see build_arg_parser())
+            deploy   : deploys the extracted database. Callers that deploy it along with other data (see pipeline.py) disable it
+       @return
+            extracted recipes, in beer order
+    """
     force_caching = commands.force_caching == "true"
     skip_image_extraction = commands.skip_image_extraction == "true"
     aggregate_results = commands.aggregate_results == "true"
+    jobs = max(1, commands.jobs)
+    image_jobs = max(1, commands.image_jobs)
+    image_worker_memory = max(0, commands.image_worker_memory)
+    cache_tier = CacheTier(commands.cache_tier)
+    debug_images = commands.debug_images or cache_tier == CacheTier.Debug
 
 
     if force_caching :
@@ -1221,140 +1571,67 @@ def main(args) :
     if aggregate_results :
         logger.log("json data will also be aggregated into a single file")
 
-    cached_pdf_pages_dir = CACHE_DIRECTORY.joinpath("pages")
-    cached_blocks_dir = CACHE_DIRECTORY.joinpath("blocks")
-    cached_pdf_raw_content = CACHE_DIRECTORY.joinpath("pdf_raw_contents")
-    cached_images_dir = CACHE_DIRECTORY.joinpath("images")
+    if cache_tier != CacheTier.Standard :
+        logger.log("Cache tier set to {}".format(cache_tier.value))
+
+    if jobs > 1 :
+        logger.log("Pages extraction and recipes parsing will run with {} worker processes".format(jobs))
+
+    cached_pdf_pages_dir = CACHED_PDF_PAGES_DIR
+    cached_images_dir = CACHED_IMAGES_DIR
     cached_recipes_dir = CACHE_DIRECTORY.joinpath("extracted_recipes")
-    # Pages decoded content with pypdf library
-    cached_content_dir = CACHE_DIRECTORY.joinpath("contents")
     #cached_custom_blocks = CACHE_DIRECTORY.joinpath("custom_blocks")
 
     pdf_file = CACHE_DIRECTORY.joinpath("diydog-2022.pdf")
     if not pdf_file.exists() :
         logger.log("Downloading brewdog's Diydog pdf booklet ...")
-        download_pdf(C_DIYDOG_URL, pdf_file, logger)
+        if not download_pdf(C_DIYDOG_URL, pdf_file, logger) :
+            raise RuntimeError("Could not download pdf file, partial download (if any) is kept at : {}".format(partial_filepath(pdf_file)))
         logger.log("-> OK : Downloading succeeded ! Pdf file was downloaded at : {}".format(pdf_file))
         # Triggers force caching because we need to regenerate everything
         force_caching = True
 
-    pages_content : list[PageBlocks] = []
-    # List already cached pages before going, if nothing is there then trigger the force cache flag
-    logger.log("Listing available pdf pages before starting up ...")
-    pages_list = list_pages_with_number(cached_pdf_pages_dir, ".pdf")
-    if len(pages_list) < 100 :
-        force_caching = True
-        logger.log("Very few pages were found on disk (actually : {} pages), app will regenerate the cache now.".format(len(pages_list)))
-
-    # Extract pages for caching purposes
+    manifest = CacheManifest.load(MANIFEST_FILEPATH)
     if force_caching :
-        logger.log("Extracting all beer pages to {}".format(cached_pdf_pages_dir))
-        with open(pdf_file, "rb") as file :
-            reader = PdfReader(file)
-
-            # Page 22 is the first beer
-            start_page = 21
-
-            # Page 436 is the very last beer
-            end_page = 436
-
-            for i in range(start_page, end_page) :
-                beer_index = i - start_page + 1
-                logger.log("Extracting page : {}, beer index : {}".format(i, beer_index))
-                encoded_name = "page_{}".format(beer_index)
-                page = reader.pages[i]
-
-
-                logger.log("Caching page to disk ...")
-                cache_single_pdf_page(cached_pdf_pages_dir.joinpath(encoded_name + ".pdf"), page=page)
-                content_filepath = cached_content_dir.joinpath(encoded_name + ".json")
+        manifest.clear()
 
-                # Fetch raw contents and manually parse it (works better than brute text extraction from pypdf)
-                logger.log("Extracting textual content of page ...")
-                raw_contents = page.get_contents()
-
-                if raw_contents == None :
-                    raise Exception("Cannot read page !")
-                data = bytes(raw_contents.get_data())
-
-                str_contents : str
-                try :
-                    # File is written with the iso-8859-1 encoding and does not play well with the rest of the parsing
-                    str_contents = data.decode("iso-8859-1")
-                except Exception as ex :
-                    logger.log("/!\\ Caught exception while parsing")
-                    logger.log("   Exception was : {}".format(ex))
-                    continue
-                cache_pdf_raw_contents(cached_pdf_raw_content.joinpath(encoded_name + ".txt"), str_contents )
-
-                raw_blocks = extract_raw_text_blocks_from_content(str_contents)
-                logger.log("Caching raw text blocks ...")
-                cache_raw_blocks(cached_blocks_dir.joinpath(encoded_name + ".txt"), raw_blocks )
-
-                logger.log("Parsing raw text blocks into pre-processed text blocks")
-                text_blocks = text_blocks_from_raw_blocks(raw_blocks)
-
-                # Post processing of text blocks :
-                logger.log("Post processing text blocks ...")
-                temp_blocks = []
-                for block in text_blocks :
-                    # Strip whitespaces and removes empty items
-                    block.text = block.text.strip()
-                    if block.text != "" :
-                        temp_blocks.append(block)
-
-                text_blocks = temp_blocks
-
-                logger.log("Caching preprocessed contents ...")
-                # Adding page blocks now, so that we
-                # don't have to parse them again
-                page_blocks = PageBlocks()
-                page_blocks.elements = text_blocks
-                page_blocks.index = beer_index
-                pages_content.append(page_blocks)
-                cache_contents(content_filepath, page_blocks)
-
-        logger.log("-> OK : Pages extracted successfully in {}".format(cached_pdf_pages_dir))
+    # Source pages only need to be hashed again when the pdf book itself changed since last run
+    source_hashes : dict[int, str] = {x : y.source_hash for (x, y) in manifest.pages.items() if y.source_hash != ""}
+    if not manifest.source_unchanged(pdf_file) or len(source_hashes) != LAST_BEER_PAGE - FIRST_BEER_PAGE :
+        logger.log("Hashing source pdf pages ...")
+        source_hashes = hash_source_pages(pdf_file)
+        manifest.record_source(pdf_file)
+        for (beer_index, source_hash) in source_hashes.items() :
+            manifest.get_page(beer_index).source_hash = source_hash
 
+    # Extract stale pages for caching purposes
+    extracted_pages = update_text_stage(manifest, pdf_file, source_hashes, jobs, cache_tier)
+    manifest.save(MANIFEST_FILEPATH)
 
     # List already cached pages
     logger.log("Listing available pdf pages ...")
     pages_list = list_pages_with_number(cached_pdf_pages_dir)
     logger.log("-> OK : Found {} pages in {}".format(len(pages_list), cached_pdf_pages_dir))
 
-    # List already cached images
-    logger.log("Listing available pages images and extracted images...")
-    images_list = list_files_pattern(cached_images_dir, "extracted_silhouette", ".png")
-
-
     # Will be needed for caching purposes
     packaging_cached_map_filepath = cached_images_dir.joinpath("packaging_map.json")
     packaging_type_beer_number_map : list[tuple[int, rcp.PackagingType]] = []
-    if len(images_list) < 100 and skip_image_extraction or not packaging_cached_map_filepath.exists():
+
+    # Images can only be skipped if all of them were extracted at least once
+    missing_images = [x for x in pages_list if manifest.get_stage(x[0], STAGE_IMAGES) is None]
+    if skip_image_extraction and len(missing_images) != 0 :
+        logger.log("Found {} pages without extracted images in {}. Triggering image extraction again.".format(len(missing_images), cached_images_dir))
         skip_image_extraction = False
 
     # Extracting pdf rendered images !
     if skip_image_extraction == False :
-        logger.log("Found few {} pages images in {}. Triggering image extraction again.".format(len(images_list), cached_pdf_pages_dir))
-        logger.log("Caching images to disk ...")
-
-        # DEBUG : used to only feed those pages to the image extraction process
-        # Comment out to extract every page on regular list
+        # DEBUG : used to only feed those pages to the image extraction process (used to determine aspect ratios for known images)
+        # Uncomment to extract only those pages
         #candidates = [1, 8, 11, 16, 63, 172]
+        #pages_list = [x for x in pages_list if x[0] in candidates]
 
-        for page in pages_list :
-
-            # DEBUG : skip images that are not in this list (used to determine aspect ratios for known images)
-            #if page[0] not in candidates :
-            #    continue
-
-            number = page[0]
-            page_filepath = page[1]
-
-            page_images_dir = cached_images_dir.joinpath(page_filepath.stem)
-            logger.log("Caching images for page {}".format(page_filepath.stem))
-            most_probable_packaging_type = cache_images(page_images_dir, page_filepath, number)
-            packaging_type_beer_number_map.append((number, most_probable_packaging_type))
+        packaging_type_beer_number_map = update_images_stage(manifest, pdf_file, pages_list, source_hashes, image_jobs, image_worker_memory, commands.rembg_model, commands.render_dpi, debug_images)
+        manifest.save(MANIFEST_FILEPATH)
 
         # Cache this as well, might speed up the process as we don't need to wait for the image extraction process
         # to run over and over if this data is also cached (...)
@@ -1366,61 +1643,28 @@ def main(args) :
             json.dump(packaging_cached_content, file, indent=4)
 
     else :
-        logger.log("-> OK : Found {} pages images in {}".format(len(images_list), cached_pdf_pages_dir))
         logger.log("Image extraction step skipped.")
 
-        logger.log("Reading back packaging map from file...")
-        with open(packaging_cached_map_filepath, 'r') as file :
-            packaging_cached_content = json.load(file)
-
-        logger.log("Reconstructing packaging map ...")
-        packaging_type_beer_number_map = []
-        for elem in packaging_cached_content["packaging"] :
-            packaging_type_beer_number_map.append((elem['number'], rcp.PackagingType[elem['packaging']]))
-
-
     # List already cached images
     logger.log("Listing available pages images and extracted images...")
     images_list = list_files_pattern(cached_images_dir, "extracted_silhouette", ".png")
     logger.log("-> OK : Found {} pages images in {}".format(len(images_list), cached_pdf_pages_dir))
 
-    logger.log("Listing available json content from pages ...")
-    pages_content_list = list_pages_with_number(cached_content_dir, ".json")
-    logger.log("-> OK : Found {} pages in {}".format(len(pages_list), cached_pdf_pages_dir))
-    for page in pages_content_list :
-        page_index = page[0]
-        found_elem = [x for x in pages_content if  x.index == page_index ]
-        # Skip deserialization if it already exist in memory
-        if len(found_elem) != 0 :
-            continue
-
-        logger.log("Reading back cached text content from json file {}".format(page[1].name))
-        page_blocks = PageBlocks()
-        page_blocks.index = page_index
-        with open(page[1], "r") as file :
-            data = json.load(file)
-            page_blocks.from_json(data)
-        pages_content.append(page_blocks)
-
     logger.log("Parsing actual recipe content from extracted text blocks")
-    recipes_list : list[rcp.Recipe] = []
-    for page in pages_content :
-        logger.log("Parsing recipe from page {}".format(page.index))
-        try :
-            new_recipe = extract_recipe(page)
-            recipes_list.append(new_recipe)
-        except Exception as e :
-            logger.log("Could not extract recipe from beer {}".format(page.index))
-            logger.log("Error was : {}".format(e))
-            logger.log(traceback.format_exc())
+    store = update_page_store(manifest, pages_list, extracted_pages)
+    recipes_list = update_recipes_stage(manifest, pages_list, extracted_pages, jobs, store, cache_tier)
+    manifest.save(MANIFEST_FILEPATH)
+    if store is not None :
+        store.close()
 
     # Hook pdf pages and extracted images / thumbnails to recipes
+    packaging_by_number = dict(packaging_type_beer_number_map)
     for recipe in recipes_list :
         hook_pdf_and_extracted_image_to_recipe(recipe)
 
         # Should be correctly indexed at this stage
-        if not skip_image_extraction :
-            recipe.packaging.value = packaging_type_beer_number_map[recipe.number.value - 1][1]
+        if not skip_image_extraction and recipe.number.value in packaging_by_number :
+            recipe.packaging.value = packaging_by_number[recipe.number.value]
 
     # Dump recipes on disk now !
     if not cached_recipes_dir.exists() :
@@ -1430,7 +1674,7 @@ def main(args) :
     if aggregate_results :
         logger.log("Dumping aggregated recipe json book as 'all_recipes.json'.")
         filepath = cached_recipes_dir.joinpath("all_recipes.json")
-        dump_all_recipes_to_disk(filepath, recipes_list)
+        dump_all_recipes_to_disk(filepath, recipes_list, with_store=True)
     else:
         logger.log("Dumping single extracted recipes ...")
         for recipe in recipes_list :
@@ -1442,20 +1686,18 @@ def main(args) :
 
     # Configuring deployment directory
     deploy_dir = CACHE_DIRECTORY.joinpath("deployed")
-    dep_images_dir = deploy_dir.joinpath("images")
-    dep_recipes_dir = deploy_dir.joinpath("recipes")
-    dep_pdf_pages_dir = deploy_dir.joinpath("pdf_pages")
-
-    ensure_folder_exist(dep_images_dir)
-    ensure_folder_exist(dep_recipes_dir)
-    ensure_folder_exist(dep_pdf_pages_dir)
-    ensure_folder_exist(deploy_dir)
 
-    logger.log(f"Deploying output data to deploy directory : {deploy_dir}")
-    deploy_to_directory(cached_recipes_dir, cached_images_dir, cached_pdf_pages_dir, dep_recipes_dir, dep_pdf_pages_dir, dep_images_dir)
+    if deploy :
+        logger.log(f"Deploying output data to deploy directory : {deploy_dir}")
+        counts = deploy_to_directory(cached_recipes_dir, cached_images_dir, cached_pdf_pages_dir, deploy_dir)
+        logger.log("-> OK : Deployed files : {}".format(", ".join(["{} {}".format(y, x) for (x, y) in counts.items()])))
 
 
     logger.log("Done !")
+    return recipes_list
+
+def main(args) :
+    extract_database(build_arg_parser().parse_args(args))
 
 if __name__ == "__main__" :
     try :
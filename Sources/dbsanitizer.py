@@ -214,23 +214,8 @@ def read_extras_from_file(filepath : Path) -> tuple[list[str], list[str]] :
             boil_extras.append(elem)
     return (mash_extras, boil_extras)
 
-def main(args : list[str]):
-    parser = argparse.ArgumentParser("Database sanitizer script", description="Tries to match recipes properties against known-good datasets and tries to uniformize recipes")
-    parser.add_argument("ref_dir", help="References directory, where known good dataset (known_good_<prop>.json) reside")
-    parser.add_argument("deployed_recipes_dir", help="Directory where deployed recipes databases are located")
-    parser.add_argument("output_directory", help="Output directory where results will be written")
-
-    commands = parser.parse_args(args)
-    ref_dir = Path(commands.ref_dir)
-    deployed_recipes_dir = Path(commands.deployed_recipes_dir)
-    output_directory = Path(commands.output_directory)
-    fs.ensure_folder_exist(output_directory)
-
-    logger = Logger(output_directory.joinpath("dbsanitizer.txt"))
-    if not ref_dir.exists():
-        logger.log("/!\\ Input file does not exist, cannot continue with db analysis.")
-        return 1
-
+def sanitize_recipes(recipes_list : list[rcp.Recipe], ref_dir : Path, logger : Logger) -> None :
+    """Matches recipes properties against the known good datasets of the references directory, recipes are modified in place"""
     # Using this keywords contraption instead of the known good style list, because styles used by BrewDog in their recipes vary too widely
     # and even fuzzy search has a hard time finding actual "regular" styles to stick to.
     # So instead, rely on manually-prepared dataset that I know is part of DiyDog book (...)
@@ -241,12 +226,6 @@ def main(args : list[str]):
     malts_file = ref_dir.joinpath("known_good_malts.json")
     yeasts_file = ref_dir.joinpath("known_good_yeasts.json")
 
-
-    logger.log("Reading all recipes from disk")
-    recipes_list : list[rcp.Recipe] = []
-    all_recipes_file = deployed_recipes_dir.joinpath("recipes/all_recipes.json")
-    recipes_list = read_all_recipes(all_recipes_file)
-
     keywords_list = read_keywords_file(styles_file)
     (mash_extras, boil_extras) = read_extras_from_file(known_extras_file)
 
@@ -274,9 +253,10 @@ def main(args : list[str]):
     merge_hops(recipes_list, hops_ref_list, boil_extras, logger)
     logger.log("Hops merging OK!\n\n")
 
+def dump_sanitized_recipes(recipes_list : list[rcp.Recipe], output_directory : Path, logger : Logger, with_store : bool = False) -> None :
     logger.log("Dumping cleaned up all_recipes.json to disk !")
     all_recipes_filepath = output_directory.joinpath("all_recipes.json")
-    dump_all_recipes_to_disk(all_recipes_filepath, recipes_list)
+    dump_all_recipes_to_disk(all_recipes_filepath, recipes_list, with_store)
     logger.log("Done !\n\n")
 
     # Dumping individual files as well, as they are used to speed up IO accesses in
@@ -285,6 +265,30 @@ def main(args : list[str]):
     dump_individual_recipes_files_to_disk(output_directory, recipes_list)
     logger.log("Done !")
 
+def main(args : list[str]):
+    parser = argparse.ArgumentParser("Database sanitizer script", description="Tries to match recipes properties against known-good datasets and tries to uniformize recipes")
+    parser.add_argument("ref_dir", help="References directory, where known good dataset (known_good_<prop>.json) reside")
+    parser.add_argument("deployed_recipes_dir", help="Directory where deployed recipes databases are located")
+    parser.add_argument("output_directory", help="Output directory where results will be written")
+
+    commands = parser.parse_args(args)
+    ref_dir = Path(commands.ref_dir)
+    deployed_recipes_dir = Path(commands.deployed_recipes_dir)
+    output_directory = Path(commands.output_directory)
+    fs.ensure_folder_exist(output_directory)
+
+    logger = Logger(output_directory.joinpath("dbsanitizer.txt"))
+    if not ref_dir.exists():
+        logger.log("/!\\ Input file does not exist, cannot continue with db analysis.")
+        return 1
+
+    logger.log("Reading all recipes from disk")
+    recipes_list : list[rcp.Recipe] = []
+    all_recipes_file = deployed_recipes_dir.joinpath("recipes/all_recipes.json")
+    recipes_list = read_all_recipes(all_recipes_file)
+
+    sanitize_recipes(recipes_list, ref_dir, logger)
+    dump_sanitized_recipes(recipes_list, output_directory, logger)
 
     logger.log("Database sanitation Done !")
 
@@ -0,0 +1,126 @@
+import sys
+import argparse
+import shutil
+from pathlib import Path
+from collections.abc import Mapping
+from typing import Any
+
+from .Utils.logger import Logger
+from .Utils.filesystem import ensure_folder_exist, list_all_files, list_files_pattern
+from .Utils.recipe_service import read_all_recipes
+from .Utils.deployment import DeployItem, deploy_files
+from .Utils.stage_runner import Stage, run_pipeline, format_reports
+from .Models import recipe as rcp
+from .ScriptingTools.patcher import read_patches, apply_patches
+from . import dbextractor
+from . import dbsanitizer
+from . import dbanalyser
+
+# Runs the extraction, patching, sanitization and analysis tools one after the other in this process, on the in memory recipes list.
+# This is what round_trip.sh used to do by calling each tool separately (and reading/writing all_recipes.json in between)
+THIS_DIR = Path(__file__).parent
+REPO_ROOT = THIS_DIR.parent
+CACHE_DIRECTORY = dbextractor.CACHE_DIRECTORY
+DEPLOY_DIR = CACHE_DIRECTORY.joinpath("deployed")
+EXTRACTED_RECIPES_FILEPATH = CACHE_DIRECTORY.joinpath("extracted_recipes/all_recipes.json")
+SANITIZER_DIR = CACHE_DIRECTORY.joinpath("dbsanitizer")
+SANITIZED_RECIPES_DIR = SANITIZER_DIR.joinpath("recipes")
+ANALYSIS_DIR = CACHE_DIRECTORY.joinpath("dbanalysis")
+PIPELINE_MANIFEST_FILEPATH = CACHE_DIRECTORY.joinpath("pipeline_manifest.json")
+
+logger = Logger(CACHE_DIRECTORY.joinpath("pipeline_logs.txt"))
+
+
+def build_stages(extractor_commands : argparse.Namespace, patches_dir : Path, references_dir : Path) -> list[Stage] :
+    """Declares the pipeline stages.
+       @param :
+            extractor_commands : dbextractor command line arguments
+            patches_dir        : manual recipe patches (recipe_<number>.json files)
+            references_dir     : known good datasets used by the sanitizer
+    """
+    references = sorted(list_all_files(references_dir))
+
+    # Extraction is deployed by the publish stage, along with everything else
+    def extract(_ : Mapping[str, Any]) -> list[rcp.Recipe] :
+        return dbextractor.extract_database(extractor_commands, deploy=False)
+
+    def patch(results : Mapping[str, Any]) -> list[rcp.Recipe] :
+        return apply_patches(results["extract"], read_patches(patches_dir))
+
+    def sanitize(results : Mapping[str, Any]) -> list[rcp.Recipe] :
+        recipes_list = results["patch"]
+        ensure_folder_exist(SANITIZER_DIR)
+        sanitizer_logger = Logger(SANITIZER_DIR.joinpath("dbsanitizer.txt"))
+        dbsanitizer.sanitize_recipes(recipes_list, references_dir, sanitizer_logger)
+        ensure_folder_exist(SANITIZED_RECIPES_DIR)
+        # Sanitized recipes are read back from the cache by the next runs, through the compact store
+        dbsanitizer.dump_sanitized_recipes(recipes_list, SANITIZED_RECIPES_DIR, sanitizer_logger, with_store=True)
+        return recipes_list
+
+    def analyse(results : Mapping[str, Any]) -> None :
+        shutil.rmtree(ANALYSIS_DIR, ignore_errors=True)
+        ensure_folder_exist(ANALYSIS_DIR)
+        dbanalyser.analyse_recipes(results["sanitize"], ANALYSIS_DIR, Logger(ANALYSIS_DIR.joinpath("dbanalyser_logs.txt")))
+
+    def publish(_ : Mapping[str, Any]) -> None :
+        # Sanitized recipes (instead of the extracted ones), pdf pages, images, references and analysis results are all deployed
+        # in a single new tree, swapped in at once. Only files are read, dependencies are only there to run beforehand
+        items = dbextractor.recipes_deploy_items(SANITIZED_RECIPES_DIR)
+        items += dbextractor.media_deploy_items(dbextractor.CACHED_IMAGES_DIR, dbextractor.CACHED_PDF_PAGES_DIR)
+        items += [DeployItem(x, "references/" + x.name, linkable=False) for x in references]
+        items += [DeployItem(x, "dbanalysis/" + x.relative_to(ANALYSIS_DIR).as_posix(), linkable=False) for x in sorted(list_all_files(ANALYSIS_DIR))]
+        counts = deploy_files(items, DEPLOY_DIR, dbextractor.DEPLOY_MANIFEST_FILEPATH)
+        logger.log("-> OK : Deployed files : {}".format(", ".join(["{} {}".format(y, x) for (x, y) in counts.items()])))
+
+    # Extraction keeps its own per page cache, the stage itself is only skipped when nothing changed at all
+    extractor_parameters = {key : value for (key, value) in vars(extractor_commands).items() if key != "force_caching"}
+    extractor_parameters["version"] = dbextractor.EXTRACTOR_VERSION
+    return [
+        Stage("extract", extract,
+              inputs=[CACHE_DIRECTORY.joinpath("diydog-2022.pdf")],
+              parameters=extractor_parameters,
+              outputs=[EXTRACTED_RECIPES_FILEPATH, dbextractor.CACHED_PDF_PAGES_DIR, dbextractor.CACHED_IMAGES_DIR],
+              load=lambda : read_all_recipes(EXTRACTED_RECIPES_FILEPATH)),
+        Stage("patch", patch, dependencies=["extract"],
+              inputs=sorted(list_files_pattern(patches_dir, "recipe", ".json"))),
+        Stage("sanitize", sanitize, dependencies=["patch"],
+              inputs=references,
+              outputs=[SANITIZED_RECIPES_DIR],
+              load=lambda : read_all_recipes(SANITIZED_RECIPES_DIR.joinpath("all_recipes.json"))),
+        Stage("analyse", analyse, dependencies=["sanitize"],
+              outputs=[ANALYSIS_DIR]),
+        Stage("publish", publish, dependencies=["extract", "sanitize", "analyse"],
+              inputs=references,
+              outputs=[DEPLOY_DIR])
+    ]
+
+def main(args : list[str]) :
+    parser = argparse.ArgumentParser("DiyDog pipeline", description="Extracts, patches, sanitizes and analyses the DiyDog database in a single run. "
+                                     "Stages whose inputs did not change since last run are skipped. "
+                                     "Unknown options are handed over to the dbextractor tool (--jobs, --cache-tier, ...)")
+    parser.add_argument("--force", action="store_true", help="Runs all stages, even the up to date ones")
+    parser.add_argument("--force-caching", action="store_true", help="Regenerates the extraction cache from scratch (see dbextractor)")
+    parser.add_argument("--extract-images", action="store_true", help="Runs the (slow) packaging images extraction step")
+    parser.add_argument("--patches", default=str(REPO_ROOT.joinpath("Patches")), help="Directory where recipe patches are located")
+    parser.add_argument("--references", default=str(REPO_ROOT.joinpath("References")), help="References directory, where known good datasets reside")
+    (commands, extractor_args) = parser.parse_known_args(args)
+
+    references_dir = Path(commands.references)
+    if not references_dir.exists() :
+        logger.log("/!\\ References directory {} does not exist, cannot run the pipeline.".format(references_dir))
+        return 1
+
+    # Recipes are always aggregated, the sanitizer and the analyser read the aggregated database
+    extractor_commands = dbextractor.build_arg_parser().parse_args(["true" if commands.force_caching else "false",
+                                                                    "false" if commands.extract_images else "true",
+                                                                    "true"] + extractor_args)
+    stages = build_stages(extractor_commands, Path(commands.patches), references_dir)
+    forced = [x.name for x in stages] if commands.force else (["extract"] if commands.force_caching else [])
+
+    reports = run_pipeline(stages, PIPELINE_MANIFEST_FILEPATH, logger, forced)
+    logger.log("\n" + format_reports(reports))
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main(sys.argv[1:]))